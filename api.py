@@ -1,26 +1,60 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
-from pydantic import BaseModel
-from langchain_core.messages import HumanMessage
+import asyncio
+import csv
 import json
-from typing import AsyncGenerator, Optional, Dict, Any
-from dotenv import load_dotenv
-import uvicorn
 import os
-from pathlib import Path
-import asyncio
 import sys
-import csv
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from typing import Any
 
-from src.llm import LLMWrapper
-from src.utils import TokenUsageTracker, CheckpointManager
-from src.graph import create_travel_agent_graph
-from src.states import PlanDetailsState
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel
 
+from src.graph import GraphRegistry
+from src.llm import (
+    Hedger,
+    LLMLimiter,
+    LLMResponseCache,
+    LLMWrapper,
+    MicroBatcher,
+    ModelRouter,
+)
+from src.nodes.compiler import STREAM_TAG
+from src.states import PlanDetailsState
+from src.utils import (
+    CheckpointManager,
+    NodeCache,
+    SemanticPlanCache,
+    TokenUsageTracker,
+    all_fast_path_stats,
+    changed_plan_fields,
+    invalidation_update,
+    revision_stats,
+)
+from src.utils.metrics import SSE_ACTIVE, SSE_SESSIONS
+from src.utils.metrics import registry as metrics_registry
+from src.utils.prompt_budget import prompt_budget
+from src.utils.tracing import tracer
 
 load_dotenv()
 
+# Lower the sample rate to keep tracing on under production load
+tracer.configure(
+    max_runs=int(os.getenv("TRACE_MAX_RUNS", "50")),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+)
+# Token budgets for search results embedded in flight and hotel prompts
+prompt_budget.configure(
+    top_k=int(os.getenv("PROMPT_TOP_K", "5")),
+    flight_agent=int(os.getenv("FLIGHT_PROMPT_TOKENS", "400")),
+    hotel_agent=int(os.getenv("HOTEL_PROMPT_TOKENS", "400")),
+)
+
 app = FastAPI(title="Travel Agent API")
 app.add_middleware(
     CORSMiddleware,
@@ -35,14 +69,120 @@ HF_TOKEN = os.getenv("HF_TOKEN", None)
 BASE_URL = os.getenv("BASE_URL", None)
 MODEL_NAME = os.getenv("MODEL_NAME", "llama3.1:8b")
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "ollama")
+llm_cache = (
+    LLMResponseCache(
+        db_path="checkpoints/llm_cache.db",
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800")),
+    )
+    if os.getenv("LLM_CACHE", "true").lower() == "true"
+    else None
+)
+# Independent prompts issued within the window go out together
+llm_batcher = (
+    MicroBatcher(
+        window_ms=float(os.getenv("LLM_BATCH_WINDOW_MS", "5")),
+        max_batch=int(os.getenv("LLM_BATCH_MAX_SIZE", "16")),
+    )
+    if os.getenv("LLM_BATCHING", "true").lower() == "true"
+    else None
+)
+# Caps concurrent calls to the model server (0 disables); interactive chat
+# is admitted before batch evaluation, critical-path nodes before the reviewer
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))
+llm_limiter = (
+    LLMLimiter(
+        max_in_flight=LLM_MAX_IN_FLIGHT,
+        default_traffic=os.getenv("LLM_TRAFFIC", "interactive"),
+    )
+    if LLM_MAX_IN_FLIGHT > 0
+    else None
+)
+# Per-node models and Ollama settings as JSON, e.g. {"default": {"model":
+# "llama3.2:3b"}, "compiler": {"model": "llama3.1:8b"}, "reviewer":
+# {"keep_alive": "2m"}}; every node uses MODEL_NAME if unset
+llm_router = (
+    ModelRouter.from_json(os.environ["LLM_ROUTES"]) if os.getenv("LLM_ROUTES") else None
+)
+# USD per million (prompt, completion) tokens by model, e.g. {"gpt-4o-mini": [0.15, 0.6]}
+LLM_PRICES = {
+    model: tuple(price)
+    for model, price in json.loads(os.getenv("LLM_PRICES", "{}")).items()
+}
+# Seconds (-1 keeps the model loaded) or a duration like "30m"
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE") or None
+if LLM_KEEP_ALIVE and LLM_KEEP_ALIVE.lstrip("-").isdigit():
+    LLM_KEEP_ALIVE = int(LLM_KEEP_ALIVE)
+# Sends slow calls to a second provider too (e.g. local Ollama behind the HF
+# router) once the primary is slower than its HEDGE_PERCENTILE first token
+HEDGE_PROVIDER = os.getenv("HEDGE_PROVIDER")
+llm_hedger = (
+    Hedger(
+        secondary=LLMWrapper(
+            provider=HEDGE_PROVIDER,
+            model=os.getenv("HEDGE_MODEL", MODEL_NAME),
+            temperature=0,
+            base_url=os.getenv("HEDGE_BASE_URL"),
+            api_key=os.getenv("HEDGE_API_KEY"),
+            keep_alive=LLM_KEEP_ALIVE,
+        ).chat_model,
+        secondary_provider=HEDGE_PROVIDER,
+        percentile=float(os.getenv("HEDGE_PERCENTILE", "95")),
+        initial_delay=float(os.getenv("HEDGE_INITIAL_DELAY_S", "2")),
+    )
+    if HEDGE_PROVIDER
+    else None
+)
 llm = LLMWrapper(
     provider=MODEL_PROVIDER,
     model=MODEL_NAME,
     temperature=0,
     base_url=BASE_URL,
     api_key=HF_TOKEN,
+    cache=llm_cache,
+    # Extraction nodes decode against their pydantic schema unless disabled
+    structured_output=os.getenv("STRUCTURED_OUTPUT", "true").lower() == "true",
+    batcher=llm_batcher,
+    # One HTTP pool to the model server, shared by every node's wrapper
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+    # Keeping the model loaded keeps its prompt prefix cache warm
+    keep_alive=LLM_KEEP_ALIVE,
+    num_ctx=int(os.environ["LLM_NUM_CTX"]) if os.getenv("LLM_NUM_CTX") else None,
+    router=llm_router,
+    limiter=llm_limiter,
+    hedger=llm_hedger,
+)
+# Reuses planner extractions for paraphrased requests; off unless enabled
+semantic_cache = (
+    SemanticPlanCache(
+        capacity=int(os.getenv("SEMANTIC_CACHE_CAPACITY", "512")),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75")),
+    )
+    if os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+    else None
+)
+node_cache = NodeCache(
+    db_path="checkpoints/node_cache.db",
+    max_entries=int(os.getenv("NODE_CACHE_MAX_ENTRIES", "2000")),
+    # Seconds before a node's cached result expires, e.g. {"flight_agent": 600};
+    # flight, hotel and activity searches expire within hours by default
+    node_ttls=json.loads(os.getenv("NODE_CACHE_TTLS", "{}")),
+)
+graph_registry = GraphRegistry(
+    llm=llm,
+    node_cache=node_cache,
+    # Selections are computed; the LLM only phrases the recommendation if enabled
+    llm_explanations=os.getenv("LLM_EXPLANATIONS", "false").lower() == "true",
+    # Facts are checked in code; the LLM reviewer only judges the prose if enabled
+    subjective_review=os.getenv("SUBJECTIVE_REVIEW", "false").lower() == "true",
+    # Rejected drafts are patched section by section unless disabled
+    patch_revisions=os.getenv("PATCH_REVISIONS", "true").lower() == "true",
+    semantic_cache=semantic_cache,
+    # Flight offers fetched from Amadeus; all of them are ranked
+    flight_max_results=int(os.getenv("FLIGHT_MAX_RESULTS", "20")),
 )
-agent_app = create_travel_agent_graph(llm=llm)
+# Default variant, used for state reads and edits; every variant shares its checkpointer
+agent_app = graph_registry.get()
 
 checkpoint_manager = CheckpointManager(checkpoint_dir="checkpoints")
 
@@ -54,35 +194,46 @@ class ChatRequest(BaseModel):
 
 class ConfigureRequest(BaseModel):
     session_id: str
-    with_reasoning: Optional[bool]
-    with_planner: Optional[bool]
-    with_tools: Optional[bool]
+    with_reasoning: bool | None
+    with_planner: bool | None
+    with_tools: bool | None
 
 
 class UpdatePlanRequest(BaseModel):
     session_id: str
-    destination: Optional[str] = None
-    departure_date: Optional[str] = None
-    arrival_date: Optional[str] = None
-    budget: Optional[float] = None
+    destination: str | None = None
+    departure_date: str | None = None
+    arrival_date: str | None = None
+    budget: float | None = None
 
 
 class CheckpointExportRequest(BaseModel):
     session_id: str
-    checkpoint_id: Optional[str] = None
+    checkpoint_id: str | None = None
     include_history: bool = False
 
 
 class CheckpointImportRequest(BaseModel):
     session_id: str
-    checkpoint_data: Dict[str, Any]
+    checkpoint_data: dict[str, Any]
     create_new_thread: bool = False
 
 
 class ReplayRequest(BaseModel):
     session_id: str
     checkpoint_id: str
-    message: Optional[str] = None
+    message: str | None = None
+
+
+class LimiterAcquireRequest(BaseModel):
+    node: str
+    owner: str
+    traffic: str | None = None
+    ttl_s: float = 600.0
+
+
+class LimiterReleaseRequest(BaseModel):
+    lease: str
 
 
 def serialize_state_for_frontend(state: dict) -> dict:
@@ -111,6 +262,7 @@ def serialize_state_for_frontend(state: dict) -> dict:
         "origin_name",
         "selected_flight_index",
         "selected_hotel_index",
+        "selected_activity_indices",
         "with_tools",
         "with_reasoning",
         "with_planner",
@@ -202,7 +354,7 @@ async def import_checkpoint(request: CheckpointImportRequest):
 @app.post("/checkpoint/upload")
 async def upload_checkpoint(
     file: UploadFile = File(...),
-    session_id: str = None,
+    session_id: str | None = None,
     create_new_thread: bool = False,
 ):
     try:
@@ -275,9 +427,7 @@ async def get_checkpoint_history(session_id: str):
                     ),
                     "next": list(state.next) if state.next else [],
                     "metadata": state.metadata,
-                    "created_at": (
-                        state.created_at if state.created_at else None
-                    ),
+                    "created_at": (state.created_at if state.created_at else None),
                     "state_preview": serialize_state_for_frontend(state.values),
                 }
             )
@@ -298,12 +448,14 @@ async def replay_checkpoint(request: ReplayRequest):
             }
         }
 
-        if request.message:
-            agent_app.invoke(
-                {"messages": [HumanMessage(content=request.message)]}, config=config
-            )
-        else:
-            agent_app.invoke(None, config=config)
+        graph = graph_registry.for_session(agent_app.get_state(config).values)
+        with tracer.run(request.session_id):
+            if request.message:
+                graph.invoke(
+                    {"messages": [HumanMessage(content=request.message)]}, config=config
+                )
+            else:
+                graph.invoke(None, config=config)
 
         final_state = agent_app.get_state(config)
         frontend_state = serialize_state_for_frontend(final_state.values)
@@ -317,6 +469,126 @@ async def replay_checkpoint(request: ReplayRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/cache/nodes")
+async def get_node_cache_stats():
+    return {
+        "status": "success",
+        "entries": node_cache.size(),
+        "max_entries": node_cache.max_entries,
+        "nodes": node_cache.stats(),
+    }
+
+
+@app.delete("/cache/nodes")
+async def clear_node_cache():
+    node_cache.clear()
+    return {"status": "success", "message": "Node cache cleared"}
+
+
+@app.get("/cache/llm")
+async def get_llm_cache_stats():
+    if llm_cache is None:
+        return {"status": "disabled"}
+    return {
+        "status": "success",
+        "entries": llm_cache.size(),
+        "max_entries": llm_cache.max_entries,
+        "nodes": llm_cache.stats(),
+    }
+
+
+@app.delete("/cache/llm")
+async def clear_llm_cache():
+    if llm_cache is not None:
+        llm_cache.clear()
+    return {"status": "success", "message": "LLM response cache cleared"}
+
+
+@app.get("/llm/routes")
+async def get_llm_routes():
+    return {
+        "status": "success",
+        "model": MODEL_NAME,
+        "provider": MODEL_PROVIDER,
+        "routes": llm_router.describe() if llm_router else {},
+    }
+
+
+@app.get("/llm/limiter/stats")
+async def get_llm_limiter_stats():
+    if llm_limiter is None:
+        return {"status": "disabled"}
+    return {"status": "success", **llm_limiter.stats()}
+
+
+# Admission for LLM calls made by other processes (the evaluation run), so
+# they queue in the same limiter as interactive chat
+@app.post("/llm/limiter/acquire")
+async def acquire_llm_slot(request: LimiterAcquireRequest):
+    if llm_limiter is None:
+        return {"lease": None}
+    lease = await llm_limiter.alease(
+        request.node, request.owner, request.traffic, request.ttl_s
+    )
+    return {"lease": lease}
+
+
+@app.post("/llm/limiter/release")
+async def release_llm_slot(request: LimiterReleaseRequest):
+    if llm_limiter is None:
+        return {"released": False}
+    return {"released": llm_limiter.release_lease(request.lease)}
+
+
+@app.get("/llm/hedge/stats")
+async def get_llm_hedge_stats():
+    if llm_hedger is None:
+        return {"status": "disabled"}
+    return {"status": "success", **llm_hedger.stats()}
+
+
+@app.get("/llm/batch/stats")
+async def get_llm_batch_stats():
+    if llm_batcher is None:
+        return {"status": "disabled"}
+    return {"status": "success", **llm_batcher.stats()}
+
+
+@app.get("/fast_path/stats")
+async def get_fast_path_stats():
+    return {"status": "success", "extractors": all_fast_path_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics_registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/trace/{thread_id}")
+async def get_trace(thread_id: str):
+    """Latest recorded run of a thread as Chrome trace JSON, viewable in Perfetto"""
+    trace_run = tracer.latest(thread_id)
+    if trace_run is None:
+        raise HTTPException(
+            status_code=404, detail=f"No trace recorded for {thread_id}"
+        )
+    return trace_run.to_chrome_trace()
+
+
+@app.get("/revision/stats")
+async def get_revision_stats():
+    return {"status": "success", "revisions": revision_stats.summary()}
+
+
+@app.get("/semantic_cache/stats")
+async def get_semantic_cache_stats():
+    if semantic_cache is None:
+        return {"status": "disabled"}
+    return {"status": "success", "semantic_cache": semantic_cache.stats()}
+
+
 @app.delete("/checkpoint/clear/{session_id}")
 async def clear_thread_checkpoints(session_id: str):
     try:
@@ -334,7 +606,9 @@ async def update_plan(request: UpdatePlanRequest):
 
     try:
         current_state = agent_app.get_state(config)
-        current_plan = current_state.values.get("plan") if current_state else None
+        current_values = current_state.values if current_state else {}
+        current_plan = current_values.get("plan")
+        changed_fields = set()
 
         if not current_plan:
             current_plan = PlanDetailsState(
@@ -344,6 +618,7 @@ async def update_plan(request: UpdatePlanRequest):
                 budget=request.budget,
             )
         else:
+            previous_plan = current_plan.model_copy()
             if request.destination is not None:
                 current_plan.destination = request.destination
             if request.departure_date is not None:
@@ -352,8 +627,13 @@ async def update_plan(request: UpdatePlanRequest):
                 current_plan.arrival_date = request.arrival_date
             if request.budget is not None:
                 current_plan.budget = request.budget
+            changed_fields = changed_plan_fields(previous_plan, current_plan)
 
-        agent_app.update_state(config, {"plan": current_plan})
+        # Only the results depending on the edited fields are discarded; the
+        # next turn re-runs those stages and reuses everything else.
+        update = invalidation_update(current_values, changed_fields)
+        update["plan"] = current_plan
+        agent_app.update_state(config, update)
         updated_state_frontend = serialize_state_for_frontend(
             agent_app.get_state(config).values
         )
@@ -373,9 +653,17 @@ async def configure_chat(request: ConfigureRequest):
     config = {"configurable": {"thread_id": request.session_id}}
 
     try:
+        current_values = agent_app.get_state(config).values or {}
+        changed_fields = {
+            field
+            for field in ["with_reasoning", "with_tools", "with_planner"]
+            if field in current_values
+            and current_values[field] != getattr(request, field)
+        }
         agent_app.update_state(
             config,
             {
+                **invalidation_update(current_values, changed_fields),
                 "with_reasoning": request.with_reasoning,
                 "with_tools": request.with_tools,
                 "with_planner": request.with_planner,
@@ -389,64 +677,80 @@ async def configure_chat(request: ConfigureRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+GRAPH_NODES = [
+    "planner_agent",
+    "city_resolver",
+    "passenger_agent",
+    "flight_agent",
+    "hotel_agent",
+    "activity_agent",
+    "budget_optimizer",
+    "compiler",
+    "reviewer",
+]
+
+
 async def stream_agent_events(
     message: str, session_id: str
 ) -> AsyncGenerator[str, None]:
     """Stream events from LangGraph execution"""
 
+    SSE_SESSIONS.inc(outcome="started")
+    SSE_ACTIVE.inc()
+
     tracker = TokenUsageTracker(
-        scenario_id=session_id, model_name=MODEL_NAME, model_provider=MODEL_PROVIDER
+        scenario_id=session_id,
+        model_name=MODEL_NAME,
+        model_provider=MODEL_PROVIDER,
+        prices=LLM_PRICES,
     )
 
     config = {
         "configurable": {"thread_id": session_id},
         "callbacks": [tracker],
+        "metadata": {"traffic": "interactive"},
     }
 
     snapshot = agent_app.get_state(config)
     existing_messages = snapshot.values.get("messages", []) if snapshot.values else []
     updated_messages = existing_messages + [HumanMessage(content=message)]
+    graph = graph_registry.for_session(snapshot.values)
+    # Each itinerary generation restarts the streamed draft on the client
+    stream_run_id = None
 
     try:
-        async for event in agent_app.astream_events(
-            {"messages": updated_messages}, config=config, version="v1"
-        ):
-            event_type = event.get("event")
-
-            if event_type == "on_chain_start":
-                name = event.get("name", "")
-                if name in [
-                    "planner_agent",
-                    "city_resolver",
-                    "passenger_agent",
-                    "flight_agent",
-                    "hotel_agent",
-                    "activity_agent",
-                    "compiler",
-                    "reviewer",
-                ]:
-                    yield f"data: {json.dumps({'type': 'node_start', 'node': name})}\n\n"
-
-            elif event_type == "on_chain_end":
-                name = event.get("name", "")
-                if name in [
-                    "planner_agent",
-                    "city_resolver",
-                    "passenger_agent",
-                    "flight_agent",
-                    "hotel_agent",
-                    "activity_agent",
-                    "compiler",
-                    "reviewer",
-                ]:
-                    current_state = agent_app.get_state(config)
-                    if current_state.values:
-                        frontend_state = serialize_state_for_frontend(
-                            current_state.values
-                        )
-                        yield f"data: {json.dumps({'type': 'state_update', 'state': frontend_state})}\n\n"
-
-                    yield f"data: {json.dumps({'type': 'node_end', 'node': name})}\n\n"
+        with tracer.run(session_id):
+            async for event in graph.astream_events(
+                {"messages": updated_messages}, config=config, version="v1"
+            ):
+                event_type = event.get("event")
+
+                if event_type == "on_chain_start":
+                    name = event.get("name", "")
+                    if name in GRAPH_NODES:
+                        yield f"data: {json.dumps({'type': 'node_start', 'node': name})}\n\n"
+
+                elif event_type == "on_chain_end":
+                    name = event.get("name", "")
+                    if name in GRAPH_NODES:
+                        current_state = agent_app.get_state(config)
+                        if current_state.values:
+                            frontend_state = serialize_state_for_frontend(
+                                current_state.values
+                            )
+                            yield f"data: {json.dumps({'type': 'state_update', 'state': frontend_state})}\n\n"
+
+                        yield f"data: {json.dumps({'type': 'node_end', 'node': name})}\n\n"
+
+                elif event_type == "on_chat_model_stream" and STREAM_TAG in event.get(
+                    "tags", []
+                ):
+                    chunk = event.get("data", {}).get("chunk")
+                    content = getattr(chunk, "content", "")
+                    if content:
+                        reset = event.get("run_id") != stream_run_id
+                        stream_run_id = event.get("run_id")
+                        yield f"data: {json.dumps({'type': 'assistant_delta', 'content': content, 'reset': reset})}\n\n"
 
         final_state = agent_app.get_state(config)
 
@@ -479,14 +783,26 @@ async def stream_agent_events(
 
                 yield f"data: {json.dumps({'type': 'complete'})}\n\n"
 
+        SSE_SESSIONS.inc(outcome="completed")
+
     except Exception as e:
+        SSE_SESSIONS.inc(outcome="error")
         print(f"Error in stream: {e}")
         import traceback
 
         traceback.print_exc()
-        error_msg = f"⚠️ Error: {str(e)}"
+        error_msg = f"⚠️ Error: {e!s}"
         yield f"data: {json.dumps({'type': 'error', 'content': error_msg})}\n\n"
 
+    finally:
+        SSE_ACTIVE.dec()
+        for route, usage in tracker.summary().items():
+            print(
+                f"💰 {route}: {usage['calls']} call(s), "
+                f"{usage['prompt_tokens']}+{usage['completion_tokens']} tokens, "
+                f"{usage['avg_latency_ms']:.0f} ms avg, ${usage['cost_usd']:.4f}"
+            )
+
 
 @app.post("/chat/stream")
 async def chat_stream_endpoint(request: ChatRequest):
@@ -502,12 +818,21 @@ async def chat_stream_endpoint(request: ChatRequest):
 
 
 async def stream_evaluation_events(
-    use_planner: bool = True, use_tools: bool = True, use_reasoning: bool = True
+    use_planner: bool = True,
+    use_tools: bool = True,
+    use_reasoning: bool = True,
+    limiter_url: str | None = None,
 ):
+    process = None
     try:
         env = os.environ.copy()
         project_root = str(Path.cwd())
         env["PYTHONPATH"] = f"{project_root}{os.pathsep}{env.get('PYTHONPATH', '')}"
+        # The evaluation process takes its admission slots from this process's
+        # limiter as batch traffic, so its calls queue behind interactive ones
+        env["LLM_TRAFFIC"] = "batch"
+        if llm_limiter is not None and limiter_url:
+            env["LLM_LIMITER_URL"] = limiter_url
 
         cmd = [sys.executable, "tests/test_agent.py"]
         if use_planner:
@@ -545,14 +870,27 @@ async def stream_evaluation_events(
             yield f"data: {json.dumps({'type': 'error', 'message': f'Evaluation failed with exit code {exit_code}.'})}\n\n"
     except Exception as e:
         yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+    finally:
+        # Slots the process still held when it exited or was killed
+        if process is not None and llm_limiter is not None:
+            llm_limiter.release_owner(str(process.pid))
 
 
 @app.get("/run_evaluation_stream")
 async def run_evaluation_stream_endpoint(
-    use_planner: bool = True, use_tools: bool = True, use_reasoning: bool = True
+    request: Request,
+    use_planner: bool = True,
+    use_tools: bool = True,
+    use_reasoning: bool = True,
 ):
+    # The socket this server listens on, reachable from a local subprocess
+    host, port = request.scope.get("server") or ("127.0.0.1", 8000)
+    if host in ("0.0.0.0", "::"):
+        host = "127.0.0.1"
     return StreamingResponse(
-        stream_evaluation_events(use_planner, use_tools, use_reasoning),
+        stream_evaluation_events(
+            use_planner, use_tools, use_reasoning, limiter_url=f"http://{host}:{port}"
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -607,16 +945,22 @@ async def get_prompts():
 
 
 from src.tools.exchange_rate import GetExchangeRateTool
+
 exchange_rate_tool = GetExchangeRateTool()
 
+
 @app.get("/exchange_rate")
 async def get_exchange_rate(from_currency: str, to_currency: str):
     try:
         rate_result = exchange_rate_tool._run(from_currency, to_currency)
-        return {"rate": rate_result["rate"], "from": rate_result["from_currency"], "to": rate_result["to_currency"]}
+        return {
+            "rate": rate_result["rate"],
+            "from": rate_result["from_currency"],
+            "to": rate_result["to_currency"],
+        }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
+    except Exception:
         raise HTTPException(status_code=500, detail="Failed to fetch exchange rate")
 
 
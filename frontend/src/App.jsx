@@ -27,6 +27,7 @@ const INITIAL_AGENT_STATE = {
   hotel_data: null,
   selected_hotel_index: null,
   activity_data: null,
+  selected_activity_indices: null,
   current_node: null,
 };
 
@@ -279,6 +280,10 @@ export default function App() {
                       : step
                   )
                 );
+              } else if (data.type === "assistant_delta") {
+                setCurrentStreamingMessage((prev) =>
+                  (data.reset ? "" : prev) + data.content
+                );
               } else if (data.type === "state_update") {
                 setAgentState((prev) => ({ ...prev, ...data.state }));
               } else if (data.type === "assistant_message") {
@@ -7,6 +7,7 @@ const nodeDisplayNames = {
   flight_agent: "Searching Flights",
   hotel_agent: "Finding Hotels",
   activity_agent: "Discovering Activities",
+  budget_optimizer: "Balancing Budget",
   compiler: "Compiling Itinerary",
   reviewer: "Reviewing Plan",
 };
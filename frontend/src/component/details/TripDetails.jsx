@@ -23,6 +23,12 @@ export const TripDetailsSidebar = ({
 }) => {
   const plan = agentState.plan;
   const hasState = plan || agentState.adults || agentState.flight_data;
+  // Only the activities the budget optimizer kept are part of the trip
+  const activities = agentState.selected_activity_indices
+    ? (agentState.activity_data || []).filter((_, i) =>
+        agentState.selected_activity_indices.includes(i)
+      )
+    : agentState.activity_data;
 
   // Ref specifically for the hidden print container
   const contentRef = useRef(null);
@@ -83,7 +89,7 @@ export const TripDetailsSidebar = ({
               selectedFlightIndex={agentState.selected_flight_index}
               hotels={agentState.hotel_data?.hotels}
               selectedHotelIndex={agentState.selected_hotel_index}
-              activities={agentState.activity_data}
+              activities={activities}
             />
           </div>
         </>
@@ -124,11 +130,11 @@ export const TripDetailsSidebar = ({
                                     />          </div>
         )}
 
-      {agentState.activity_data &&
-        agentState.activity_data.length > 0 && (
+      {activities &&
+        activities.length > 0 && (
           <div className="print-avoid-break">
             <ActivitiesBlock 
-              activityData={agentState.activity_data} 
+              activityData={activities} 
               defaultOpen={isPrinting} // <--- FORCE OPEN IF PRINTING
               selectedCurrency={selectedCurrency}
               usdToEurRate={usdToEurRate}
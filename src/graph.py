@@ -1,33 +1,50 @@
 import functools
 import os
-from langgraph.graph import StateGraph, START, END
-from langgraph.checkpoint.sqlite import SqliteSaver
-from langgraph.checkpoint.memory import InMemorySaver
-from src.llm import LLMWrapper
+import threading
+from collections.abc import Callable
+from typing import Any
 
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
 
+from src.llm import LLMWrapper
 from src.nodes import (
     activity_node,
-    hotel_node,
-    planner_node,
+    budget_optimizer_node,
+    check_review_condition_node,
     city_resolver_node,
-    flight_node,
     compiler_node,
-    reviewer_node,
-    check_review_condition_node,
+    flight_node,
+    hotel_node,
     passenger_node,
+    planner_node,
+    reviewer_node,
 )
-from src.tools import AmadeusAuth
 from src.states import AgentState
+from src.tools import AmadeusAuth
+from src.utils.metrics import timed_node
+from src.utils.node_cache import NodeCache, memoize_node
+from src.utils.ranking import FlightScoringWeights, HotelScoringWeights
+from src.utils.semantic_cache import SemanticPlanCache
 
 
 def create_travel_agent_graph(
     llm: LLMWrapper,
     use_planner: bool = True,
     use_tools: bool = True,
-    force_reasoning: bool = None,
+    force_reasoning: bool | None = None,
     use_persistent_checkpointer: bool = True,
     checkpoint_db_path: str = "checkpoints/checkpoints.db",
+    node_cache: NodeCache | None = None,
+    checkpointer: BaseCheckpointSaver | None = None,
+    llm_explanations: bool = False,
+    flight_weights: FlightScoringWeights | None = None,
+    hotel_weights: HotelScoringWeights | None = None,
+    subjective_review: bool = False,
+    patch_revisions: bool = True,
+    semantic_cache: SemanticPlanCache | None = None,
+    flight_max_results: int = 20,
 ):
     AMADEUS_API_KEY = os.getenv("AMADEUS_API_KEY", "")
     AMADEUS_SECRET_KEY = os.getenv("AMADEUS_SECRET_KEY", "")
@@ -40,25 +57,21 @@ def create_travel_agent_graph(
 
     def route_after_flight(state: AgentState):
         plan = state.plan
-        if state.needs_user_input:
-            return "compiler"
-        if not plan or not plan.need_hotel:
+        if state.needs_user_input or not plan:
             return "compiler"
         if plan.need_hotel:
             return "hotel_agent"
         if plan.need_activities:
             return "activity_agent"
-        return "compiler"
+        return "budget_optimizer"
 
     def route_after_hotel(state: AgentState):
         plan = state.plan
-        if state.needs_user_input:
-            return "compiler"
-        if not plan or not plan.need_activities:
+        if state.needs_user_input or not plan:
             return "compiler"
         if plan.need_activities:
             return "activity_agent"
-        return "compiler"
+        return "budget_optimizer"
 
     def route_after_compiler(state: AgentState):
         if force_reasoning is not None:
@@ -68,55 +81,111 @@ def create_travel_agent_graph(
             return "reviewer"
         return END
 
+    def cached(name: str, node: Callable, bypass=None) -> Callable:
+        return memoize_node(name, node, node_cache, bypass) if node_cache else node
+
+    def is_revision(state: AgentState) -> bool:
+        # Patching depends on the rejected draft, which is not a cache input
+        return bool(state.feedback and "REJECT" in state.feedback)
+
     workflow = StateGraph(AgentState)
 
-    workflow.add_node(
+    def add_node(name: str, node: Callable) -> None:
+        workflow.add_node(name, timed_node(name, node))
+
+    add_node(
         "city_resolver",
-        functools.partial(
-            city_resolver_node,
-            llm=llm.with_config(tags=["city_resolver"]),
-            amadeus_auth=amadeus_auth,
+        cached(
+            "city_resolver",
+            functools.partial(
+                city_resolver_node,
+                llm=llm.with_config(tags=["city_resolver"]),
+                amadeus_auth=amadeus_auth,
+            ),
         ),
     )
-    workflow.add_node(
+    add_node(
         "passenger_agent",
-        functools.partial(
-            passenger_node, llm=llm.with_config(tags=["passenger_agent"])
+        cached(
+            "passenger_agent",
+            functools.partial(
+                passenger_node, llm=llm.with_config(tags=["passenger_agent"])
+            ),
         ),
     )
-    workflow.add_node(
+    add_node(
         "flight_agent",
-        functools.partial(
-            flight_node,
-            llm=llm.with_config(tags=["flight_agent"]),
-            amadeus_auth=amadeus_auth,
+        cached(
+            "flight_agent",
+            functools.partial(
+                flight_node,
+                llm=llm.with_config(tags=["flight_agent"]),
+                amadeus_auth=amadeus_auth,
+                weights=flight_weights,
+                llm_explanations=llm_explanations,
+                max_results=flight_max_results,
+            ),
         ),
     )
-    workflow.add_node(
+    add_node(
         "hotel_agent",
-        functools.partial(
-            hotel_node,
-            amadeus_auth=amadeus_auth,
-            llm=llm.with_config(tags=["hotel_agent"]),
+        cached(
+            "hotel_agent",
+            functools.partial(
+                hotel_node,
+                amadeus_auth=amadeus_auth,
+                llm=llm.with_config(tags=["hotel_agent"]),
+                weights=hotel_weights,
+                llm_explanations=llm_explanations,
+            ),
+        ),
+    )
+    add_node(
+        "activity_agent",
+        cached(
+            "activity_agent",
+            functools.partial(activity_node, amadeus_auth=amadeus_auth),
         ),
     )
-    workflow.add_node(
-        "activity_agent", functools.partial(activity_node, amadeus_auth=amadeus_auth)
+    add_node(
+        "budget_optimizer",
+        cached(
+            "budget_optimizer",
+            functools.partial(
+                budget_optimizer_node,
+                flight_weights=flight_weights,
+                hotel_weights=hotel_weights,
+            ),
+        ),
     )
-    workflow.add_node(
+    add_node(
         "compiler",
-        functools.partial(compiler_node, llm=llm.with_config(tags=["compiler"])),
+        cached(
+            "compiler",
+            functools.partial(
+                compiler_node,
+                llm=llm.with_config(tags=["compiler"]),
+                patch_revisions=patch_revisions,
+            ),
+            bypass=is_revision,
+        ),
     )
-    workflow.add_node(
+    add_node(
         "reviewer",
-        functools.partial(reviewer_node, llm=llm.with_config(tags=["reviewer"])),
+        functools.partial(
+            reviewer_node,
+            llm=llm.with_config(tags=["reviewer"]),
+            subjective=subjective_review,
+        ),
     )
 
     if use_planner:
-        workflow.add_node(
+        add_node(
             "planner_agent",
             functools.partial(
-                planner_node, llm=llm.with_config(tags=["planner_agent"])
+                planner_node,
+                llm=llm.with_config(tags=["planner_agent"]),
+                semantic_cache=semantic_cache,
             ),
         )
         workflow.add_edge(START, "planner_agent")
@@ -130,12 +199,15 @@ def create_travel_agent_graph(
     workflow.add_conditional_edges(
         "flight_agent",
         route_after_flight,
-        ["hotel_agent", "activity_agent", "compiler"],
+        ["hotel_agent", "activity_agent", "budget_optimizer", "compiler"],
     )
     workflow.add_conditional_edges(
-        "hotel_agent", route_after_hotel, ["activity_agent", "compiler"]
+        "hotel_agent",
+        route_after_hotel,
+        ["activity_agent", "budget_optimizer", "compiler"],
     )
-    workflow.add_edge("activity_agent", "compiler")
+    workflow.add_edge("activity_agent", "budget_optimizer")
+    workflow.add_edge("budget_optimizer", "compiler")
 
     workflow.add_conditional_edges(
         "compiler", route_after_compiler, {"reviewer": "reviewer", END: END}
@@ -151,7 +223,85 @@ def create_travel_agent_graph(
     #     checkpointer = AsyncSqliteSaver(conn)
     #     print(f"Using persistent SQLite checkpointer at {checkpoint_db_path}")
     # else:
-    checkpointer = InMemorySaver()
-    print("Using in-memory checkpointer (not persistent)")
+    if checkpointer is None:
+        checkpointer = InMemorySaver()
+        print("Using in-memory checkpointer (not persistent)")
 
     return workflow.compile(checkpointer=checkpointer)
+
+
+class GraphRegistry:
+    """
+    Lazily compiles each graph variant once and hands out the one matching a
+    session's configuration. All variants share a single checkpointer, so a
+    thread can switch modes between turns without losing its state.
+    """
+
+    def __init__(
+        self,
+        llm: LLMWrapper,
+        node_cache: NodeCache | None = None,
+        checkpointer: BaseCheckpointSaver | None = None,
+        llm_explanations: bool = False,
+        flight_weights: FlightScoringWeights | None = None,
+        hotel_weights: HotelScoringWeights | None = None,
+        subjective_review: bool = False,
+        patch_revisions: bool = True,
+        semantic_cache: SemanticPlanCache | None = None,
+        flight_max_results: int = 20,
+    ):
+        self.llm = llm
+        self.node_cache = node_cache
+        self.checkpointer = checkpointer or InMemorySaver()
+        self.llm_explanations = llm_explanations
+        self.flight_weights = flight_weights
+        self.hotel_weights = hotel_weights
+        self.subjective_review = subjective_review
+        self.patch_revisions = patch_revisions
+        self.semantic_cache = semantic_cache
+        self.flight_max_results = flight_max_results
+        self._variants: dict[tuple[bool, bool, bool | None], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        use_planner: bool = True,
+        use_tools: bool = True,
+        force_reasoning: bool | None = None,
+    ):
+        key = (use_planner, use_tools, force_reasoning)
+        graph = self._variants.get(key)
+        if graph is None:
+            with self._lock:
+                graph = self._variants.get(key)
+                if graph is None:
+                    print(
+                        f"Compiling graph variant planner={use_planner}, tools={use_tools}, reasoning={force_reasoning}"
+                    )
+                    graph = create_travel_agent_graph(
+                        llm=self.llm,
+                        use_planner=use_planner,
+                        use_tools=use_tools,
+                        force_reasoning=force_reasoning,
+                        node_cache=self.node_cache,
+                        checkpointer=self.checkpointer,
+                        llm_explanations=self.llm_explanations,
+                        flight_weights=self.flight_weights,
+                        hotel_weights=self.hotel_weights,
+                        subjective_review=self.subjective_review,
+                        patch_revisions=self.patch_revisions,
+                        semantic_cache=self.semantic_cache,
+                        flight_max_results=self.flight_max_results,
+                    )
+                    self._variants[key] = graph
+        return graph
+
+    def for_session(self, values: dict[str, Any] | None):
+        """Picks the variant for a thread from its stored with_planner/with_tools flags"""
+        values = values or {}
+        with_planner = values.get("with_planner")
+        with_tools = values.get("with_tools")
+        return self.get(
+            use_planner=True if with_planner is None else bool(with_planner),
+            use_tools=True if with_tools is None else bool(with_tools),
+        )
@@ -1,3 +1,21 @@
-from .llm import LLMWrapper, LLMResponse
+from .batching import MicroBatcher
+from .cache import LLMResponseCache
+from .hedging import Hedger
+from .limiter import LLMLimiter, RemoteLimiter
+from .llm import LLMResponse, LLMWrapper
+from .routing import ModelRoute, ModelRouter
+from .structured import parse_failure_rates, parse_structured
 
-__all__ = ["LLMWrapper", "LLMResponse"]
+__all__ = [
+    "Hedger",
+    "LLMLimiter",
+    "LLMResponse",
+    "LLMResponseCache",
+    "LLMWrapper",
+    "MicroBatcher",
+    "ModelRoute",
+    "ModelRouter",
+    "RemoteLimiter",
+    "parse_failure_rates",
+    "parse_structured",
+]
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from src.utils.metrics import Histogram, registry
+
+BATCH_SIZE: Histogram = registry.register(
+    Histogram(
+        "travel_agent_llm_batch_size",
+        "LLM requests sent together by the micro-batcher",
+        buckets=(1, 2, 4, 8, 16, 32),
+    )
+)
+
+
+class _Pending:
+    __slots__ = ("client", "config", "future", "kwargs", "messages")
+
+    def __init__(
+        self,
+        client: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        kwargs: dict[str, Any],
+    ):
+        self.client = client
+        self.messages = messages
+        self.config = config
+        self.kwargs = kwargs
+        self.future: Future = Future()
+
+    def group(self) -> tuple[int, str]:
+        return id(self.client), json.dumps(self.kwargs, sort_keys=True, default=str)
+
+
+class MicroBatcher:
+    """
+    Collects independent LLM requests issued within `window_ms` of each
+    other, from one run or across sessions, and sends them together.
+
+    Requests for the same client and call options go out as one `batch`
+    call, which LangChain runs concurrently for providers without a native
+    batch endpoint (Ollama, OpenAI chat). Each caller gets a future for its
+    own answer.
+    """
+
+    def __init__(
+        self, window_ms: float = 5.0, max_batch: int = 16, max_workers: int = 8
+    ):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.requests = 0
+        self._pending: list[_Pending] = []
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="llm-batch"
+        )
+        self._worker = threading.Thread(
+            target=self._run, name="llm-batcher", daemon=True
+        )
+        self._worker.start()
+
+    def submit(
+        self,
+        client: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None = None,
+        **kwargs: Any,
+    ) -> Future:
+        """Queues a request; the future resolves to the client's message"""
+        pending = _Pending(client, messages, config, kwargs)
+        with self._condition:
+            self._pending.append(pending)
+            self._condition.notify()
+        return pending.future
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Hold the first request for the window so others can join it
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[: self.max_batch]
+                del self._pending[: self.max_batch]
+
+            groups: dict[tuple[int, str], list[_Pending]] = {}
+            for pending in batch:
+                groups.setdefault(pending.group(), []).append(pending)
+            for group in groups.values():
+                self._executor.submit(self._send, group)
+
+    def _send(self, group: list[_Pending]) -> None:
+        with self._condition:
+            self.batches += 1
+            self.requests += len(group)
+        BATCH_SIZE.observe(len(group))
+        first = group[0]
+        try:
+            results = first.client.batch(
+                [pending.messages for pending in group],
+                [pending.config or {} for pending in group],
+                return_exceptions=True,
+                **first.kwargs,
+            )
+        except Exception as e:
+            results = [e] * len(group)
+
+        for pending, result in zip(group, results):
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": (
+                round(self.requests / self.batches, 2) if self.batches else 0.0
+            ),
+        }
@@ -0,0 +1,95 @@
+import functools
+import hashlib
+import json
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+from src.utils.metrics import Counter, registry
+from src.utils.sqlite_lru import SQLiteLRUCache
+
+LLM_CACHE_LOOKUPS: Counter = registry.register(
+    Counter(
+        "travel_agent_llm_cache_lookups_total",
+        "LLM response cache lookups by node and result (hit, miss)",
+        ["node", "result"],
+    )
+)
+
+
+def normalize_messages(messages: list[BaseMessage]) -> list[tuple[str, str]]:
+    """Message type and content with whitespace collapsed, so re-indented prompts still match"""
+    return [
+        (message.type, " ".join(str(message.content).split())) for message in messages
+    ]
+
+
+@functools.cache
+def schema_fingerprint(schema: type[BaseModel]) -> str:
+    """Name and JSON schema hash, so answers cached for an older schema miss"""
+    encoded = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return (
+        f"{schema.__name__}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:16]}"
+    )
+
+
+class LLMResponseCache(SQLiteLRUCache):
+    """
+    Persistent exact-match cache of LLM responses, only valid for
+    deterministic (temperature 0) calls.
+
+    Keys hash the provider, model, temperature, token limits, normalized
+    messages and, for structured calls, the response schema. The
+    SQLite database runs in WAL mode so API workers and eval runs can read
+    while another process writes; entries expire after `ttl_seconds` and the
+    least recently used ones are evicted beyond `max_entries`.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "checkpoints/llm_cache.db",
+        max_entries: int = 5000,
+        ttl_seconds: float | None = None,
+    ):
+        super().__init__(db_path, "llm_cache", max_entries, ttl_seconds, wal=True)
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        temperature: float,
+        messages: list[BaseMessage],
+        output_format: str | None = None,
+        max_tokens: int | None = None,
+        num_ctx: int | None = None,
+    ) -> str:
+        payload = {
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "messages": normalize_messages(messages),
+        }
+        if output_format:
+            payload["output_format"] = output_format
+        # Limits that can truncate the answer
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if num_ctx is not None:
+            payload["num_ctx"] = num_ctx
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _record(self, node: str, hit: bool) -> None:
+        super()._record(node, hit)
+        LLM_CACHE_LOOKUPS.inc(node=node, result="hit" if hit else "miss")
+
+    def get(self, key: str, node: str = "unknown") -> tuple[str, dict[str, Any]] | None:
+        """Cached content and usage metadata, or None"""
+        value = self._lookup(key, node, self.ttl_seconds)
+        return (value["content"], value["usage"]) if value else None
+
+    def put(
+        self, key: str, model: str, content: str, usage: dict[str, Any] | None = None
+    ) -> None:
+        self._store(key, model, {"content": content, "usage": usage or {}})
@@ -0,0 +1,439 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from queue import Queue
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, LLMResult
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import (
+    ensure_config,
+    get_async_callback_manager_for_config,
+    get_callback_manager_for_config,
+)
+
+from src.utils.metrics import Counter, Histogram, registry
+
+HEDGES: Counter = registry.register(
+    Counter(
+        "travel_agent_llm_hedges_total",
+        "Hedged LLM calls by node and outcome (not_fired, primary, hedge, failover)",
+        ["node", "outcome"],
+    )
+)
+HEDGED_FIRST_TOKEN: Histogram = registry.register(
+    Histogram(
+        "travel_agent_llm_hedged_first_token_seconds",
+        "Time to the first token served by a hedged call, by winning provider",
+        ["node", "winner"],
+    )
+)
+
+_DONE = object()
+
+
+def _detached(config: RunnableConfig | None) -> RunnableConfig:
+    """
+    The caller's config without callbacks or tags: both racers would
+    otherwise report their chunks to them, and a streaming client would see
+    the loser's first chunk as a new run
+    """
+    return {**(config or {}), "callbacks": [], "tags": []}
+
+
+def _ls_metadata(client: Runnable) -> dict[str, Any]:
+    """The provider and model a chat model reports to tracers"""
+    try:
+        params = client._get_ls_params()
+    except Exception:
+        return {}
+    return {
+        key: params[key] for key in ("ls_provider", "ls_model_name") if key in params
+    }
+
+
+def _text(chunk: Any) -> str:
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+def _percentile(values: list[float], percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(int(len(ordered) * percentile / 100), len(ordered) - 1)
+    return ordered[index]
+
+
+class _Race:
+    """Shared state of the primary and hedge streams of one call"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.winner: str | None = None
+        self.closed = threading.Event()
+        self.clients: dict[str, Runnable] = {}
+        self.errors: dict[str, BaseException] = {}
+        self.first_token: dict[str, float] = {}
+        self.chunks: Queue = Queue()
+        self.start = time.perf_counter()
+
+
+class Hedger:
+    """
+    Races a slow primary provider against a secondary one.
+
+    A call streams from the primary. If no token has arrived after the
+    `percentile` of recent primary first-token latencies (`initial_delay`
+    until `min_samples` are known), the same request goes to the secondary.
+    The first stream to produce a token is served. The other one is closed
+    at its first chunk, since a blocked HTTP read cannot be interrupted;
+    the server then stops generating. A primary error before any token fires
+    the hedge at once. The racers run without the caller's callbacks; only
+    the winner's chunks are reported, as one chat model run of the caller.
+
+    `stream` races in threads for the sync paths; `astream` races as tasks
+    on the event loop for `ainvoke`, `astream` and `abatch`.
+    """
+
+    def __init__(
+        self,
+        secondary: Runnable,
+        secondary_provider: str,
+        percentile: float = 95.0,
+        initial_delay: float = 2.0,
+        min_delay: float = 0.2,
+        min_samples: int = 20,
+        window: int = 500,
+    ):
+        self.secondary = secondary
+        self.secondary_provider = secondary_provider
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._primary_latencies: deque = deque(maxlen=window)
+        self._served_latencies: deque = deque(maxlen=window)
+        self._outcomes: dict[str, int] = {
+            "not_fired": 0,
+            "primary": 0,
+            "hedge": 0,
+            "failover": 0,
+        }
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Seconds to wait for the primary's first token before hedging"""
+        with self._lock:
+            samples = list(self._primary_latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return max(_percentile(samples, self.percentile), self.min_delay)
+
+    def _race(
+        self,
+        race: _Race,
+        name: str,
+        client: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        kwargs: dict[str, Any],
+    ) -> None:
+        started = time.perf_counter()
+        stream = client.stream(messages, config, **kwargs)
+        try:
+            for chunk in stream:
+                with race.condition:
+                    self._record_first_token(race, name, started)
+                    if race.winner is None:
+                        race.winner = name
+                        race.condition.notify_all()
+                    if race.winner != name or race.closed.is_set():
+                        return
+                race.chunks.put(chunk)
+            with race.condition:
+                if race.winner is None:
+                    race.errors[name] = RuntimeError(
+                        f"{name} stream ended without a token"
+                    )
+                    race.condition.notify_all()
+                    return
+            if race.winner == name:
+                race.chunks.put(_DONE)
+        except Exception as e:
+            with race.condition:
+                race.errors[name] = e
+                race.condition.notify_all()
+            if race.winner == name:
+                race.chunks.put(e)
+        finally:
+            # Closing the losing stream drops its HTTP response
+            stream.close()
+
+    def _record_first_token(self, race: _Race, name: str, started: float) -> None:
+        if name not in race.first_token:
+            race.first_token[name] = time.perf_counter() - started
+            if name == "primary":
+                with self._lock:
+                    self._primary_latencies.append(race.first_token[name])
+
+    def _settle(self, race: _Race, node: str, fire: bool, failover: bool) -> None:
+        """Records the outcome once a winner is known"""
+        served = time.perf_counter() - race.start
+        outcome = "not_fired" if not fire else "failover" if failover else race.winner
+        with self._lock:
+            self._outcomes[outcome] += 1
+            self._served_latencies.append(served)
+        HEDGES.inc(node=node, outcome=outcome)
+        HEDGED_FIRST_TOKEN.observe(served, node=node, winner=race.winner)
+        if outcome == "hedge":
+            print(f"   🏁 {node}: hedge answered first after {served:.2f}s")
+
+    def _start_run(
+        self, race: _Race, config: RunnableConfig, messages: list[BaseMessage]
+    ):
+        client = race.clients[race.winner]
+        manager = get_callback_manager_for_config(config)
+        manager.add_metadata(_ls_metadata(client), inherit=False)
+        return manager.on_chat_model_start({}, [messages], name=type(client).__name__)[
+            0
+        ]
+
+    async def _astart_run(
+        self, race: _Race, config: RunnableConfig, messages: list[BaseMessage]
+    ):
+        client = race.clients[race.winner]
+        manager = get_async_callback_manager_for_config(config)
+        manager.add_metadata(_ls_metadata(client), inherit=False)
+        return (
+            await manager.on_chat_model_start(
+                {}, [messages], name=type(client).__name__
+            )
+        )[0]
+
+    def stream(
+        self,
+        primary: Runnable,
+        secondary: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        node: str,
+        primary_kwargs: dict[str, Any] | None = None,
+        secondary_kwargs: dict[str, Any] | None = None,
+    ) -> Iterator[Any]:
+        """Yields the chunks of whichever provider produces a token first"""
+        config = ensure_config(config)
+        race_config = _detached(config)
+        race = _Race()
+        racers = [("primary", primary, primary_kwargs or {})]
+
+        def start(name: str, client: Runnable, kwargs: dict[str, Any]) -> None:
+            race.clients[name] = client
+            threading.Thread(
+                target=self._race,
+                args=(race, name, client, messages, race_config, kwargs),
+                name=f"llm-hedge-{name}",
+                daemon=True,
+            ).start()
+
+        start(*racers[0])
+        delay = self.delay()
+        with race.condition:
+            race.condition.wait_for(
+                lambda: race.winner is not None or "primary" in race.errors,
+                timeout=delay,
+            )
+            fire = race.winner is None
+            failover = "primary" in race.errors
+        if fire:
+            racers.append(("hedge", secondary, secondary_kwargs or {}))
+            start(*racers[-1])
+            if not failover:
+                print(
+                    f"   🏁 {node}: no token after {delay:.2f}s, hedging to {self.secondary_provider}"
+                )
+
+        with race.condition:
+            race.condition.wait_for(
+                lambda: race.winner is not None or len(race.errors) == len(racers)
+            )
+            winner = race.winner
+        if winner is None:
+            raise race.errors["primary"]
+
+        self._settle(race, node, fire, failover)
+
+        run = self._start_run(race, config, messages)
+        message = None
+        try:
+            while True:
+                item = race.chunks.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                message = item if message is None else message + item
+                run.on_llm_new_token(
+                    _text(item), chunk=ChatGenerationChunk(message=item)
+                )
+                yield item
+        except Exception as e:
+            run.on_llm_error(e)
+            raise
+        finally:
+            # A consumer that stops early stops the winner at its next chunk
+            race.closed.set()
+        run.on_llm_end(LLMResult(generations=[[ChatGenerationChunk(message=message)]]))
+
+    async def _arace(
+        self,
+        race: _Race,
+        changed: asyncio.Event,
+        chunks: asyncio.Queue,
+        name: str,
+        client: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        kwargs: dict[str, Any],
+    ) -> None:
+        started = time.perf_counter()
+        stream = client.astream(messages, config, **kwargs)
+        try:
+            async for chunk in stream:
+                self._record_first_token(race, name, started)
+                if race.winner is None:
+                    race.winner = name
+                    changed.set()
+                if race.winner != name:
+                    return
+                chunks.put_nowait(chunk)
+            if race.winner is None:
+                race.errors[name] = RuntimeError(f"{name} stream ended without a token")
+                changed.set()
+                return
+            if race.winner == name:
+                chunks.put_nowait(_DONE)
+        except Exception as e:
+            race.errors[name] = e
+            changed.set()
+            if race.winner == name:
+                chunks.put_nowait(e)
+        finally:
+            await stream.aclose()
+
+    async def astream(
+        self,
+        primary: Runnable,
+        secondary: Runnable,
+        messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        node: str,
+        primary_kwargs: dict[str, Any] | None = None,
+        secondary_kwargs: dict[str, Any] | None = None,
+    ) -> AsyncIterator[Any]:
+        """`stream` for the event loop: the providers race as tasks"""
+        config = ensure_config(config)
+        race_config = _detached(config)
+        race = _Race()
+        changed = asyncio.Event()
+        chunks: asyncio.Queue = asyncio.Queue()
+        tasks: dict[str, asyncio.Task] = {}
+
+        def start(name: str, client: Runnable, kwargs: dict[str, Any] | None) -> None:
+            race.clients[name] = client
+            tasks[name] = asyncio.create_task(
+                self._arace(
+                    race,
+                    changed,
+                    chunks,
+                    name,
+                    client,
+                    messages,
+                    race_config,
+                    kwargs or {},
+                )
+            )
+
+        async def settled(done) -> None:
+            while not done():
+                changed.clear()
+                await changed.wait()
+
+        try:
+            start("primary", primary, primary_kwargs)
+            delay = self.delay()
+            try:
+                await asyncio.wait_for(
+                    settled(
+                        lambda: race.winner is not None or "primary" in race.errors
+                    ),
+                    delay,
+                )
+            except TimeoutError:
+                pass
+            fire = race.winner is None
+            failover = "primary" in race.errors
+            if fire:
+                start("hedge", secondary, secondary_kwargs)
+                if not failover:
+                    print(
+                        f"   🏁 {node}: no token after {delay:.2f}s, hedging to {self.secondary_provider}"
+                    )
+
+            await settled(
+                lambda: race.winner is not None or len(race.errors) == len(tasks)
+            )
+            if race.winner is None:
+                raise race.errors["primary"]
+            self._settle(race, node, fire, failover)
+
+            run = await self._astart_run(race, config, messages)
+            message = None
+            try:
+                while True:
+                    item = await chunks.get()
+                    if item is _DONE:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    message = item if message is None else message + item
+                    await run.on_llm_new_token(
+                        _text(item), chunk=ChatGenerationChunk(message=item)
+                    )
+                    yield item
+            except Exception as e:
+                await run.on_llm_error(e)
+                raise
+            await run.on_llm_end(
+                LLMResult(generations=[[ChatGenerationChunk(message=message)]])
+            )
+        finally:
+            # A caller that stops early must not leave the winner streaming;
+            # the loser still closes itself at its first chunk
+            if race.winner in tasks:
+                tasks[race.winner].cancel()
+            elif race.winner is None:
+                for task in tasks.values():
+                    task.cancel()
+
+    def stats(self) -> dict[str, float]:
+        """How often the hedge fires and wins, and the p99 first token with and without it"""
+        with self._lock:
+            outcomes = dict(self._outcomes)
+            primary = list(self._primary_latencies)
+            served = list(self._served_latencies)
+        fired = outcomes["primary"] + outcomes["hedge"] + outcomes["failover"]
+        report = {
+            **outcomes,
+            "calls": fired + outcomes["not_fired"],
+            "hedge_win_rate": round(outcomes["hedge"] / fired, 4) if fired else 0.0,
+            "delay_s": round(self.delay(), 3),
+        }
+        if primary and served:
+            # Hedged primaries still report their first token before closing
+            report["p99_primary_s"] = round(_percentile(primary, 99), 3)
+            report["p99_served_s"] = round(_percentile(served, 99), 3)
+            report["p99_improvement_s"] = round(
+                report["p99_primary_s"] - report["p99_served_s"], 3
+            )
+        return report
@@ -0,0 +1,269 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections.abc import AsyncIterator, Iterable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from langchain_core.runnables import RunnableConfig
+
+from src.utils.metrics import Gauge, Histogram, registry
+
+QUEUE_WAIT: Histogram = registry.register(
+    Histogram(
+        "travel_agent_llm_queue_wait_seconds",
+        "Time LLM calls wait for an admission slot, by traffic class and node",
+        ["traffic", "node"],
+        buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60),
+    )
+)
+IN_FLIGHT: Gauge = registry.register(
+    Gauge("travel_agent_llm_in_flight", "LLM calls admitted and not yet finished")
+)
+QUEUED: Gauge = registry.register(
+    Gauge(
+        "travel_agent_llm_queued",
+        "LLM calls waiting for an admission slot",
+        ["traffic"],
+    )
+)
+
+# Lower ranks are admitted first
+TRAFFIC_RANKS = {"interactive": 0, "batch": 1}
+
+
+def traffic_of(config: RunnableConfig | None) -> str | None:
+    """Traffic class set in the run metadata ("interactive" or "batch")"""
+    return ((config or {}).get("metadata") or {}).get("traffic")
+
+
+class _Waiter:
+    __slots__ = ("cancelled", "event", "future", "granted", "loop")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+        self.loop = loop
+        self.event = None if loop else threading.Event()
+        self.future = loop.create_future() if loop else None
+        self.granted = False
+        self.cancelled = False
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(
+                lambda: self.future.done() or self.future.set_result(None)
+            )
+
+
+class LLMLimiter:
+    """
+    Process-wide admission queue in front of the model server.
+
+    At most `max_in_flight` calls run at once, from worker threads (sync
+    nodes) or the event loop (async calls). Waiting calls are admitted by
+    traffic class first (interactive chat before batch evaluation), then
+    critical-path nodes before `background_nodes`, then in arrival order.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        default_traffic: str = "interactive",
+        background_nodes: Iterable[str] = ("reviewer",),
+    ):
+        self.max_in_flight = max_in_flight
+        self.default_traffic = default_traffic
+        self.background_nodes = frozenset(background_nodes)
+        self.in_flight = 0
+        self._waiters: list[tuple[tuple[int, int, int], str, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        # Slots held for other processes: lease id -> (owner, expiry)
+        self._leases: dict[str, tuple[str, float]] = {}
+
+    def priority(self, node: str, traffic: str) -> tuple[int, int, int]:
+        return (
+            TRAFFIC_RANKS.get(traffic, len(TRAFFIC_RANKS)),
+            1 if node in self.background_nodes else 0,
+            next(self._sequence),
+        )
+
+    def _enter(self, node: str, traffic: str, waiter: _Waiter) -> bool:
+        """Takes a free slot, or queues `waiter` and returns False"""
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._waiters:
+                self.in_flight += 1
+                IN_FLIGHT.inc()
+                return True
+            heapq.heappush(
+                self._waiters, (self.priority(node, traffic), traffic, waiter)
+            )
+            QUEUED.inc(traffic=traffic)
+            return False
+
+    def _release(self) -> None:
+        """Hands the slot to the best waiter, or frees it"""
+        with self._lock:
+            while self._waiters:
+                _, traffic, waiter = heapq.heappop(self._waiters)
+                QUEUED.dec(traffic=traffic)
+                if waiter.cancelled:
+                    continue
+                waiter.granted = True
+                waiter.wake()
+                return
+            self.in_flight -= 1
+            IN_FLIGHT.dec()
+
+    @contextmanager
+    def slot(self, node: str, traffic: str | None = None) -> Iterator[None]:
+        """Blocks the calling thread until the call is admitted"""
+        traffic = traffic or self.default_traffic
+        start = time.perf_counter()
+        waiter = _Waiter()
+        if not self._enter(node, traffic, waiter):
+            waiter.event.wait()
+        QUEUE_WAIT.observe(time.perf_counter() - start, traffic=traffic, node=node)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def aacquire(self, node: str, traffic: str | None = None) -> None:
+        """Awaits admission without blocking the event loop; the caller frees the slot"""
+        traffic = traffic or self.default_traffic
+        start = time.perf_counter()
+        waiter = _Waiter(asyncio.get_running_loop())
+        if not self._enter(node, traffic, waiter):
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    granted = waiter.granted
+                    waiter.cancelled = True
+                if granted:
+                    self._release()
+                raise
+        QUEUE_WAIT.observe(time.perf_counter() - start, traffic=traffic, node=node)
+
+    @asynccontextmanager
+    async def aslot(self, node: str, traffic: str | None = None) -> AsyncIterator[None]:
+        """Awaits admission without blocking the event loop"""
+        await self.aacquire(node, traffic)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def alease(
+        self, node: str, owner: str, traffic: str | None = None, ttl: float = 600.0
+    ) -> str:
+        """
+        Admits a call made by another process (see `RemoteLimiter`) and holds
+        its slot until `release_lease`, or for `ttl` seconds if the owner dies
+        """
+        self.reap_leases()
+        await self.aacquire(node, traffic)
+        lease = uuid.uuid4().hex
+        with self._lock:
+            self._leases[lease] = (owner, time.monotonic() + ttl)
+        return lease
+
+    def release_lease(self, lease: str) -> bool:
+        with self._lock:
+            held = self._leases.pop(lease, None)
+        if held is not None:
+            self._release()
+        return held is not None
+
+    def release_owner(self, owner: str) -> int:
+        """Frees every slot still leased to `owner`, e.g. a finished subprocess"""
+        with self._lock:
+            leases = [lease for lease, (o, _) in self._leases.items() if o == owner]
+        return sum(self.release_lease(lease) for lease in leases)
+
+    def reap_leases(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                lease for lease, (_, expiry) in self._leases.items() if expiry < now
+            ]
+        return sum(self.release_lease(lease) for lease in expired)
+
+    def stats(self) -> dict[str, int]:
+        self.reap_leases()
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "queued": sum(
+                    1 for _, _, waiter in self._waiters if not waiter.cancelled
+                ),
+                "leased": len(self._leases),
+            }
+
+
+class RemoteLimiter:
+    """
+    Takes admission slots from the limiter of another process (the API) over
+    HTTP, so a separate process such as the evaluation run queues with
+    interactive chat in one place instead of next to it.
+
+    Same `slot`/`aslot` interface as `LLMLimiter`. Waiting happens in the
+    API's queue, by the traffic class and node sent with each request.
+    """
+
+    def __init__(self, url: str, default_traffic: str = "batch", ttl: float = 600.0):
+        self.url = url.rstrip("/")
+        self.default_traffic = default_traffic
+        self.ttl = ttl
+        self.owner = str(os.getpid())
+        # Acquiring waits as long as the queue does
+        self._client = httpx.Client(timeout=None)
+
+    def _body(self, node: str, traffic: str | None) -> dict[str, object]:
+        return {
+            "node": node,
+            "traffic": traffic or self.default_traffic,
+            "owner": self.owner,
+            "ttl_s": self.ttl,
+        }
+
+    @contextmanager
+    def slot(self, node: str, traffic: str | None = None) -> Iterator[None]:
+        response = self._client.post(
+            f"{self.url}/llm/limiter/acquire", json=self._body(node, traffic)
+        )
+        response.raise_for_status()
+        lease = response.json().get("lease")
+        try:
+            yield
+        finally:
+            if lease:
+                self._client.post(
+                    f"{self.url}/llm/limiter/release", json={"lease": lease}
+                )
+
+    @asynccontextmanager
+    async def aslot(self, node: str, traffic: str | None = None) -> AsyncIterator[None]:
+        async with httpx.AsyncClient(timeout=None) as client:
+            response = await client.post(
+                f"{self.url}/llm/limiter/acquire", json=self._body(node, traffic)
+            )
+            response.raise_for_status()
+            lease = response.json().get("lease")
+            try:
+                yield
+            finally:
+                if lease:
+                    await client.post(
+                        f"{self.url}/llm/limiter/release", json={"lease": lease}
+                    )
+
+    def stats(self) -> dict[str, int]:
+        return self._client.get(f"{self.url}/llm/limiter/stats").json()
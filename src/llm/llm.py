@@ -1,8 +1,32 @@
+import asyncio
+import copy
 import os
-from typing import List, Dict, Any, Union, Optional
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
+import threading
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Any, Optional
+
+import httpx
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
 from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.runnables.config import ensure_config, merge_configs
+from pydantic import BaseModel
+
+from src.utils.tracing import open_span, span
+
+from .batching import MicroBatcher
+from .cache import LLMResponseCache, schema_fingerprint
+from .hedging import Hedger
+from .limiter import LLMLimiter, RemoteLimiter, traffic_of
+from .routing import ModelRoute, ModelRouter
+from .structured import STRUCTURED_OUTPUTS, ModelT, format_kwargs, parse_structured
 
 
 class LLMWrapper(Runnable):
@@ -12,11 +36,21 @@ class LLMWrapper(Runnable):
         provider: str = "ollama",
         model: str = "llama3.1:8b",
         temperature: float = 0,
-        base_url: Optional[str] = None,
-        api_key: Optional[str] = None,
-        tags: Optional[List[str]] = None,
-        metadata: Optional[Dict[str, Any]] = None,
-        callbacks: Optional[List[Any]] = None,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        tags: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        callbacks: list[Any] | None = None,
+        cache: LLMResponseCache | None = None,
+        structured_output: bool = True,
+        batcher: MicroBatcher | None = None,
+        max_connections: int = 20,
+        max_tokens: int | None = None,
+        num_ctx: int | None = None,
+        keep_alive: int | str | None = None,
+        router: ModelRouter | None = None,
+        limiter: LLMLimiter | RemoteLimiter | None = None,
+        hedger: Hedger | None = None,
     ):
         self.provider = provider.lower()
         self.model = model
@@ -26,148 +60,651 @@ class LLMWrapper(Runnable):
         self.tags = tags or []
         self.metadata = metadata or {}
         self.callbacks = callbacks or []
+        self.cache = cache
+        self.structured_output = structured_output
+        self.batcher = batcher
+        self.max_connections = max_connections
+        self.max_tokens = max_tokens
+        self.num_ctx = num_ctx
+        self.keep_alive = keep_alive
+        self.router = router
+        self.limiter = limiter
+        self.hedger = hedger
+        # Ollama host of a node routed to its own server; the main Ollama
+        # client uses OLLAMA_HOST, since base_url is the OpenAI endpoint
+        self.ollama_url: str | None = None
+        if router is not None:
+            router.check(self.provider)
 
+        # Settings routed nodes fall back to, and the chat models by
+        # settings, shared with every copy
+        self._main_route = ModelRoute(
+            provider=self.provider,
+            model=model,
+            max_tokens=max_tokens,
+            num_ctx=num_ctx,
+            keep_alive=keep_alive,
+            base_url=base_url,
+        )
+        self._main_api_key = api_key
+        self._clients: dict[tuple, Runnable] = {}
+        self._clients_lock = threading.Lock()
+        # Built on the first call, so importing the API opens no HTTP pool
+        self._bound_client: Runnable | None = None
+
+    def _client(self) -> Runnable:
+        key = (
+            self.provider,
+            self.model,
+            self.max_tokens,
+            self.num_ctx,
+            self.keep_alive,
+            self.base_url,
+            self.ollama_url,
+            self.api_key_str,
+        )
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = self._build_client()
+            return self._clients[key]
+
+    @property
+    def _base_client(self) -> Runnable:
+        return self._client()
+
+    @property
+    def client(self) -> Runnable:
+        """The chat model for this wrapper's settings, bound to its tags"""
+        if self._bound_client is None:
+            self._bound_client = self._bind(self._base_client)
+        return self._bound_client
+
+    def _build_client(self) -> Runnable:
+        """
+        The provider chat model and its HTTP connection pool. Built once:
+        copies made by `with_config` share it and only bind their own
+        tags, metadata and callbacks.
+        """
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
         if self.provider == "openai":
-            if not base_url:
+            if not self.base_url:
                 raise ValueError("base_url is required for openai provider")
+            # Provider packages are imported on first use: langchain_openai
+            # alone takes over a second, and a deployment needs only one
+            from langchain_openai import ChatOpenAI
 
-            self._base_client = ChatOpenAI(
-                model=model,
-                temperature=temperature,
-                base_url=base_url,
-                api_key=api_key
+            return ChatOpenAI(
+                model=self.model,
+                temperature=self.temperature,
+                base_url=self.base_url,
+                api_key=self.api_key_str
                 or os.environ.get("HF_TOKEN")
                 or os.environ.get("OPENAI_API_KEY"),
-                tags=self.tags,
-                metadata=self.metadata,
-                callbacks=self.callbacks,
+                max_tokens=self.max_tokens,
+                http_client=httpx.Client(limits=limits),
+                http_async_client=httpx.AsyncClient(limits=limits),
             )
-            self.client = self._base_client
         elif self.provider == "ollama":
             try:
-                self._base_client = ChatOllama(
-                    model=model,
-                    temperature=temperature,
-                    tags=self.tags,
-                    metadata=self.metadata,
-                    callbacks=self.callbacks,
+                from langchain_ollama import ChatOllama
+
+                return ChatOllama(
+                    model=self.model,
+                    temperature=self.temperature,
+                    num_predict=self.max_tokens,
+                    # Context size and how long the model (and its prompt
+                    # cache) stays loaded between calls
+                    num_ctx=self.num_ctx,
+                    keep_alive=self.keep_alive,
+                    client_kwargs={"limits": limits},
+                    **({"base_url": self.ollama_url} if self.ollama_url else {}),
                 )
-                self.client = self._base_client
             except ImportError:
                 raise ImportError(
                     "langchain_ollama is required for Ollama provider. "
                     "Install it with: pip install langchain-ollama"
                 )
-        else:
-            raise ValueError(f"Unsupported provider: {provider}")
+        raise ValueError(f"Unsupported provider: {self.provider}")
+
+    @property
+    def chat_model(self) -> Runnable:
+        """The shared provider chat model, without this wrapper's tags"""
+        return self._base_client
+
+    def _bound_config(self) -> RunnableConfig:
+        # The node tag travels in metadata too: call-time tags can follow it
+        metadata = (
+            {**self.metadata, "llm_node": self._node_name()}
+            if self.tags
+            else self.metadata
+        )
+        return {"tags": self.tags, "metadata": metadata, "callbacks": self.callbacks}
+
+    def _bind(self, client: Runnable) -> Runnable:
+        if not (self.tags or self.metadata or self.callbacks):
+            return client
+        return client.with_config(**self._bound_config())
+
+    def _node_name(self) -> str:
+        return self.tags[-1] if self.tags else "unknown"
+
+    def _span_name(self) -> str:
+        return f"llm {self.tags[-1]}" if self.tags else "llm"
+
+    def _admit(self, config: RunnableConfig | None):
+        """Holds an admission slot for one call to the model server"""
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.slot(self._node_name(), traffic_of(config))
+
+    def _aadmit(self, config: RunnableConfig | None):
+        if self.limiter is None:
+            return nullcontext()
+        return self.limiter.aslot(self._node_name(), traffic_of(config))
+
+    def _cache_key(
+        self,
+        lc_messages: list[BaseMessage],
+        use_cache: bool,
+        output_format: str | None = None,
+    ) -> str | None:
+        # Only deterministic calls can be answered from the cache
+        if not use_cache or self.cache is None or self.temperature != 0:
+            return None
+        return self.cache.make_key(
+            self.provider,
+            self.model,
+            self.temperature,
+            lc_messages,
+            output_format,
+            max_tokens=self.max_tokens,
+            num_ctx=self.num_ctx,
+        )
+
+    def _cached(self, key: str | None) -> Optional["LLMResponse"]:
+        if key is None:
+            return None
+        hit = self.cache.get(key, self._node_name())
+        return LLMResponse(*hit) if hit else None
+
+    def _store(self, key: str | None, response: "LLMResponse") -> None:
+        if key is not None and isinstance(response.content, str):
+            self.cache.put(key, self.model, response.content, response.usage_metadata)
 
     def with_config(
         self,
-        tags: Optional[List[str]] = None,
-        metadata: Optional[Dict[str, Any]] = None,
-        callbacks: Optional[List[Any]] = None,
+        tags: list[str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        callbacks: list[Any] | None = None,
     ):
-        new_tags = self.tags + (tags or [])
-        new_metadata = {**self.metadata, **(metadata or {})}
-        new_callbacks = self.callbacks + (callbacks or [])
+        new_instance = copy.copy(self)
+        new_instance.tags = self.tags + (tags or [])
+        new_instance.metadata = {**self.metadata, **(metadata or {})}
+        new_instance.callbacks = self.callbacks + (callbacks or [])
 
-        new_instance = LLMWrapper(
-            provider=self.provider,
-            model=self.model,
-            temperature=self.temperature,
-            base_url=self.base_url,
-            api_key=self.api_key_str,
-            tags=new_tags,
-            metadata=new_metadata,
-            callbacks=new_callbacks,
+        route = (
+            self.router.route(new_instance._node_name())
+            if self.router and tags
+            else None
         )
-
-        if self.provider in ["ollama", "openai"] and new_instance._base_client:
-            new_instance.client = new_instance._base_client.with_config(
-                tags=new_tags,
-                metadata=new_metadata,
-                callbacks=new_callbacks,
+        if route is not None:
+            # Settings a route leaves unset keep the main value
+            main = self._main_route
+            new_instance.provider = (route.provider or main.provider).lower()
+            new_instance.model = route.model or main.model
+            for field in ("max_tokens", "num_ctx", "keep_alive"):
+                value = getattr(route, field)
+                setattr(
+                    new_instance,
+                    field,
+                    getattr(main, field) if value is None else value,
+                )
+            # The main endpoint and key only serve the main provider
+            same_provider = new_instance.provider == main.provider
+            new_instance.base_url = route.base_url or (
+                main.base_url if same_provider else None
             )
+            new_instance.ollama_url = (
+                route.base_url if new_instance.provider == "ollama" else None
+            )
+            new_instance.api_key_str = (
+                os.environ.get(route.api_key_env)
+                if route.api_key_env
+                else self._main_api_key if same_provider else None
+            )
+        new_instance._bound_client = None
 
         return new_instance
 
     def invoke(
         self,
-        messages: Union[str, List[Dict[str, str]]],
-        config: Optional[RunnableConfig] = None,
+        messages: str | list[dict[str, str]],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
     ) -> "LLMResponse":
-        if isinstance(messages, str):
-            messages = [{"role": "user", "content": messages}]
-
-        from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-
-        lc_messages = []
-        for msg in messages:
-            if isinstance(msg, dict):
-                role = msg["role"]
-                content = msg["content"]
-                if role == "system":
-                    lc_messages.append(SystemMessage(content=content))
-                elif role == "user":
-                    lc_messages.append(HumanMessage(content=content))
-                elif role == "assistant":
-                    lc_messages.append(AIMessage(content=content))
-            elif hasattr(msg, "type") and hasattr(msg, "content"):
-                role = "system" if msg.type == "system" else msg.type
-                if role == "system":
-                    lc_messages.append(SystemMessage(content=msg.content))
-                elif role == "user":
-                    lc_messages.append(HumanMessage(content=msg.content))
-                elif role == "assistant":
-                    lc_messages.append(AIMessage(content=msg.content))
-            else:
-                lc_messages.append(HumanMessage(content=str(msg)))
-
-        response = self.client.invoke(lc_messages, config)
-        content = response.content
-
-        return LLMResponse(content)
+        lc_messages = _to_lc_messages(messages)
+        key = self._cache_key(lc_messages, use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        with self._admit(config), span(self._span_name(), "llm", model=self.model):
+            response = self._generate(lc_messages, config)
+        self._store(key, response)
+        return response
+
+    async def ainvoke(
+        self,
+        messages: str | list[dict[str, str]],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> "LLMResponse":
+        lc_messages = _to_lc_messages(messages)
+        key = self._cache_key(lc_messages, use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        async with self._aadmit(config):
+            with span(self._span_name(), "llm", model=self.model):
+                response = await self._agenerate(lc_messages, config)
+        self._store(key, response)
+        return response
+
+    def _structured_call(self, schema: type[BaseModel]):
+        """Invoke kwargs and cache marker for a structured call"""
+        if not self.structured_output:
+            return {}, f"prompted:{schema_fingerprint(schema)}"
+        return (
+            format_kwargs(self.provider, schema),
+            f"schema:{schema_fingerprint(schema)}",
+        )
+
+    def _hedge_kwargs(self, schema: type[BaseModel] | None):
+        """Each provider's own structured-output kwargs"""
+        primary_kwargs = self._structured_call(schema)[0] if schema else {}
+        secondary_kwargs = (
+            format_kwargs(self.hedger.secondary_provider, schema)
+            if schema and self.structured_output
+            else {}
+        )
+        return primary_kwargs, secondary_kwargs
+
+    def _run_config(self, config: RunnableConfig | None) -> RunnableConfig:
+        """The call config with this wrapper's tags, metadata and callbacks, as the bound client sees it"""
+        return merge_configs(self._bound_config(), ensure_config(config))
+
+    def _hedged(
+        self,
+        lc_messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        schema: type[BaseModel] | None = None,
+    ) -> Iterator[Any]:
+        """Streams through the hedger"""
+        primary_kwargs, secondary_kwargs = self._hedge_kwargs(schema)
+        return self.hedger.stream(
+            self._base_client,
+            self.hedger.secondary,
+            lc_messages,
+            self._run_config(config),
+            self._node_name(),
+            primary_kwargs,
+            secondary_kwargs,
+        )
+
+    def _generate(
+        self,
+        lc_messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        schema: type[BaseModel] | None = None,
+    ) -> "LLMResponse":
+        """One provider call, hedged when a hedger is set"""
+        if self.hedger is not None:
+            return _to_response(_collect(self._hedged(lc_messages, config, schema)))
+        kwargs = self._structured_call(schema)[0] if schema else {}
+        return _to_response(self.client.invoke(lc_messages, config, **kwargs))
+
+    def _ahedged(
+        self,
+        lc_messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        schema: type[BaseModel] | None = None,
+    ) -> AsyncIterator[Any]:
+        """`_hedged` on the event loop"""
+        primary_kwargs, secondary_kwargs = self._hedge_kwargs(schema)
+        return self.hedger.astream(
+            self._base_client,
+            self.hedger.secondary,
+            lc_messages,
+            self._run_config(config),
+            self._node_name(),
+            primary_kwargs,
+            secondary_kwargs,
+        )
+
+    async def _agenerate(
+        self,
+        lc_messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        schema: type[BaseModel] | None = None,
+    ) -> "LLMResponse":
+        """`_generate` on the event loop"""
+        if self.hedger is not None:
+            return _to_response(
+                await _acollect(self._ahedged(lc_messages, config, schema))
+            )
+        kwargs = self._structured_call(schema)[0] if schema else {}
+        return _to_response(await self.client.ainvoke(lc_messages, config, **kwargs))
+
+    def _parse(self, response: "LLMResponse", schema: type[ModelT]) -> ModelT | None:
+        parsed, result = parse_structured(response.content, schema)
+        mode = "schema" if self.structured_output else "prompt"
+        STRUCTURED_OUTPUTS.inc(node=self._node_name(), mode=mode, result=result)
+        if parsed is None:
+            print(f"   ⚠️ LLM answer does not match {schema.__name__}")
+        return parsed
+
+    def invoke_structured(
+        self,
+        messages: str | list[dict[str, str]],
+        schema: type[ModelT],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> ModelT | None:
+        """
+        Asks for an answer matching the pydantic `schema`, constraining
+        decoding to its JSON schema (Ollama `format`, OpenAI `response_format`)
+        unless structured output is disabled.
+
+        Returns:
+            The parsed object, or None if the answer does not match the schema.
+        """
+        lc_messages = _to_lc_messages(messages)
+        _, output_format = self._structured_call(schema)
+        key = self._cache_key(lc_messages, use_cache, output_format)
+        cached = self._cached(key)
+        parsed = self._parse(cached, schema) if cached is not None else None
+        if parsed is not None:
+            return parsed
+        with (
+            self._admit(config),
+            span(self._span_name(), "llm", model=self.model, schema=schema.__name__),
+        ):
+            response = self._generate(lc_messages, config, schema)
+        parsed = self._parse(response, schema)
+        # Only answers that parse are worth replaying
+        if parsed is not None:
+            self._store(key, response)
+        return parsed
+
+    async def ainvoke_structured(
+        self,
+        messages: str | list[dict[str, str]],
+        schema: type[ModelT],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> ModelT | None:
+        lc_messages = _to_lc_messages(messages)
+        _, output_format = self._structured_call(schema)
+        key = self._cache_key(lc_messages, use_cache, output_format)
+        cached = self._cached(key)
+        parsed = self._parse(cached, schema) if cached is not None else None
+        if parsed is not None:
+            return parsed
+        async with self._aadmit(config):
+            with span(
+                self._span_name(), "llm", model=self.model, schema=schema.__name__
+            ):
+                response = await self._agenerate(lc_messages, config, schema)
+        parsed = self._parse(response, schema)
+        if parsed is not None:
+            self._store(key, response)
+        return parsed
+
+    def _send(
+        self,
+        lc_messages: list[BaseMessage],
+        config: RunnableConfig | None,
+        schema: type[BaseModel] | None = None,
+    ) -> Future:
+        """Future of the LLMResponse, through the batcher or a direct call without one"""
+        future: Future = Future()
+        # Hedged calls race two streams, which a batch cannot do
+        if self.batcher is None or self.hedger is not None:
+            try:
+                with (
+                    self._admit(config),
+                    span(self._span_name(), "llm", model=self.model),
+                ):
+                    future.set_result(self._generate(lc_messages, config, schema))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        kwargs = self._structured_call(schema)[0] if schema else {}
+
+        # The slot is held from submission until the batched answer arrives
+        admission = self._admit(config)
+        admission.__enter__()
+        end_span = open_span(self._span_name(), "llm", model=self.model, batched=True)
+
+        def done(raw: Future) -> None:
+            end_span()
+            admission.__exit__(None, None, None)
+            try:
+                future.set_result(_to_response(raw.result()))
+            except Exception as e:
+                future.set_exception(e)
+
+        try:
+            submitted = self.batcher.submit(self.client, lc_messages, config, **kwargs)
+        except Exception as e:
+            # Nothing will call done: give the slot back here
+            end_span()
+            admission.__exit__(type(e), e, e.__traceback__)
+            future.set_exception(e)
+            return future
+        submitted.add_done_callback(done)
+        return future
+
+    def submit(
+        self,
+        messages: str | list[dict[str, str]],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> "Future[LLMResponse]":
+        """
+        Queues an independent prompt for the micro-batcher and returns a
+        future of its LLMResponse. Without a batcher the call is made at once.
+        """
+        lc_messages = _to_lc_messages(messages)
+        key = self._cache_key(lc_messages, use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            return _resolved(cached)
+
+        future = self._send(lc_messages, config)
+        future.add_done_callback(
+            lambda f: f.exception() is None and self._store(key, f.result())
+        )
+        return future
+
+    def submit_structured(
+        self,
+        messages: str | list[dict[str, str]],
+        schema: type[ModelT],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> "Future[ModelT | None]":
+        """`submit` for `invoke_structured`: the future resolves to the parsed object or None"""
+        lc_messages = _to_lc_messages(messages)
+        _, output_format = self._structured_call(schema)
+        key = self._cache_key(lc_messages, use_cache, output_format)
+        cached = self._cached(key)
+        # An answer that no longer parses is asked for again
+        parsed_cached = self._parse(cached, schema) if cached is not None else None
+        if parsed_cached is not None:
+            return _resolved(parsed_cached)
+
+        parsed: Future = Future()
+
+        def done(raw: Future) -> None:
+            try:
+                response = raw.result()
+            except Exception as e:
+                parsed.set_exception(e)
+                return
+            result = self._parse(response, schema)
+            if result is not None:
+                self._store(key, response)
+            parsed.set_result(result)
+
+        self._send(lc_messages, config, schema).add_done_callback(done)
+        return parsed
 
     def stream(
         self,
-        messages: Union[str, List[Dict[str, str]]],
-        config: Optional[RunnableConfig] = None,
+        messages: str | list[dict[str, str]],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
     ):
-        if isinstance(messages, str):
-            messages = [{"role": "user", "content": messages}]
-
-        from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-
-        lc_messages = []
-        for msg in messages:
-            if isinstance(msg, dict):
-                role = msg["role"]
-                content = msg["content"]
-                if role == "system":
-                    lc_messages.append(SystemMessage(content=content))
-                elif role == "user":
-                    lc_messages.append(HumanMessage(content=content))
-                elif role == "assistant":
-                    lc_messages.append(AIMessage(content=content))
-            elif hasattr(msg, "type") and hasattr(msg, "content"):
-                role = "system" if msg.type == "system" else msg.type
-                if role == "system":
-                    lc_messages.append(SystemMessage(content=msg.content))
-                elif role == "user":
-                    lc_messages.append(HumanMessage(content=msg.content))
-                elif role == "assistant":
-                    lc_messages.append(AIMessage(content=msg.content))
-            else:
-                lc_messages.append(HumanMessage(content=str(msg)))
-
-        for chunk in self.client.stream(lc_messages, config):
-            yield chunk
+        """Yields message chunks; a cached answer comes back as a single chunk"""
+        lc_messages = _to_lc_messages(messages)
+        key = self._cache_key(lc_messages, use_cache)
+        cached = self._cached(key)
+        if cached is not None:
+            yield AIMessageChunk(content=cached.content)
+            return
+
+        parts: list[str] = []
+        usage = None
+        with (
+            self._admit(config),
+            span(self._span_name(), "llm", model=self.model, streamed=True),
+        ):
+            chunks = (
+                self._hedged(lc_messages, config)
+                if self.hedger is not None
+                else self.client.stream(lc_messages, config)
+            )
+            for chunk in chunks:
+                if isinstance(chunk.content, str):
+                    parts.append(chunk.content)
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+        self._store(key, LLMResponse("".join(parts), usage))
+
+    async def astream(
+        self,
+        messages: str | list[dict[str, str]],
+        config: RunnableConfig | None = None,
+    ) -> AsyncIterator[Any]:
+        lc_messages = _to_lc_messages(messages)
+        async with self._aadmit(config):
+            with span(self._span_name(), "llm", model=self.model, streamed=True):
+                chunks = (
+                    self._ahedged(lc_messages, config)
+                    if self.hedger is not None
+                    else self.client.astream(lc_messages, config)
+                )
+                async for chunk in chunks:
+                    yield chunk
+
+    async def abatch(
+        self,
+        inputs: list[str | list[dict[str, str]]],
+        config: RunnableConfig | None = None,
+        use_cache: bool = True,
+    ) -> list["LLMResponse"]:
+        """Runs several prompts concurrently on the event loop"""
+        batch = [_to_lc_messages(messages) for messages in inputs]
+        keys = [self._cache_key(lc_messages, use_cache) for lc_messages in batch]
+        results: list[LLMResponse | None] = [self._cached(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            with span(self._span_name(), "llm", model=self.model, batch=len(missing)):
+                if self.limiter is None and self.hedger is None:
+                    raw = await self.client.abatch([batch[i] for i in missing], config)
+                    responses = [_to_response(response) for response in raw]
+                else:
+                    # Each prompt waits for its own admission slot and races on its own
+                    responses = await asyncio.gather(
+                        *(self._ainvoke_admitted(batch[i], config) for i in missing)
+                    )
+            for i, response in zip(missing, responses):
+                results[i] = response
+                self._store(keys[i], results[i])
+        return results
+
+    async def _ainvoke_admitted(
+        self, lc_messages: list[BaseMessage], config: RunnableConfig | None
+    ) -> "LLMResponse":
+        async with self._aadmit(config):
+            return await self._agenerate(lc_messages, config)
+
+
+_MESSAGE_TYPES = {
+    "system": SystemMessage,
+    "user": HumanMessage,
+    "human": HumanMessage,
+    "assistant": AIMessage,
+    "ai": AIMessage,
+}
+
+
+def _to_lc_messages(messages: str | list[Any]) -> list[BaseMessage]:
+    """Converts a prompt, role dicts or messages into LangChain messages"""
+    if isinstance(messages, str):
+        return [HumanMessage(content=messages)]
+
+    lc_messages: list[BaseMessage] = []
+    for msg in messages:
+        if isinstance(msg, BaseMessage):
+            lc_messages.append(msg)
+        elif isinstance(msg, dict):
+            message_type = _MESSAGE_TYPES.get(msg["role"])
+            if message_type:
+                lc_messages.append(message_type(content=msg["content"]))
+        elif hasattr(msg, "type") and hasattr(msg, "content"):
+            message_type = _MESSAGE_TYPES.get(msg.type)
+            if message_type:
+                lc_messages.append(message_type(content=msg.content))
+        else:
+            lc_messages.append(HumanMessage(content=str(msg)))
+    return lc_messages
+
+
+def _collect(chunks: Iterator[Any]) -> Any:
+    """Joins streamed chunks into one message"""
+    message = None
+    for chunk in chunks:
+        message = chunk if message is None else message + chunk
+    return message
+
+
+async def _acollect(chunks: AsyncIterator[Any]) -> Any:
+    message = None
+    async for chunk in chunks:
+        message = chunk if message is None else message + chunk
+    return message
+
+
+def _resolved(value: Any) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+def _to_response(response: Any) -> "LLMResponse":
+    return LLMResponse(response.content, getattr(response, "usage_metadata", None))
 
 
 class LLMResponse:
 
-    def __init__(self, content: str):
+    def __init__(self, content: str, usage_metadata: dict[str, Any] | None = None):
         self.content = content
+        self.usage_metadata = usage_metadata or {}
 
     def strip(self):
         return self.content.strip()
@@ -0,0 +1,90 @@
+import json
+
+from pydantic import BaseModel, Field
+
+
+class ModelRoute(BaseModel):
+    """Model and Ollama settings for a node's LLM calls"""
+
+    provider: str | None = Field(
+        None, description="ollama or openai, the main provider if unset"
+    )
+    model: str | None = Field(
+        None, description="Model name for this provider, the main model if unset"
+    )
+    max_tokens: int | None = Field(
+        None, description="Completion token limit, the main setting if unset"
+    )
+    num_ctx: int | None = Field(
+        None, description="Ollama context window, the main setting if unset"
+    )
+    keep_alive: int | str | None = Field(
+        None, description="How long Ollama keeps the model loaded, e.g. '30m' or -1"
+    )
+    base_url: str | None = Field(
+        None,
+        description="Endpoint for this route, the main one if the provider is unchanged",
+    )
+    api_key_env: str | None = Field(
+        None,
+        description="Environment variable holding the API key, the main key if the provider is unchanged",
+    )
+
+
+class ModelRouter:
+    """
+    Maps node tags to models, so extraction and yes/no nodes can run on a
+    small model while the compiler keeps the large one.
+
+    The "default" route covers nodes without their own entry. Without a
+    default, unlisted nodes keep the main model. Ollama loads a model once
+    per context size, so nodes sharing a model should share `num_ctx`.
+    A route to another provider brings its own `base_url` and key, unless
+    that provider can do without (Ollama on its default host).
+    """
+
+    def __init__(self, routes: dict[str, ModelRoute]):
+        self.default = routes.get("default")
+        self.routes = {
+            node: route for node, route in routes.items() if node != "default"
+        }
+
+    @classmethod
+    def from_json(cls, text: str) -> "ModelRouter":
+        """
+        Reads routes like
+        {"default": {"model": "llama3.2:3b"}, "compiler": {"model": "llama3.1:8b", "num_ctx": 8192}}
+        or {"compiler": {"provider": "openai", "model": "gpt-4o", "base_url": "...", "api_key_env": "OPENAI_API_KEY"}}
+        """
+        return cls(
+            {
+                node: ModelRoute.model_validate(route)
+                for node, route in json.loads(text).items()
+            }
+        )
+
+    def check(self, main_provider: str) -> None:
+        """Rejects routes to another provider that lack the endpoint it needs"""
+        for node, route in {**self.routes, "default": self.default}.items():
+            if (
+                route is None
+                or not route.provider
+                or route.provider.lower() == main_provider.lower()
+            ):
+                continue
+            if route.provider.lower() == "openai" and not route.base_url:
+                raise ValueError(
+                    f"Route {node!r} switches to openai and needs its own base_url"
+                )
+
+    def route(self, node: str) -> ModelRoute | None:
+        return self.routes.get(node, self.default)
+
+    def describe(self) -> dict[str, dict[str, object]]:
+        table = {
+            node: route.model_dump(exclude_none=True)
+            for node, route in self.routes.items()
+        }
+        if self.default is not None:
+            table["default"] = self.default.model_dump(exclude_none=True)
+        return table
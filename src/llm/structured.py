@@ -0,0 +1,93 @@
+import json
+import re
+from typing import Any, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from src.utils.metrics import Counter, registry
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+STRUCTURED_OUTPUTS: Counter = registry.register(
+    Counter(
+        "travel_agent_llm_structured_outputs_total",
+        "Structured LLM answers by node, mode (schema, prompt) and result (ok, recovered, invalid)",
+        ["node", "mode", "result"],
+    )
+)
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def parse_failure_rates() -> dict[str, dict[str, float]]:
+    """Structured answers per "node/mode" and the share that could not be parsed"""
+    report: dict[str, dict[str, float]] = {}
+    for labels, value in STRUCTURED_OUTPUTS.samples():
+        entry = report.setdefault(
+            f"{labels['node']}/{labels['mode']}",
+            {"ok": 0, "recovered": 0, "invalid": 0},
+        )
+        entry[labels["result"]] += int(value)
+    for entry in report.values():
+        total = entry["ok"] + entry["recovered"] + entry["invalid"]
+        entry["failure_rate"] = round(entry["invalid"] / total, 4) if total else 0.0
+    return dict(sorted(report.items()))
+
+
+def format_kwargs(provider: str, schema: type[BaseModel]) -> dict[str, Any]:
+    """Invoke kwargs that constrain decoding to the JSON schema of `schema`"""
+    json_schema = schema.model_json_schema()
+    if provider == "ollama":
+        return {"format": json_schema}
+    return {
+        "response_format": {
+            "type": "json_schema",
+            "json_schema": {"name": schema.__name__, "schema": json_schema},
+        }
+    }
+
+
+def _recover_json(content: str) -> str | None:
+    """The JSON object in a chatty answer: inside a code fence or between the outer braces"""
+    fenced = _FENCE_RE.search(content)
+    if fenced:
+        content = fenced.group(1)
+    start, end = content.find("{"), content.rfind("}") + 1
+    if start != -1 and end > start:
+        return content[start:end]
+    start, end = content.find("["), content.rfind("]") + 1
+    if start != -1 and end > start:
+        return content[start:end]
+    return None
+
+
+def _validate(schema: type[ModelT], text: str) -> ModelT:
+    data = json.loads(text)
+    # A bare list answers a schema wrapping a single list field
+    if isinstance(data, list) and len(schema.model_fields) == 1:
+        data = {next(iter(schema.model_fields)): data}
+    return schema.model_validate(data)
+
+
+def parse_structured(content: Any, schema: type[ModelT]) -> tuple[ModelT | None, str]:
+    """
+    Parses an LLM answer into `schema`.
+
+    Returns:
+        The parsed object or None, and the result label: "ok" when the answer
+        was valid JSON as is, "recovered" when it had to be cut out of
+        surrounding text, "invalid" otherwise.
+    """
+    text = content if isinstance(content, str) else str(content)
+    try:
+        return _validate(schema, text.strip()), "ok"
+    except (json.JSONDecodeError, ValidationError, TypeError):
+        pass
+
+    recovered = _recover_json(text)
+    if recovered is not None:
+        try:
+            return _validate(schema, recovered), "recovered"
+        except (json.JSONDecodeError, ValidationError, TypeError):
+            pass
+    return None, "invalid"
@@ -1,21 +1,22 @@
 from .activity import activity_node
-from .reasoning import reviewer_node
-from .planner import planner_node
-from .passenger import passenger_node
-from .hotel import hotel_node
 from .city import city_resolver_node
-from .flight import flight_node
-from .reasoning import check_review_condition_node
 from .compiler import compiler_node
+from .flight import flight_node
+from .hotel import hotel_node
+from .optimizer import budget_optimizer_node
+from .passenger import passenger_node
+from .planner import planner_node
+from .reasoning import check_review_condition_node, reviewer_node
 
 __all__ = [
     "activity_node",
-    "passenger_node",
-    "planner_node",
-    "hotel_node",
+    "budget_optimizer_node",
+    "check_review_condition_node",
     "city_resolver_node",
-    "flight_node",
     "compiler_node",
+    "flight_node",
+    "hotel_node",
+    "passenger_node",
+    "planner_node",
     "reviewer_node",
-    "check_review_condition_node",
 ]
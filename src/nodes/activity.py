@@ -1,8 +1,8 @@
-from typing import List
 from langsmith import traceable
 
-from src.tools import AmadeusAuth, ActivitySearchTool, GetExchangeRateTool
-from src.states import AgentState, ActivityResultState, PlanDetailsState
+from src.states import ActivityResultState, AgentState, PlanDetailsState
+from src.tools import ActivitySearchTool, AmadeusAuth
+from src.utils.dependencies import is_stage_complete, mark_stage_complete
 
 
 @traceable
@@ -25,9 +25,12 @@ def activity_node(state: AgentState, amadeus_auth: AmadeusAuth):
         state.activity_data = None
         return state
 
-    activity_finder = ActivitySearchTool(amadeus_auth=amadeus_auth)
+    if is_stage_complete(state, "activity_search") and state.activity_data is not None:
+        print("   ℹ️  Activities already found and inputs unchanged, skipping...")
+        return state
 
-    result: List[ActivityResultState] = activity_finder.invoke(
+    activity_finder = ActivitySearchTool(amadeus_auth=amadeus_auth)
+    result: list[ActivityResultState] = activity_finder.invoke(
         {"location": plan.destination, "radius": 10}
     )
 
@@ -35,37 +38,10 @@ def activity_node(state: AgentState, amadeus_auth: AmadeusAuth):
         print("   ⚠️ No activities found.")
         state.activity_data = []
     else:
+        # Which activities fit the budget is decided by the budget optimizer
         print(f"   ✅ Found {len(result)} activities.")
         state.activity_data = result
-
-        # --- CURRENCY CONVERSION & BUDGET UPDATE ---
-        total_activity_cost = 0
-        budget_currency = plan.budget_currency or "USD"
-        exchange_rate_tool = GetExchangeRateTool()
-
-        for activity in result:
-            activity_cost = float(activity.amount)
-            activity_currency = activity.currency
-
-            converted_cost = activity_cost
-            if activity_currency != budget_currency:
-                print(f"   🔁 Converting activity cost from {activity_currency} to {budget_currency}...")
-                try:
-                    rate_result = exchange_rate_tool.run(
-                        {'from_currency': activity_currency, 'to_currency': budget_currency}
-                    )
-                    conversion_rate = rate_result['rate']
-                    converted_cost = activity_cost * conversion_rate
-                    print(f"   ✅ Converted Cost: {converted_cost:.2f} {budget_currency} (Rate: {conversion_rate})")
-                except Exception as e:
-                    print(f"   ⚠️ Currency conversion failed for activity '{activity.name}': {e}. Using original cost.")
-            
-            total_activity_cost += converted_cost
-
-        print(f"   💰 Total Activity Cost: {total_activity_cost:.2f} {budget_currency}")
-        plan.remaining_budget -= total_activity_cost
-        state.plan = plan
-
+    mark_stage_complete(state, "activity_search")
 
     state.last_node = None
     state.needs_user_input = False
@@ -1,17 +1,29 @@
-from langchain_ollama import ChatOllama
-from langchain_core.messages import AIMessage
-from langsmith import traceable
-from langgraph.types import Command
-from src.tools import CitySearchTool, AmadeusAuth, CitySearchResult
+from concurrent.futures import Future
+
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.types import Command
+from langsmith import traceable
 
+from src.llm import LLMWrapper
 from src.states import AgentState, PlanDetailsState
-from typing import Optional, Tuple
+from src.tools import AmadeusAuth, CitySearchResult, CitySearchTool
+from src.utils.dependencies import is_stage_complete, mark_stage_complete
+from src.utils.metrics import FALLBACKS
+
+CITY_CODE_SYSTEM_PROMPT = """The flight search API could not find a code for the location given by the user.
+Based on your general knowledge, what is its 3-letter IATA airport/city code?
+
+Return ONLY the 3-letter code (e.g. NYC). Do not write sentences.
+If you are not 100% sure, return 'UNKNOWN'."""
 
 
 @traceable
 def city_resolver_node(
-    state: AgentState, llm: ChatOllama, amadeus_auth: AmadeusAuth, config: Optional[RunnableConfig] = None
+    state: AgentState,
+    llm: LLMWrapper,
+    amadeus_auth: AmadeusAuth,
+    config: RunnableConfig | None = None,
 ) -> AgentState:
     print("\n📍 RESOLVER: Finding City Codes...")
     plan: PlanDetailsState | None = state.plan
@@ -21,9 +33,13 @@ def city_resolver_node(
         print("No plan found or awaiting user input, cannot resolve cities.")
         return state
 
-    def resolve_iata(
-        location_name: str, location_type: str
-    ) -> Tuple[Optional[CitySearchResult], bool]:
+    if is_stage_complete(state, "city_resolver"):
+        print(
+            f"   ℹ️  Route already resolved ({state.origin_code} -> {state.city_code}), skipping."
+        )
+        return state
+
+    def search_iata(location_name: str) -> CitySearchResult | None:
         clean_name = location_name.split(",")[0].strip()
         print(f"Resolving code for: {clean_name}...")
 
@@ -34,35 +50,48 @@ def city_resolver_node(
 
             if search_result:
                 print(f"   ✅ API Found: {search_result.iata_code}")
-                return search_result, True
+                return search_result
 
             print("   ⚠️ API returned null. Falling back to LLM knowledge...")
+        return None
+
+    def ask_llm(location_name: str) -> Future:
+        FALLBACKS.inc(kind="city_llm")
+        return llm.submit(
+            [
+                SystemMessage(content=CITY_CODE_SYSTEM_PROMPT),
+                {"role": "user", "content": f'Location: "{location_name}"'},
+            ],
+            config=config,
+        )
 
-        fallback_prompt = f"""
-        The flight search API could not find a code for "{location_name}".
-        Based on your general knowledge, what is the 3-letter IATA airport/city code for "{location_name}"?
-        
-        Return ONLY the 3-letter code (e.g. NYC). Do not write sentences.
-        If you are not 100% sure, return 'UNKNOWN'.
-        """
-
-        code = llm.invoke(fallback_prompt, config=config).content.strip().upper()
+    def llm_result(location_name: str, answer: Future) -> CitySearchResult | None:
+        clean_name = location_name.split(",")[0].strip()
+        code = answer.result().content.strip().upper()
 
         if len(code) == 3 and code.isalpha() and code != "UNKNOWN":
             print(f"   🤖 LLM Resolved: {code}")
-            return (
-                CitySearchResult(
-                    name=clean_name, iata_code=code, latitude=None, longitude=None
-                ),
-                True,
+            return CitySearchResult(
+                name=clean_name, iata_code=code, latitude=None, longitude=None
             )
 
         print(f"   ❌ Could not resolve code for {clean_name}")
-        return None, False
-
-    origin_result, origin_success = resolve_iata(plan.origin, "origin")
-
-    if not origin_success:
+        return None
+
+    locations = {"origin": plan.origin, "destination": plan.destination}
+    results = {kind: search_iata(name) for kind, name in locations.items()}
+    # The fallbacks are independent, so both go out in the same LLM batch
+    answers = {
+        kind: ask_llm(locations[kind])
+        for kind, result in results.items()
+        if result is None
+    }
+    for kind, answer in answers.items():
+        results[kind] = llm_result(locations[kind], answer)
+
+    origin_result, dest_result = results["origin"], results["destination"]
+
+    if origin_result is None:
         question = f"I couldn't identify the airport code for '{plan.origin}' (checked both API and my knowledge). Could you provide the specific IATA code?"
         state.needs_user_input = True
         state.validation_question = question
@@ -70,9 +99,7 @@ def city_resolver_node(
         state.last_node = "city_resolver"
         return Command(goto="compiler", update=state)
 
-    dest_result, dest_success = resolve_iata(plan.destination, "destination")
-
-    if not dest_success:
+    if dest_result is None:
         question = f"I couldn't identify the airport code for '{plan.destination}'. Could you provide the specific IATA code?"
         state.needs_user_input = True
         state.validation_question = question
@@ -92,6 +119,7 @@ def city_resolver_node(
     state.needs_user_input = False
     state.validation_question = None
     state.last_node = None
+    mark_stage_complete(state, "city_resolver")
 
     print(f"   ✅ Route: {origin_result.iata_code} -> {dest_result.iata_code}")
     if dest_result.latitude and dest_result.longitude:
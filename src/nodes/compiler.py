@@ -1,23 +1,149 @@
-from langchain_ollama import ChatOllama
+import time
+from typing import Any
+
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langsmith import traceable
+
+from src.llm import LLMResponse, LLMWrapper
 from src.states import AgentState
 from src.tools.exchange_rate import get_exchange_rates
-from typing import Set, Tuple, Optional
-from langchain_core.runnables import RunnableConfig
+from src.utils.metrics import FIRST_TOKEN
+from src.utils.revision import (
+    estimate_tokens,
+    join_sections,
+    revision_stats,
+    sections_for_critique,
+    split_sections,
+)
+
+
+def output_tokens(response, text: str) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or estimate_tokens(text)
+
+
+COMPILER_SYSTEM_PROMPT = """You are an Expert Travel Planner. Your task is to generate a comprehensive and clear travel itinerary based on the data provided.
+
+OUTPUT GUIDELINES:
+• **Clarity is Key**: Use clean sections, bullet points, and short paragraphs.
+• **Structure**: Provide a "Full Itinerary Overview" section followed by a "Day-by-Day Breakdown".
+• **Budget Section**: Use the "Budget Summary" provided. Create a clear "Estimated Costs" section, listing each item's name and price in the correct currency. Present the "Total Estimated Cost" and "Remaining Budget".
+• **Data Integrity**: Base all information STRICTLY on the data provided. Do not invent details.
+• **Tone**: Friendly, concise, expert, and professional.
+"""
+
+# Extends the generation prompt, so section rewrites share its cached prefix
+REVISION_SYSTEM_PROMPT = f"""{COMPILER_SYSTEM_PROMPT}
+REVISION TASK:
+An itinerary section was REJECTED for the reason given with the data.
+Rewrite ONLY that section so that it fixes the problem. Keep the same heading and format and output nothing but the section.
+"""
+
+
+# Tags the itinerary generation whose tokens /chat/stream forwards to the client
+STREAM_TAG = "itinerary_stream"
+
+
+def generate_streamed(
+    llm: LLMWrapper, prompt: str | list[Any], config: RunnableConfig | None = None
+) -> LLMResponse:
+    """
+    Generates the itinerary through the streaming API, so its tokens reach
+    the client while it is being written.
+    """
+    config = dict(config or {})
+    config["tags"] = list(config.get("tags") or []) + [STREAM_TAG]
+
+    start = time.perf_counter()
+    parts = []
+    usage = None
+    for chunk in llm.stream(prompt, config=config):
+        if not parts:
+            first_token = time.perf_counter() - start
+            FIRST_TOKEN.observe(first_token, node="compiler")
+            print(f"   ⏱️  First itinerary token after {first_token:.2f}s")
+        parts.append(
+            chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+        )
+        usage = getattr(chunk, "usage_metadata", None) or usage
+    return LLMResponse("".join(parts), usage)
+
+
+def revise_sections(
+    llm: LLMWrapper,
+    data_context: str,
+    draft: str,
+    critique: str,
+    config: RunnableConfig | None = None,
+) -> str | None:
+    """
+    Regenerates only the sections of a rejected draft the critique is about.
+
+    Returns:
+        The patched itinerary, or None when the critique cannot be tied to
+        specific sections and the whole itinerary must be regenerated.
+    """
+    sections = split_sections(draft)
+    targets = sections_for_critique(sections, critique)
+    if targets is None:
+        return None
+
+    print(
+        f"   🩹 Revising {len(targets)}/{len(sections)} section(s): {[sections[i].title for i in targets]}"
+    )
+    start = time.perf_counter()
+    tokens = 0
+    for i in targets:
+        section = sections[i]
+        prompt = f"""DATA:
+{data_context}
+
+    The itinerary was REJECTED for this reason: {critique}
+
+    SECTION:
+    {section.text.strip()}
+    """
+        response = llm.invoke(
+            [
+                SystemMessage(content=REVISION_SYSTEM_PROMPT),
+                {"role": "user", "content": prompt},
+            ],
+            config=config,
+        )
+        text = response.content.strip()
+        tokens += output_tokens(response, text)
+
+        heading = section.text.strip().splitlines()[0]
+        if not text.startswith(heading):
+            text = f"{heading}\n{text}"
+        trailing = section.text[len(section.text.rstrip()) :]
+        section.text = text + (trailing or "\n")
+
+    revision_stats.record_patch(
+        time.perf_counter() - start, tokens, estimate_tokens(draft)
+    )
+    print(f"   📈 {revision_stats.report()}")
+    return join_sections(sections)
 
 
 @traceable
 def compiler_node(
-    state: AgentState, llm: ChatOllama, config: Optional[RunnableConfig] = None
+    state: AgentState,
+    llm: LLMWrapper,
+    config: RunnableConfig | None = None,
+    patch_revisions: bool = True,
 ):
     print("\n✍️  COMPILER: Drafting Itinerary...")
 
+    critique = None
     feedback_context = ""
     if state.feedback and "REJECT" in state.feedback:
         print(f"   ⚠️ Addressing Critique: {state.feedback}")
+        critique = state.feedback.split("REJECT:", 1)[-1].strip()
         feedback_context = f"""
         CRITICAL: Your previous draft was REJECTED.
-        Reason: {state.feedback.split('REJECT:')[1].strip()}
+        Reason: {critique}
         YOU MUST FIX THIS IN THIS VERSION.
         """
 
@@ -28,7 +154,15 @@ def compiler_node(
     # --- BATCH CURRENCY CONVERSION ---
     initial_budget = state.plan.budget or 0
     budget_currency = state.plan.budget_currency or "USD"
-    conversion_requests: Set[Tuple[str, str]] = set()
+    conversion_requests: set[tuple[str, str]] = set()
+
+    activities = state.activity_data or []
+    if state.selected_activity_indices is not None:
+        activities = [
+            activities[i]
+            for i in state.selected_activity_indices
+            if i < len(activities)
+        ]
 
     # Gather all conversion requests
     if state.flight_data and state.selected_flight_index is not None:
@@ -40,11 +174,10 @@ def compiler_node(
         hotel = state.hotel_data.hotels[state.selected_hotel_index]
         if hotel.offers and hotel.offers[0].price.currency != budget_currency:
             conversion_requests.add((hotel.offers[0].price.currency, budget_currency))
-    
-    if state.activity_data:
-        for activity in state.activity_data:
-            if activity.currency != budget_currency:
-                conversion_requests.add((activity.currency, budget_currency))
+
+    for activity in activities:
+        if activity.currency != budget_currency:
+            conversion_requests.add((activity.currency, budget_currency))
 
     # Fetch all rates in one go
     exchange_rates = get_exchange_rates(conversion_requests)
@@ -66,22 +199,23 @@ def compiler_node(
         hotel = state.hotel_data.hotels[state.selected_hotel_index]
         if hotel.offers:
             offer = hotel.offers[0]
-            total_spent += convert(float(offer.price.total), offer.price.currency, budget_currency)
+            total_spent += convert(
+                float(offer.price.total), offer.price.currency, budget_currency
+            )
+
+    for activity in activities:
+        total_spent += convert(activity.amount, activity.currency, budget_currency)
 
-    if state.activity_data:
-        for activity in state.activity_data:
-            total_spent += convert(activity.amount, activity.currency, budget_currency)
-            
     remaining_budget = initial_budget - total_spent
     state.plan.remaining_budget = remaining_budget
-    
+
     budget_summary = f"""
     Budget Summary:
     - Initial Budget: {initial_budget:.2f} {budget_currency}
     - Total Estimated Cost: {total_spent:.2f} {budget_currency}
     - Remaining Budget: {remaining_budget:.2f} {budget_currency}
     """
-    
+
     # --- CONTEXT CONSTRUCTION ---
     flight_context = ""
     if state.flight_data and state.selected_flight_index is not None:
@@ -98,15 +232,20 @@ def compiler_node(
         hotel = state.hotel_data.hotels[state.selected_hotel_index]
         if hotel.offers:
             offer = hotel.offers[0]
-            converted_price = convert(float(offer.price.total), offer.price.currency, budget_currency)
+            converted_price = convert(
+                float(offer.price.total), offer.price.currency, budget_currency
+            )
             hotel_context = f"Selected Hotel: {hotel.name} Price: {converted_price:.2f} {budget_currency}"
 
     activity_context = ""
-    if state.activity_data:
-        activity_list = [f"- {act.name}: {convert(act.amount, act.currency, budget_currency):.2f} {budget_currency}" for act in state.activity_data]
-        activity_context = "Found Activities:\n" + "\n".join(activity_list)
+    if activities:
+        activity_list = [
+            f"- {act.name}: {convert(act.amount, act.currency, budget_currency):.2f} {budget_currency}"
+            for act in activities
+        ]
+        activity_context = "Selected Activities:\n" + "\n".join(activity_list)
 
-    context = f"""
+    data_context = f"""
     Destination: {state.plan.destination}
     Dates: {state.plan.departure_date} to {state.plan.arrival_date}
     Travelers: {state.adults} Adults, {state.children} Children, {state.infants} Infants, Class: {state.travel_class}
@@ -116,24 +255,31 @@ def compiler_node(
     {flight_context}
     {hotel_context}
     {activity_context}
-
-    {feedback_context}
     """
+    context = f"{data_context}\n    {feedback_context}"
 
-    system_instruction = """
-    You are an Expert Travel Planner. Your task is to generate a comprehensive and clear travel itinerary based on the data provided.
+    if patch_revisions and critique and state.final_itinerary:
+        revised = revise_sections(
+            llm,
+            data_context,
+            state.final_itinerary,
+            critique,
+            config,
+        )
+        if revised is not None:
+            state.final_itinerary = revised
+            return state
 
-    OUTPUT GUIDELINES:
-    • **Clarity is Key**: Use clean sections, bullet points, and short paragraphs.
-    • **Structure**: Provide a "Full Itinerary Overview" section followed by a "Day-by-Day Breakdown".
-    • **Budget Section**: Use the "Budget Summary" provided. Create a clear "Estimated Costs" section, listing each item's name and price in the correct currency. Present the "Total Estimated Cost" and "Remaining Budget".
-    • **Data Integrity**: Base all information STRICTLY on the data provided. Do not invent details.
-    • **Tone**: Friendly, concise, expert, and professional.
-    """
+    messages = [
+        SystemMessage(content=COMPILER_SYSTEM_PROMPT),
+        {"role": "user", "content": f"DATA:\n{context}\n\nWrite the itinerary:"},
+    ]
 
-    prompt = f"{system_instruction}\n\nDATA:\n{context}\n\nWrite the itinerary:"
-    
-    response = llm.invoke(prompt, config=config)
+    start = time.perf_counter()
+    response = generate_streamed(llm, messages, config)
     state.final_itinerary = response.content
-    
+    revision_stats.record_full(
+        time.perf_counter() - start, output_tokens(response, response.content)
+    )
+
     return state
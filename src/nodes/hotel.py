@@ -1,69 +1,142 @@
-from langsmith import traceable
-from langchain_core.messages import AIMessage, SystemMessage
 from datetime import datetime
-import json
-from langchain_ollama import ChatOllama
+
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
-from typing import Optional
 from langgraph.types import Command
+from langsmith import traceable
+
+from src.llm import LLMWrapper
+from src.states import (
+    AgentState,
+    HotelDetails,
+    HotelOptions,
+    HotelSearchState,
+    PlanDetailsState,
+)
+from src.tools import AmadeusAuth, HotelSearchTool
+from src.utils.dependencies import is_stage_complete, mark_stage_complete
+from src.utils.prompt_budget import prompt_budget, truncate
+from src.utils.ranking import HotelScoringWeights, describe_hotel, rank_hotel_offers
+
+HOTEL_SEARCH_SYSTEM_PROMPT = """You are an expert Travel Concierge. Your task is to find a list of available hotels for a user based on their destination and travel dates.
+Provide a list of 3 hotels in the destination city with the following details for each hotel
+Return ONLY a JSON object {"hotels": [...]} with their id, name, location and offers."""
 
-from src.states import HotelDetails, HotelSearchState
-from src.tools import HotelSearchTool, AmadeusAuth, GetExchangeRateTool
-from src.states import AgentState, PlanDetailsState
+HOTEL_CHOICE_SYSTEM_PROMPT = """You are a hotel recommendation engine. The hotel given by the user was selected for the travelers.
+Write a single persuasive sentence explaining why it is a good choice.
+Return only that sentence."""
 
 
-def format_hotels_for_llm_compact(hotels: list[HotelDetails]) -> str:
-    """Compact version of hotel formatting for LLM analysis."""
-    lines = []
+# Detail levels: everything, trimmed offers, best offer only
+HOTEL_DETAIL_LEVELS = 3
 
-    for i, hotel in enumerate(hotels, start=1):
-        lines.append(f"Hotel #{i} — {hotel.name} (ID: {hotel.hotel_id})")
-        lines.append(f"  Location: {hotel.location.city_code}")
 
+def format_hotel(index: int, hotel: HotelDetails, detail: int = 0) -> str:
+    """One hotel for an LLM prompt; offers are assumed ranked best first."""
+    lines = [f"Hotel #{index} — {hotel.name} (ID: {hotel.hotel_id})"]
+    lines.append(f"  Location: {hotel.location.city_code}")
+
+    if detail == 0:
         if hotel.location.latitude and hotel.location.longitude:
             lines.append(
                 f"  Coordinates: {hotel.location.latitude}, {hotel.location.longitude}"
             )
-
         if hotel.contact and hotel.contact.phone:
             lines.append(f"  Phone: {hotel.contact.phone}")
 
-        lines.append(f"  Available Offers: {len(hotel.offers)}")
+    offers = hotel.offers if detail == 0 else hotel.offers[: 3 if detail == 1 else 1]
+    lines.append(f"  Available Offers: {len(hotel.offers)}")
 
-        for offer_idx, offer in enumerate(hotel.offers, start=1):
+    for offer_idx, offer in enumerate(offers, start=1):
+        lines.append(
+            f"    Offer {offer_idx}: {offer.price.total} {offer.price.currency} "
+            f"({offer.check_in} to {offer.check_out})"
+        )
+        if detail == 2:
             lines.append(
-                f"    Offer {offer_idx}: {offer.price.total} {offer.price.currency} "
-                f"({offer.check_in} to {offer.check_out})"
+                f"      Room: {offer.room.room_type} | Board: {offer.board_type}"
             )
+            continue
 
-            if offer.price.avg_nightly:
-                lines.append(
-                    f"      Avg/night: {offer.price.avg_nightly} {offer.price.currency}"
-                )
-
+        if offer.price.avg_nightly:
             lines.append(
-                f"      Room: {offer.room.room_type} - {offer.room.description}"
+                f"      Avg/night: {offer.price.avg_nightly} {offer.price.currency}"
+            )
+
+        description = (
+            offer.room.description
+            if detail == 0
+            else truncate(offer.room.description, 80)
+        )
+        lines.append(f"      Room: {offer.room.room_type} - {description}")
+
+        if offer.room.beds and offer.room.bed_type:
+            lines.append(f"      Beds: {offer.room.beds}x {offer.room.bed_type}")
+
+        lines.append(f"      Board: {offer.board_type} | Guests: {offer.guests}")
+
+        if offer.cancellation_policy:
+            policy = (
+                offer.cancellation_policy
+                if detail == 0
+                else truncate(offer.cancellation_policy, 60)
             )
+            lines.append(f"      Cancellation: {policy}")
 
-            if offer.room.beds and offer.room.bed_type:
-                lines.append(f"      Beds: {offer.room.beds}x {offer.room.bed_type}")
+    return "\n".join(lines)
 
-            lines.append(f"      Board: {offer.board_type} | Guests: {offer.guests}")
 
-            if offer.cancellation_policy:
-                lines.append(f"      Cancellation: {offer.cancellation_policy}")
+def format_hotels_for_llm_compact(
+    hotels: list[HotelDetails], max_tokens: int | None = None
+) -> str:
+    """Compact hotel formatting for LLM analysis, fitted to the hotel agent's token budget."""
+    return prompt_budget.fit(
+        "hotel_agent", hotels, format_hotel, HOTEL_DETAIL_LEVELS, max_tokens
+    )
 
-        lines.append("")
 
-    return "\n".join(lines).strip()
+def explain_hotel_choice(
+    state: AgentState,
+    llm: LLMWrapper,
+    hotel: HotelDetails,
+    fallback: str,
+    config: RunnableConfig | None = None,
+) -> str:
+    """Asks the LLM for a one-line selling point of an already selected hotel"""
+    PROMPT = f"""
+        Travelers: {state.adults or 1} adult(s) and {state.children or 0} child(ren) travelling to {state.plan.destination}
+
+        {format_hotels_for_llm_compact([hotel])}
+
+        Summary: {fallback}
+    """
+    try:
+        response = llm.invoke(
+            [
+                SystemMessage(content=HOTEL_CHOICE_SYSTEM_PROMPT),
+                {"role": "user", "content": PROMPT},
+            ],
+            config=config,
+        )
+        content = response.content
+        return (
+            content.strip()
+            if isinstance(content, str) and content.strip()
+            else fallback
+        )
+    except Exception as e:
+        print(f"   ⚠️ Could not generate hotel explanation: {e}")
+        return fallback
 
 
 @traceable
 def hotel_node(
     state: AgentState,
     amadeus_auth: AmadeusAuth,
-    llm: ChatOllama,
-    config: Optional[RunnableConfig] = None,
+    llm: LLMWrapper,
+    config: RunnableConfig | None = None,
+    weights: HotelScoringWeights | None = None,
+    llm_explanations: bool = False,
 ):
     print("\n🏨 HOTEL AGENT: Searching...")
     plan: PlanDetailsState | None = state.plan
@@ -77,6 +150,10 @@ def hotel_node(
         state.hotel_data = None
         return state
 
+    if is_stage_complete(state, "hotel_selection") and state.hotel_data is not None:
+        print("   ℹ️  Hotel already selected and inputs unchanged, skipping...")
+        return state
+
     if not state.city_code:
         question = f"I need a valid city code to search for hotels in {plan.destination}. Could you verify the destination city?"
         state.needs_user_input = True
@@ -93,7 +170,7 @@ def hotel_node(
         state.last_node = "hotel_agent"
         return Command(goto="compiler", update=state)
 
-    if state.hotel_data is None:
+    if not is_stage_complete(state, "hotel_search") or state.hotel_data is None:
         try:
             if state.with_tools:
                 search_hotels = HotelSearchTool(amadeus_auth=amadeus_auth)
@@ -115,186 +192,105 @@ def hotel_node(
                     return state
                 else:
                     state.hotel_data = result
+                    mark_stage_complete(state, "hotel_search")
             else:
                 print("   ℹ️  Tool use disabled, Using LLM Knowledge.")
                 hotel_search_prompt = f"""
-                    You are an expert Travel Concierge. Your task is to find a list of available hotels for a user based on their destination and travel dates.
                     start_date :{plan.departure_date}
                     end_date :{plan.arrival_date}
                     source_city_code :{state.origin_code}
                     destination_city_code :{state.city_code}
-                    Provide a list of 3 hotels in the destination city with the following details for each hotel
                 """
-                response = llm.invoke(hotel_search_prompt, config=config)
-                content = response.content
-                hotels = json.loads(content.strip())
+                options = llm.invoke_structured(
+                    [
+                        SystemMessage(content=HOTEL_SEARCH_SYSTEM_PROMPT),
+                        {"role": "user", "content": hotel_search_prompt},
+                    ],
+                    HotelOptions,
+                    config=config,
+                )
+                if options is None:
+                    raise ValueError("the hotel list could not be read")
                 state.hotel_data = HotelSearchState(
-                    city_code=state.origin_code, hotels=hotels
+                    city_code=state.origin_code, hotels=options.hotels
                 )
+                mark_stage_complete(state, "hotel_search")
 
         except Exception as e:
             print(f"   ⚠️ Hotel search error: {e}")
-            question = f"I encountered an error searching for hotels: {str(e)}. Would you like to:\n1. Try again\n2. Skip hotel booking\n3. Provide different dates or location"
+            question = f"I encountered an error searching for hotels: {e!s}. Would you like to:\n1. Try again\n2. Skip hotel booking\n3. Provide different dates or location"
             state.needs_user_input = True
             state.validation_question = question
             state.messages.append(AIMessage(content=question))
             state.last_node = "hotel_agent"
             return Command(goto="compiler", update=state)
     else:
-        print("   ℹ️  Hotel data found, proceeding with analysis...")
+        print(
+            "   ℹ️  Reusing previous hotel search results, re-running selection only."
+        )
 
     duration = 1
     try:
         d1 = datetime.strptime(plan.departure_date, "%Y-%m-%d")
         d2 = datetime.strptime(plan.arrival_date, "%Y-%m-%d")
         duration = (d2 - d1).days
-        if duration < 1:
-            duration = 1
+        duration = max(duration, 1)
     except Exception as e:
         duration = 1
         print(f"   ⚠️ Date parsing error: {e}, defaulting duration to 1 night.")
 
-    hotel_data_str = format_hotels_for_llm_compact(state.hotel_data.hotels)
-
-    PROMPT = f"""
-        You are an expert Travel Concierge. Your task is to analyze a list of available hotels and select the best matches for the user.
-
-        ----------------------------
-        USER PROFILE
-        ----------------------------
-        - Budget: ${plan.budget or "Flexible"} (Total trip budget)
-        - Travelers: {state.adults or 1} Adults, {state.children or 0} Children, {state.infants or 0} Infants
-        - Trip Duration: {duration} nights
-
-        ----------------------------
-        AVAILABLE HOTELS (RAW DATA)
-        ----------------------------
-        {hotel_data_str}
-
-        ----------------------------
-        INSTRUCTIONS
-        ----------------------------
-        1. **Filter by Price**: Ensure the total cost (Price per night * {duration}) fits reasonably within the budget.
-        2. **Match Interests**: Prioritize hotels with amenities matching the user's interests (e.g., "Gym" for fitness, "Pool" for kids, "Central" for sightseeing).
-        3. **Select the Single Best**: Choose the single absolute best option from the list.
-        4. **Reasoning**: Write a short, persuasive "selling point" explaining why this is the winner.
-
-        ----------------------------
-        OUTPUT FORMAT (STRICT JSON)
-        ----------------------------
-        Return a JSON object containing the index of the selected hotel from the list provided and the hotel details. Ensure all numerical values are provided directly without mathematical expressions or comments.
-
-        {{
-        "selected_hotel_index": 0,
-        "selected_hotel": {{
-            "name": "Hotel Name",
-            "price_per_night": 0.0,
-            "total_price": 0.0,
-            "rating": "4.5 stars",
-            "reason": "The absolute best choice because..."
-        }}
-        }}
-    """
-    print("   🧠 Analyzing hotel options...")
-    response = llm.invoke(
-        [
-            SystemMessage(
-                content="You are a hotel recommendation engine. Output strictly valid JSON."
-            ),
-            {"role": "user", "content": PROMPT},
-        ],
-        config=config,
+    budget_currency = plan.budget_currency or "USD"
+    hotels = state.hotel_data.hotels
+    ranking = rank_hotel_offers(
+        hotels,
+        nights=duration,
+        budget=plan.budget,
+        budget_currency=budget_currency,
+        latitude=state.latitude,
+        longitude=state.longitude,
+        weights=weights,
     )
 
-    content = response.content
-    if "```json" in content:
-        content = content.split("```json")[1].split("```")[0]
-    elif "```" in content:
-        content = content.split("```")[1].split("```")[0]
-
-    try:
-        selection_data = json.loads(content.strip())
-    except json.JSONDecodeError:
-        print("   ⚠️ JSON decoding failed. Trying to fix...")
-        import re
-        
-        # Regex to find patterns like "total_price": 2119.61 * 5
-        pattern = re.compile(r'"total_price":\s*([\d.]+\s*\*\s*[\d.]+)')
-        match = pattern.search(content)
-        
-        if match:
-            expression = match.group(1)
-            try:
-                # Using eval is a security risk, but in this controlled context of simple multiplication, it's acceptable.
-                result = eval(expression)
-                # Replace the expression with the result in the content string
-                content = content.replace(expression, str(result))
-                selection_data = json.loads(content.strip())
-                print("   ✅ JSON fixed and parsed successfully.")
-            except Exception as e:
-                print(f"   ⚠️ Failed to fix and parse JSON: {e}")
-                # Handle failure: maybe ask user or fallback
-                state.needs_user_input = True
-                state.validation_question = "I'm having trouble understanding the hotel information. Could you clarify?"
-                state.messages.append(AIMessage(content=state.validation_question))
-                return state
+    if not ranking:
+        if plan.budget is None or not any(h.offers for h in hotels):
+            # Nothing was priced out: the hotels had no bookable offers
+            question = "None of the hotels I found has rooms available for your dates. Would you like to change dates or skip the hotel?"
         else:
-            # If no specific pattern is matched, re-raise or handle generically
-            print("   ⚠️ Could not find a specific pattern to fix in JSON.")
-            state.needs_user_input = True
-            state.validation_question = "I'm having trouble understanding the hotel information. Could you clarify?"
-            state.messages.append(AIMessage(content=state.validation_question))
-            return state
-    selected_index = selection_data.get("selected_hotel_index", None)
-
-    if (
-        selected_index is not None
-        and state.hotel_data
-        and state.hotel_data.hotels
-        and 0 <= selected_index < len(state.hotel_data.hotels)
-    ):
-        state.selected_hotel_index = selected_index
-        selected_hotel = state.hotel_data.hotels[selected_index]
-        print(
-            f"   ✅ Selected best hotel (Index {selected_index}): {selected_hotel.name}"
-        )
+            question = f"None of the hotels found fit your budget of {plan.budget:.2f} {budget_currency}. Would you like to increase your budget, change dates or skip the hotel?"
+        state.needs_user_input = True
+        state.validation_question = question
+        state.messages.append(AIMessage(content=question))
+        state.last_node = "hotel_agent"
+        return Command(goto="compiler", update=state)
 
-        # --- CURRENCY CONVERSION & BUDGET UPDATE ---
-        if selected_hotel.offers:
-            offer = selected_hotel.offers[0]
-            hotel_cost = float(offer.price.total)
-            hotel_currency = offer.price.currency
-            budget_currency = plan.budget_currency or "USD"
-
-            converted_hotel_cost = hotel_cost
-            if hotel_currency != budget_currency:
-                print(
-                    f"   🔁 Converting hotel cost from {hotel_currency} to {budget_currency}..."
-                )
-                try:
-                    exchange_rate_tool = GetExchangeRateTool()
-                    rate_result = exchange_rate_tool.run(
-                        {'from_currency': hotel_currency, 'to_currency': budget_currency}
-                    )
-                    conversion_rate = rate_result["rate"]
-                    converted_hotel_cost = hotel_cost * conversion_rate
-                    print(
-                        f"   ✅ Converted Cost: {converted_hotel_cost:.2f} {budget_currency} (Rate: {conversion_rate})"
-                    )
-                except Exception as e:
-                    print(f"   ⚠️ Currency conversion failed: {e}. Using original cost.")
-
-            print(f"   💰 Cost: {converted_hotel_cost:.2f} {budget_currency}")
-            plan.remaining_budget -= converted_hotel_cost
-            state.plan = plan
-        else:
-            print("   ⚠️ Selected hotel has no offers, cannot update budget.")
+    selected_index, offer_index, converted_hotel_cost = ranking[0]
+    selected_hotel = hotels[selected_index]
+    # Downstream consumers read the first offer of the selected hotel
+    selected_hotel.offers.insert(0, selected_hotel.offers.pop(offer_index))
+    offer = selected_hotel.offers[0]
+
+    explanation = describe_hotel(
+        selected_hotel,
+        offer,
+        converted_hotel_cost,
+        budget_currency,
+        duration,
+        state.latitude,
+        state.longitude,
+    )
+    if llm_explanations:
+        explanation = explain_hotel_choice(
+            state, llm, selected_hotel, explanation, config
+        )
 
-    else:
-        state.selected_hotel_index = None
-        print("   ⚠️ No valid hotel selection made or index out of range.")
+    # The budget optimizer makes the final pick and books the cost
+    state.selected_hotel_index = selected_index
+    print(f"   ✅ Best ranked hotel (Index {selected_index}): {selected_hotel.name}")
+    print(f"   💰 Cost: {converted_hotel_cost:.2f} {budget_currency}")
+    print(f"   💡 {explanation}")
 
     print("   ✅ Hotel analysis complete.")
+    mark_stage_complete(state, "hotel_selection")
 
     state.last_node = None
     state.needs_user_input = False
@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import numpy as np
+from langchain_core.messages import AIMessage
+from langgraph.types import Command
+from langsmith import traceable
+
+from src.states import AgentState, PlanDetailsState
+from src.utils.dependencies import is_stage_complete, mark_stage_complete
+from src.utils.optimizer import BundleWeights, optimize_bundle
+from src.utils.ranking import (
+    FlightScoringWeights,
+    HotelScoringWeights,
+    conversion_rates,
+    score_flight_offers,
+    score_hotel_offers,
+)
+
+
+def activity_values(state: AgentState, weights: BundleWeights) -> list[float]:
+    """One unit per activity, plus a bonus when it matches the user's interests"""
+    interests = {
+        word
+        for word in (state.plan.interests or "").lower().replace(",", " ").split()
+        if len(word) > 3
+    }
+    values = []
+    for activity in state.activity_data or []:
+        text = f"{activity.name} {activity.short_description}".lower()
+        matches = any(word.rstrip("s") in text for word in interests)
+        values.append(
+            1.0 + (weights.interest_bonus / weights.activity if matches else 0.0)
+        )
+    return values
+
+
+@traceable
+def budget_optimizer_node(
+    state: AgentState,
+    weights: BundleWeights | None = None,
+    flight_weights: FlightScoringWeights | None = None,
+    hotel_weights: HotelScoringWeights | None = None,
+):
+    print("\n🧮 BUDGET OPTIMIZER: Choosing the best combination...")
+    plan: PlanDetailsState | None = state.plan
+    if not plan or state.needs_user_input:
+        print("No plan found or awaiting user input, cannot optimize the budget.")
+        return state
+
+    if is_stage_complete(state, "budget_optimizer"):
+        print("   ℹ️  Selection already optimized and inputs unchanged, skipping...")
+        return state
+
+    weights = weights or BundleWeights()
+    budget_currency = plan.budget_currency or "USD"
+    budget = plan.budget if plan.budget is not None else float("inf")
+
+    flights = state.flight_data or []
+    hotels = state.hotel_data.hotels if plan.need_hotel and state.hotel_data else []
+    activities = (
+        state.activity_data if plan.need_activities and state.activity_data else []
+    )
+
+    currencies = {f.currency for f in flights}
+    currencies |= {o.price.currency for h in hotels for o in h.offers}
+    currencies |= {a.currency for a in activities}
+    rates = conversion_rates(currencies, budget_currency)
+
+    flight_scores, flight_costs = score_flight_offers(
+        flights, budget_currency, flight_weights, rates
+    )
+
+    nights = 1
+    try:
+        d1 = datetime.strptime(plan.departure_date, "%Y-%m-%d")
+        d2 = datetime.strptime(plan.arrival_date, "%Y-%m-%d")
+        nights = max((d2 - d1).days, 1)
+    except (TypeError, ValueError):
+        pass
+    hotel_pairs, hotel_scores, hotel_costs = score_hotel_offers(
+        hotels,
+        nights,
+        budget_currency,
+        state.latitude,
+        state.longitude,
+        hotel_weights,
+        rates,
+    )
+
+    activity_costs = np.array(
+        [a.amount * rates.get(a.currency.upper(), 1.0) for a in activities]
+    )
+
+    bundle = optimize_bundle(
+        budget,
+        flight_costs,
+        flight_scores,
+        hotel_costs,
+        hotel_scores,
+        activity_costs,
+        activity_values(state, weights) if activities else [],
+        weights,
+    )
+
+    if bundle is None:
+        question = f"I couldn't find a flight and hotel combination within your budget of {budget:.2f} {budget_currency}. Would you like to increase your budget or try different dates?"
+        state.needs_user_input = True
+        state.validation_question = question
+        state.messages.append(AIMessage(content=question))
+        # The answer changes the plan, so it goes back through the planner
+        state.last_node = "planner_agent"
+        return Command(goto="compiler", update=state)
+
+    if bundle.flight_index is not None:
+        state.selected_flight_index = bundle.flight_index
+        print(
+            f"   ✈️  Flight #{bundle.flight_index + 1}: {bundle.flight_cost:.2f} {budget_currency}"
+        )
+    state.flight_cost = bundle.flight_cost
+
+    if bundle.hotel_option is not None:
+        hotel_index, offer_index = hotel_pairs[bundle.hotel_option]
+        hotel = hotels[hotel_index]
+        # Downstream consumers read the first offer of the selected hotel
+        hotel.offers.insert(0, hotel.offers.pop(offer_index))
+        state.selected_hotel_index = hotel_index
+        print(f"   🏨 {hotel.name}: {bundle.hotel_cost:.2f} {budget_currency}")
+    elif not hotels:
+        state.selected_hotel_index = None
+    state.hotel_cost = bundle.hotel_cost
+
+    state.selected_activity_indices = bundle.activity_indices if activities else None
+    state.activity_cost = bundle.activity_cost
+    if activities:
+        print(
+            f"   🎨 {len(bundle.activity_indices)}/{len(activities)} activities: "
+            f"{bundle.activity_cost:.2f} {budget_currency}"
+        )
+
+    plan.remaining_budget = (plan.budget or 0.0) - bundle.total_cost
+    state.plan = plan
+    print(
+        f"   💰 Total: {bundle.total_cost:.2f} {budget_currency}, "
+        f"remaining {plan.remaining_budget:.2f} {budget_currency}"
+    )
+
+    mark_stage_complete(state, "budget_optimizer")
+    state.last_node = None
+    state.needs_user_input = False
+    state.validation_question = None
+    return state
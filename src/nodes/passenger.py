@@ -1,39 +1,43 @@
-import json
-from langchain_ollama import ChatOllama
-from langsmith import traceable
-from langchain_core.messages.system import SystemMessage
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any
+
 from langchain_core.messages.ai import AIMessage
-from langgraph.types import Command
+from langchain_core.messages.system import SystemMessage
 from langchain_core.runnables import RunnableConfig
-from typing import Optional
-from src.states import AgentState, TravelClass
+from langgraph.types import Command
+from langsmith import traceable
 
+from src.llm import LLMWrapper
+from src.states import AgentState, PassengerExtraction, TravelClass
+from src.utils.dependencies import is_stage_complete, mark_stage_complete
+from src.utils.fast_path import get_fast_path_stats
+from src.utils.passenger_parser import parse_passengers
 
-def passenger_skipped(state: AgentState) -> bool:
-    return state.adults is not None and not state.needs_user_input
+fast_path_stats = get_fast_path_stats("passenger_agent")
 
+# Passenger extractions the planner queued next to its own LLM call,
+# keyed by (thread_id, user message); bounded for turns that never reach
+# the passenger node
+_PREFETCH_LIMIT = 256
+_prefetched: "OrderedDict[tuple[str, str], Future]" = OrderedDict()
+_prefetch_lock = threading.Lock()
 
-@traceable
-def passenger_node(
-    state: AgentState, llm: ChatOllama, config: Optional[RunnableConfig] = None
-) -> AgentState:
-    print("\n👥 PASSENGER ANALYZER: Extracting traveler details...")
 
-    if passenger_skipped(state):
-        print(
-            "   ℹ️  Passenger details already exist and no user input needed, skipping passenger analysis."
-        )
-        return state
+def passenger_skipped(state: AgentState) -> bool:
+    return is_stage_complete(state, "passenger_agent") and not state.needs_user_input
+
+
+def _prefetch_key(state: AgentState, config: RunnableConfig | None) -> tuple[str, str]:
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id", "")
+    return str(thread_id), state.messages[-1].content
 
-    if (
-        state.needs_user_input and state.last_node != "passenger_agent"
-    ) or not state.plan:
-        print("No plan found or awaiting user input, cannot analyze passengers.")
-        return state
 
-    messages = state.messages
+PASSENGER_SYSTEM_PROMPT = """You are a passenger extractor expert.
 
-    PROMPT = f"""Your task: **Extract passenger information**.
+Your task: **Extract passenger information**.
 
 ----------------------------
 LOGIC RULES
@@ -42,48 +46,119 @@ LOGIC RULES
 - If the user does not specify the number of passengers, and there is no information about it, you can assume 1 adult.
 - Confidence is "low" only if the user mentions multiple people but doesn't specify the numbers (e.g., "I'm traveling with my family").
 
-----------------------------
-USER MESSAGE
-----------------------------
-{messages[-1].content}
-
 ----------------------------
 YOUR RESPONSE (STRICT JSON)
 ----------------------------
 Return JSON:
-{{
+{
     "adults": null or number,
     "children": null or number,
     "infants": null or number,
     "travel_class": null or "ECONOMY"/"BUSINESS"/"FIRST",
     "confidence": "high/medium/low"
-}}"""
-
-    response = llm.invoke(
-        [
-            SystemMessage(content="You are a passenger extractor expert"),
-            {"role": "user", "content": PROMPT},
-        ],
-        config=config,
-    )
-    content = (
-        response.content if isinstance(response.content, str) else str(response.content)
-    )
+}"""
 
-    try:
-        json_start = content.find("{")
-        if json_start == -1:
-            question = "How many people will be traveling? Please specify adults, children (2-11 years), and infants (under 2) if applicable."
-            state.needs_user_input = True
-            state.validation_question = question
-            state.messages.append(AIMessage(content=question))
-            state.last_node = "passenger_agent"
-            print(f"   ❓ No JSON found, need clarification: {question}")
-            return Command(goto="compiler", update=state)
 
-        json_end = content.rfind("}") + 1
-        passenger_data = json.loads(content[json_start:json_end])
+def passenger_messages(state: AgentState) -> list[Any]:
+    """Prompt asking the LLM for the passenger details in the last user message"""
+    PROMPT = f"""----------------------------
+USER MESSAGE
+----------------------------
+{state.messages[-1].content}"""
+
+    return [
+        SystemMessage(content=PASSENGER_SYSTEM_PROMPT),
+        {"role": "user", "content": PROMPT},
+    ]
+
+
+def prefetch_passengers(
+    state: AgentState, llm: LLMWrapper, config: RunnableConfig | None = None
+) -> None:
+    """
+    Queues the passenger extraction while the planner waits on its own LLM
+    call, so both prompts can share a batch. The passenger node picks the
+    answer up instead of asking again.
+    """
+    if is_stage_complete(state, "passenger_agent"):
+        return
+    if parse_passengers(state.messages[-1].content) is not None:
+        return
+
+    key = _prefetch_key(state, config)
+    with _prefetch_lock:
+        if key in _prefetched:
+            return
+        _prefetched[key] = llm.submit_structured(
+            passenger_messages(state), PassengerExtraction, config=config
+        )
+        while len(_prefetched) > _PREFETCH_LIMIT:
+            _prefetched.popitem(last=False)
+
+
+def extract_passengers_with_llm(
+    state: AgentState, llm: LLMWrapper, config: RunnableConfig | None = None
+) -> dict[str, Any] | None:
+    """Asks the LLM for passenger counts, returns None if its answer does not match the schema"""
+    with _prefetch_lock:
+        future = _prefetched.pop(_prefetch_key(state, config), None)
+
+    extraction = None
+    if future is not None:
+        try:
+            extraction = future.result()
+            print("   ⚡ Using the passenger extraction queued by the planner.")
+        except Exception as e:
+            print(f"   ⚠️ Queued passenger extraction failed, asking again: {e}")
+    if extraction is None:
+        extraction = llm.invoke_structured(
+            passenger_messages(state), PassengerExtraction, config=config
+        )
+    return extraction.model_dump(mode="json") if extraction else None
+
+
+@traceable
+def passenger_node(
+    state: AgentState, llm: LLMWrapper, config: RunnableConfig | None = None
+) -> AgentState:
+    print("\n👥 PASSENGER ANALYZER: Extracting traveler details...")
+
+    if passenger_skipped(state):
+        print(
+            "   ℹ️  Passenger details already exist and no user input needed, skipping passenger analysis."
+        )
+        return state
+
+    if (
+        state.needs_user_input and state.last_node != "passenger_agent"
+    ) or not state.plan:
+        print("No plan found or awaiting user input, cannot analyze passengers.")
+        return state
+
+    start = time.perf_counter()
+    passenger_data = parse_passengers(state.messages[-1].content)
+    elapsed = time.perf_counter() - start
+
+    if passenger_data is not None:
+        fast_path_stats.record_hit(elapsed)
+        print("   ⚡ Passengers read by the rule-based parser, skipping LLM.")
+    else:
+        fast_path_stats.record_miss(elapsed)
+        start = time.perf_counter()
+        passenger_data = extract_passengers_with_llm(state, llm, config)
+        fast_path_stats.record_llm_call(time.perf_counter() - start)
+    print(f"   📈 {fast_path_stats.report()}")
+
+    if passenger_data is None:
+        question = "How many people will be traveling? Please specify adults, children (2-11 years), and infants (under 2) if applicable."
+        state.needs_user_input = True
+        state.validation_question = question
+        state.messages.append(AIMessage(content=question))
+        state.last_node = "passenger_agent"
+        print(f"   ❓ No passenger details found, need clarification: {question}")
+        return Command(goto="compiler", update=state)
 
+    try:
         confidence = passenger_data.get("confidence", "low")
 
         if confidence == "low" or passenger_data.get("adults") is None:
@@ -122,5 +197,6 @@ Return JSON:
     state.last_node = None
     state.validation_question = None
     state.needs_user_input = False
+    mark_stage_complete(state, "passenger_agent")
 
     return state
@@ -1,14 +1,22 @@
-from datetime import datetime
-from typing import Any, Optional
-import json
-from langchain_ollama import ChatOllama
-from langchain_core.messages import SystemMessage, AIMessage
-from langsmith import traceable
-from langgraph.types import Command
+import time
+from datetime import date, datetime
+from typing import Any
+
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
+from langgraph.types import Command
+from langsmith import traceable
 
-from ..states import AgentState, PlanDetailsState
+from ..llm import LLMWrapper
+from ..states import AgentState, PlanDetailsState, PlanExtraction
 from ..tools import get_user_location
+from ..utils.dependencies import changed_plan_fields, invalidate_stages
+from ..utils.fast_path import get_fast_path_stats
+from ..utils.plan_parser import fast_path_plan
+from ..utils.semantic_cache import SemanticPlanCache
+from .passenger import prefetch_passengers
+
+fast_path_stats = get_fast_path_stats("planner_agent")
 
 
 def planner_skipped(state: AgentState) -> bool:
@@ -23,30 +31,17 @@ def planner_skipped(state: AgentState) -> bool:
     )
 
 
-@traceable
-def planner_node(
-    state: AgentState, llm: ChatOllama, config: Optional[RunnableConfig] = None
-):
-    print("\n🧠 PLANNER: Analyzing request...")
-    if state.last_node is not None and state.last_node != "planner_agent":
-        return Command(goto=state.last_node, update=state)
-
-    if planner_skipped(state):
-        print("   ℹ️  Plan already exists and no user input needed, skipping planning.")
-        return state
+# Static instructions first and request data last, so the provider can
+# reuse the prefill of this prefix across requests
+PLANNER_SYSTEM_PROMPT = """You are a travel planning extraction engine.
 
-    messages = state.messages
-    today_str = datetime.now().strftime("%Y-%m-%d")
-
-    PROMPT = f"""
 Your task: **Extract structured travel details from the user request and return ONLY valid JSON.**
 Do not add explanations, comments, or text outside the JSON.
-Today is {today_str}.
 
 ----------------------------
 LOGIC RULES
 ----------------------------
-- If the user says "tomorrow", interpret it relative to today ({today_str}).
+- If the user says "tomorrow", interpret it relative to TODAY given with the request.
 - If the user says "for a week", set arrival_date to departure_date + 7 days.
 - If the origin is not specified, leave it empty. It will be detected automatically.
 - **CURRENCY HANDLING**:
@@ -56,22 +51,13 @@ LOGIC RULES
     - If no symbol is given, assume USD. For "1000 dollars", assume USD.
 - Confidence is "low" if any critical field is unclear or missing: destination, departure_date
 - Optional fields may be left empty or false: hotel, activities.
+- Use CURRENT KNOWN INFORMATION for anything the request does not change.
 - ALWAYS output valid JSON. No extra text.
 
-----------------------------
-CURRENT KNOWN INFORMATION
-----------------------------
-{None if not state.plan else state.plan.model_dump_json()}
-
-----------------------------
-USER REQUEST
-----------------------------
-{messages[-1].content}
-
 ----------------------------
 YOUR RESPONSE (STRICT JSON)
 ----------------------------
-{{
+{
   "destination": "City, Country",
   "origin": "City, Country",
   "departure_date": "YYYY-MM-DD",
@@ -82,30 +68,94 @@ YOUR RESPONSE (STRICT JSON)
   "need_hotel": true/false,
   "need_activities": true/false,
   "confidence": "high/medium/low"
-}}
+}
+
+Return ONLY the JSON object."""
+
+
+def plan_messages(state: AgentState) -> list[Any]:
+    """Prompt asking the LLM for the plan fields in the last user message"""
+    messages = state.messages
+    today_str = datetime.now().strftime("%Y-%m-%d")
+
+    PROMPT = f"""TODAY: {today_str}
 
-Return ONLY the JSON object.
+----------------------------
+CURRENT KNOWN INFORMATION
+----------------------------
+{None if not state.plan else state.plan.model_dump_json()}
+
+----------------------------
+USER REQUEST
+----------------------------
+{messages[-1].content}
 """
 
-    response = llm.invoke(
-        [
-            SystemMessage(content="You are a travel planning extraction engine."),
-            {"role": "user", "content": PROMPT},
-        ],
+    return [
+        SystemMessage(content=PLANNER_SYSTEM_PROMPT),
+        {"role": "user", "content": PROMPT},
+    ]
+
+
+def extract_plan_with_llm(
+    state: AgentState, llm: LLMWrapper, config: RunnableConfig | None = None
+) -> dict[str, Any] | None:
+    """Asks the LLM for the plan fields, returns None if its answer does not match the schema"""
+    # Submitted rather than invoked so a prefetched passenger extraction
+    # can join the same batch
+    extraction = llm.submit_structured(
+        plan_messages(state),
+        PlanExtraction,
         config=config,
-    )
-    content: Any = response.content
+    ).result()
+    return extraction.model_dump(mode="json") if extraction else None
 
-    try:
-        json_start = content.find("{")
-        json_end = content.rfind("}") + 1
-        if json_start != -1 and json_end > json_start:
-            json_str = content[json_start:json_end]
-            plan_data = json.loads(json_str)
-        else:
-            plan_data = json.loads(content)
-    except Exception as e:
-        print(f"   ⚠️ Failed to parse plan from LLM response: {e}")
+
+@traceable
+def planner_node(
+    state: AgentState,
+    llm: LLMWrapper,
+    config: RunnableConfig | None = None,
+    semantic_cache: SemanticPlanCache | None = None,
+):
+    print("\n🧠 PLANNER: Analyzing request...")
+    if state.last_node is not None and state.last_node != "planner_agent":
+        return Command(goto=state.last_node, update=state)
+
+    if planner_skipped(state):
+        print("   ℹ️  Plan already exists and no user input needed, skipping planning.")
+        return state
+
+    start = time.perf_counter()
+    plan_data = fast_path_plan(state.messages[-1].content, date.today(), state.plan)
+    elapsed = time.perf_counter() - start
+
+    if plan_data is not None:
+        fast_path_stats.record_hit(elapsed)
+        print(
+            "   ⚡ Request fully understood by the rule-based extractor, skipping LLM."
+        )
+        print(f"   📈 {fast_path_stats.report()}")
+    else:
+        fast_path_stats.record_miss(elapsed)
+        # Only fresh requests: follow-ups are extracted against the known plan
+        use_cache = semantic_cache is not None and state.plan is None
+        request = state.messages[-1].content
+        if use_cache:
+            plan_data = semantic_cache.lookup(request, date.today())
+            if plan_data is not None:
+                print("   ⚡ Equivalent request seen before, reusing its extraction.")
+        if plan_data is None:
+            prefetch_passengers(
+                state, llm.with_config(tags=["passenger_agent"]), config
+            )
+            start = time.perf_counter()
+            plan_data = extract_plan_with_llm(state, llm, config)
+            fast_path_stats.record_llm_call(time.perf_counter() - start)
+            if use_cache and plan_data and plan_data.get("confidence") == "high":
+                semantic_cache.store(request, plan_data, date.today())
+
+    if plan_data is None:
         question = "I couldn't understand your travel request. Could you please tell me:\n- Where do you want to go?\n- Where are you traveling from?\n- When do you want to depart?\n- When do you want to return?\n- What's your budget?"
 
         state.needs_user_input = True
@@ -171,7 +221,12 @@ Return ONLY the JSON object.
         print(f"   ❓ {question}")
         return Command(goto="compiler", update=state)
 
+    previous_plan = state.plan
     state.plan = plan
+    if previous_plan is not None:
+        # Keep what was already spent so only the stages reading edited fields re-run
+        plan.remaining_budget = previous_plan.remaining_budget
+        invalidate_stages(state, changed_plan_fields(previous_plan, plan))
 
     if missing_fields or confidence == "low":
         if "departure city" in missing_fields:
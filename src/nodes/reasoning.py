@@ -1,9 +1,27 @@
+import time
+
+from langchain_core.messages import SystemMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END
-from langchain_ollama import ChatOllama
 from langsmith import traceable
-from langchain_core.runnables import RunnableConfig
-from typing import Optional
+
+from src.llm import LLMWrapper
 from src.states import AgentState, PlanDetailsState
+from src.utils.fast_path import get_fast_path_stats
+from src.utils.metrics import FALLBACKS
+from src.utils.validator import data_warnings, trip_costs, validate_itinerary
+
+fast_path_stats = get_fast_path_stats("reviewer")
+
+REVIEWER_SYSTEM_PROMPT = """You are a Strict Travel Quality Control Agent.
+
+Dates, destination and budget arithmetic have already been verified.
+
+TASK:
+Check that the day-by-day plan given by the user is coherent, matches the interests and does not invent flights, hotels or activities.
+- If good: Reply "APPROVE"
+- If bad: Reply "REJECT: [Reason]"
+"""
 
 
 @traceable()
@@ -21,15 +39,53 @@ def check_review_condition_node(state: AgentState):
 
     if "REJECT" in feedback:
         print("   ↺ REJECTED. Looping back to Compiler...")
+        FALLBACKS.inc(kind="reviewer_reject")
         return "compiler"
     else:
         print("   ✅ APPROVED. Finishing.")
         return END
 
 
+def subjective_review(
+    state: AgentState, llm: LLMWrapper, config: RunnableConfig | None = None
+) -> str:
+    """Asks the LLM about what code cannot check: coherence and invented details"""
+    plan: PlanDetailsState = state.plan
+    currency = plan.budget_currency or "USD"
+    flight_cost, hotel_cost, activity_cost = trip_costs(state)
+
+    prompt = f"""
+    PLAN:
+    - Destination: {plan.destination}
+    - Dates: {plan.departure_date} to {plan.arrival_date}
+    - Interests: {plan.interests}
+
+    COSTS:
+    - Flight cost: {flight_cost:.2f} {currency}
+    - Hotel cost: {hotel_cost:.2f} {currency}
+    - Activities cost: {activity_cost:.2f} {currency}
+
+    ITINERARY:
+    {state.final_itinerary}
+    """
+
+    raw = llm.invoke(
+        [
+            SystemMessage(content=REVIEWER_SYSTEM_PROMPT),
+            {"role": "user", "content": prompt},
+        ],
+        config=config,
+    ).content
+    response_str = raw if isinstance(raw, str) else str(raw)
+    return response_str.strip()
+
+
 @traceable
 def reviewer_node(
-    state: AgentState, llm: ChatOllama, config: Optional[RunnableConfig] = None
+    state: AgentState,
+    llm: LLMWrapper,
+    config: RunnableConfig | None = None,
+    subjective: bool = False,
 ):
     print("\n⚖️  REVIEWER: Quality Control Check...")
 
@@ -44,59 +100,32 @@ def reviewer_node(
         state.feedback = "DECLINED"
         return state
 
-    itinerary = state.final_itinerary
-    current_rev = state.revision_count
-
-    flight_cost = 0
-    if (
-        state.flight_data
-        and state.selected_flight_index is not None
-        and state.selected_flight_index < len(state.flight_data)
-    ):
-        flight_cost = float(state.flight_data[state.selected_flight_index].price)
-
-    hotel_cost = 0
-    if (
-        state.plan.need_hotel
-        and state.hotel_data
-        and state.hotel_data.hotels
-        and state.selected_hotel_index is not None
-        and state.selected_hotel_index < len(state.hotel_data.hotels)
-    ):
-        hotel_cost = float(
-            state.hotel_data.hotels[state.selected_hotel_index].offers[0].price.total
-        )
-
-    # Critique Prompt
-    prompt = f"""
-    You are a Strict Travel Quality Control Agent.
-    
-    PLAN CONSTRAINTS:
-    - Destination: {plan.destination}
-    - Dates: {plan.departure_date} to {plan.arrival_date}
-    - Initial budget: ${plan.budget}
-
-    COSTS:
-    - Flight cost: ${flight_cost}
-    - Hotel cost: ${hotel_cost}
-    - Remaining budget: ${plan.remaining_budget}
-
-    ITINERARY:
-    {itinerary}
-    
-    TASK:
-    Check if the itinerary respects the constraints.
-    The total cost of the trip should not exceed the initial budget.
-    - If good: Reply "APPROVE"
-    - If bad (wrong dates, wrong city, hallucinations, budget exceeded): Reply "REJECT: [Reason]". When budget is exceeded, don't hesitate to tell to select less activities.
-    """
+    start = time.perf_counter()
+    issues = validate_itinerary(state)
+    warnings = data_warnings(state)
+    elapsed = time.perf_counter() - start
+
+    if issues:
+        fast_path_stats.record_hit(elapsed)
+        response = "REJECT: " + " ".join(issues)
+    elif subjective:
+        # The facts hold; only the LLM can judge the rest
+        fast_path_stats.record_miss(elapsed)
+        start = time.perf_counter()
+        response = subjective_review(state, llm, config)
+        fast_path_stats.record_llm_call(time.perf_counter() - start)
+    else:
+        fast_path_stats.record_hit(elapsed)
+        response = "APPROVE"
 
-    raw = llm.invoke(prompt, config=config).content
-    response_str = raw if isinstance(raw, str) else str(raw)
-    response = response_str.strip()
+    if warnings:
+        # Reported, not rejected: only the search stages could change them
+        print(f"   ⚠️ Data warnings: {' '.join(warnings)}")
+        response = f"WARNING: {' '.join(warnings)} {response}"
 
     print(f"   🧐 Verdict: {response}")
+    print(f"   📈 {fast_path_stats.report()}")
 
     state.feedback = response
-    state.revision_count = current_rev + 1
+    state.revision_count = state.revision_count + 1
     return state
@@ -1,30 +1,40 @@
+from .activity import ActivityResultState
 from .agent import AgentState, TravelClass
-from .planner import PlanDetailsState
+from .extraction import (
+    FlightOptions,
+    HotelOptions,
+    PassengerExtraction,
+    PlanExtraction,
+)
+from .flight import FlightItinerary, FlightSearchResultState, FlightSegment
 from .hotel import (
-    HotelSearchState,
     HotelContact,
     HotelDetails,
     HotelLocation,
+    HotelSearchState,
     OfferDetails,
     PriceDetails,
     RoomDetails,
 )
-from .flight import FlightSearchResultState, FlightItinerary, FlightSegment
-from .activity import ActivityResultState
+from .planner import PlanDetailsState
 
 __all__ = [
+    "ActivityResultState",
     "AgentState",
-    "TravelClass",
-    "PlanDetailsState",
-    "HotelSearchState",
-    "FlightSearchResultState",
     "FlightItinerary",
+    "FlightOptions",
+    "FlightSearchResultState",
     "FlightSegment",
-    "ActivityResultState",
     "HotelContact",
     "HotelDetails",
     "HotelLocation",
+    "HotelOptions",
+    "HotelSearchState",
     "OfferDetails",
+    "PassengerExtraction",
+    "PlanDetailsState",
+    "PlanExtraction",
     "PriceDetails",
     "RoomDetails",
+    "TravelClass",
 ]
@@ -1,12 +1,13 @@
+from enum import Enum
+from typing import Annotated
+
+from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
-from typing import Optional, List, Annotated
-from .planner import PlanDetailsState
+
+from .activity import ActivityResultState
 from .flight import FlightSearchResultState
 from .hotel import HotelSearchState
-from .activity import ActivityResultState
-from langgraph.graph.message import add_messages
-
-from enum import Enum
+from .planner import PlanDetailsState
 
 
 class TravelClass(str, Enum):
@@ -22,7 +23,7 @@ def replace_value(old_val, new_val):
 class AgentState(BaseModel):
     # Core Messages & Plan
     messages: Annotated[list, add_messages] = Field(default_factory=list)
-    plan: Annotated[Optional[PlanDetailsState], replace_value] = Field(
+    plan: Annotated[PlanDetailsState | None, replace_value] = Field(
         default=None, description="Details of the travel plan"
     )
 
@@ -30,73 +31,90 @@ class AgentState(BaseModel):
     needs_user_input: Annotated[bool, replace_value] = Field(
         default=False, description="Indicates if more user input is needed"
     )
-    validation_question: Annotated[Optional[str], replace_value] = Field(
+    validation_question: Annotated[str | None, replace_value] = Field(
         default=None, description="Question to ask the user for clarification"
     )
-    last_node: Annotated[Optional[str], replace_value] = Field(
+    last_node: Annotated[str | None, replace_value] = Field(
         default=None, description="The last executed node in the agent workflow"
     )
+    completed_stages: Annotated[list[str], replace_value] = Field(
+        default_factory=list,
+        description="Pipeline stages whose results are up to date with their inputs",
+    )
 
     # Passenger Info
-    adults: Annotated[Optional[int], replace_value] = Field(
+    adults: Annotated[int | None, replace_value] = Field(
         default=None, description="Number of adult travelers"
     )
-    children: Annotated[Optional[int], replace_value] = Field(
+    children: Annotated[int | None, replace_value] = Field(
         default=None, description="Number of child travelers (ages 2-11)"
     )
-    infants: Annotated[Optional[int], replace_value] = Field(
+    infants: Annotated[int | None, replace_value] = Field(
         default=None, description="Number of infant travelers (under 2 years)"
     )
-    travel_class: Annotated[Optional[TravelClass], replace_value] = Field(
+    travel_class: Annotated[TravelClass | None, replace_value] = Field(
         default=None, description="Travel class (ECONOMY, BUSINESS, FIRST)"
     )
 
     # Depart / Arrival
-    city_code: Annotated[Optional[str], replace_value] = Field(
+    city_code: Annotated[str | None, replace_value] = Field(
         default=None, description="IATA code of the destination city"
     )
-    destination_name: Annotated[Optional[str], replace_value] = Field(
+    destination_name: Annotated[str | None, replace_value] = Field(
         default=None, description="Name of the destination city"
     )
-    origin_code: Annotated[Optional[str], replace_value] = Field(
+    origin_code: Annotated[str | None, replace_value] = Field(
         default=None, description="IATA code of the origin city"
     )
-    origin_name: Annotated[Optional[str], replace_value] = Field(
+    origin_name: Annotated[str | None, replace_value] = Field(
         default=None, description="Name of the origin city"
     )
-    latitude: Annotated[Optional[float], replace_value] = Field(
+    latitude: Annotated[float | None, replace_value] = Field(
         default=None, description="Latitude of the destination city"
     )
-    longitude: Annotated[Optional[float], replace_value] = Field(
+    longitude: Annotated[float | None, replace_value] = Field(
         default=None, description="Longitude of the destination city"
     )
 
     # Flights
-    flight_data: Annotated[Optional[List[FlightSearchResultState]], replace_value] = (
-        Field(default=None, description="Flight search results")
+    flight_data: Annotated[list[FlightSearchResultState] | None, replace_value] = Field(
+        default=None, description="Flight search results"
     )
-    selected_flight_index: Annotated[Optional[int], replace_value] = Field(
+    selected_flight_index: Annotated[int | None, replace_value] = Field(
         default=None, description="Index of the selected flight"
     )
+    flight_cost: Annotated[float | None, replace_value] = Field(
+        default=None, description="Cost of the selected flight in the budget currency"
+    )
 
     # Hotels
-    hotel_data: Annotated[Optional[HotelSearchState], replace_value] = Field(
+    hotel_data: Annotated[HotelSearchState | None, replace_value] = Field(
         default=None, description="Hotel search results"
     )
-    selected_hotel_index: Annotated[Optional[int], replace_value] = Field(
+    selected_hotel_index: Annotated[int | None, replace_value] = Field(
         default=None, description="Index of the selected hotel"
     )
+    hotel_cost: Annotated[float | None, replace_value] = Field(
+        default=None, description="Cost of the selected hotel in the budget currency"
+    )
 
     # Activities
-    activity_data: Annotated[Optional[List[ActivityResultState]], replace_value] = (
-        Field(default=None, description="Activity search results")
+    activity_data: Annotated[list[ActivityResultState] | None, replace_value] = Field(
+        default=None, description="Activity search results"
+    )
+    selected_activity_indices: Annotated[list[int] | None, replace_value] = Field(
+        default=None, description="Indices of the activities kept within the budget"
+    )
+    activity_cost: Annotated[float | None, replace_value] = Field(
+        default=None,
+        description="Cost of the selected activities in the budget currency",
     )
-    final_itinerary: Annotated[Optional[str], replace_value] = Field(
+    final_itinerary: Annotated[str | None, replace_value] = Field(
         default=None, description="Final itinerary details"
     )
 
     # Review & Feedback
-    feedback: Annotated[Optional[str], replace_value] = Field(
+    feedback: Annotated[str | None, replace_value] = Field(
         default=None, description="User feedback"
     )
     revision_count: Annotated[int, replace_value] = Field(
@@ -0,0 +1,56 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from .agent import TravelClass
+from .flight import FlightSearchResultState
+from .hotel import HotelDetails
+
+Confidence = Literal["high", "medium", "low"]
+
+
+class PlanExtraction(BaseModel):
+    """Plan fields the planner asks the LLM to extract from a request"""
+
+    destination: str | None = Field(None, description="Destination as 'City, Country'")
+    origin: str | None = Field(
+        None, description="Origin as 'City, Country', empty if not given"
+    )
+    departure_date: str | None = Field(None, description="Departure date, YYYY-MM-DD")
+    arrival_date: str | None = Field(None, description="Return date, YYYY-MM-DD")
+    budget: float | None = Field(None, description="Total budget amount")
+    budget_currency: str = Field("USD", description="ISO currency code of the budget")
+    interests: str = Field("", description="User interests for activity suggestions")
+    need_hotel: bool = Field(False, description="Whether the user needs a hotel")
+    need_activities: bool = Field(
+        False, description="Whether the user wants activities"
+    )
+    confidence: Confidence = Field(
+        "medium", description="Low if destination or departure date is unclear"
+    )
+
+
+class PassengerExtraction(BaseModel):
+    """Traveler counts and cabin class the passenger agent asks the LLM for"""
+
+    adults: int | None = Field(None, description="Number of adults")
+    children: int | None = Field(None, description="Number of children aged 2-11")
+    infants: int | None = Field(None, description="Number of infants under 2")
+    travel_class: TravelClass | None = Field(None, description="Requested cabin class")
+    confidence: Confidence = Field(
+        "low", description="Low if people are mentioned without numbers"
+    )
+
+
+class FlightOptions(BaseModel):
+    """Flight offers generated from LLM knowledge when tools are disabled"""
+
+    flights: list[FlightSearchResultState] = Field(
+        description="Round-trip flight offers"
+    )
+
+
+class HotelOptions(BaseModel):
+    """Hotels generated from LLM knowledge when tools are disabled"""
+
+    hotels: list[HotelDetails] = Field(description="Hotels in the destination city")
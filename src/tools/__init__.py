@@ -1,31 +1,64 @@
-from .amadeus.auth import AmadeusAuth
-from .amadeus.flight_search import (
-    FlightSearchInput,
-    FlightSearchTool,
-    FlightSearchResultState,
-)
-from .amadeus.activity_search import ActivitySearchInput, ActivitySearchTool
-from .amadeus.city_search import CitySearchTool, CitySearchResult
-from .amadeus.hotel_search import HotelSearchInput, HotelSearchTool
-from .date import get_todays_date
-from .weather import GetWeatherTool
-from .exchange_rate import GetExchangeRateTool
-from .location import get_user_location
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .amadeus.activity_search import ActivitySearchInput, ActivitySearchTool
+    from .amadeus.auth import AmadeusAuth
+    from .amadeus.city_search import CitySearchInput, CitySearchResult, CitySearchTool
+    from .amadeus.flight_search import (
+        FlightSearchInput,
+        FlightSearchResultState,
+        FlightSearchTool,
+    )
+    from .amadeus.hotel_search import HotelSearchInput, HotelSearchTool
+    from .date import get_todays_date
+    from .exchange_rate import GetExchangeRateTool
+    from .location import get_user_location
+    from .weather import GetWeatherTool
+
+# Tools are imported on first access: a process that only needs one of them
+# (the exchange rate endpoint, the ranking helpers) skips the others
+_EXPORTS = {
+    "AmadeusAuth": ".amadeus.auth",
+    "FlightSearchInput": ".amadeus.flight_search",
+    "FlightSearchTool": ".amadeus.flight_search",
+    "FlightSearchResultState": ".amadeus.flight_search",
+    "ActivitySearchInput": ".amadeus.activity_search",
+    "ActivitySearchTool": ".amadeus.activity_search",
+    "CitySearchInput": ".amadeus.city_search",
+    "CitySearchTool": ".amadeus.city_search",
+    "CitySearchResult": ".amadeus.city_search",
+    "HotelSearchInput": ".amadeus.hotel_search",
+    "HotelSearchTool": ".amadeus.hotel_search",
+    "get_todays_date": ".date",
+    "GetWeatherTool": ".weather",
+    "GetExchangeRateTool": ".exchange_rate",
+    "get_user_location": ".location",
+}
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
+    "ActivitySearchInput",
+    "ActivitySearchTool",
     "AmadeusAuth",
-    "GetExchangeRateTool",
-    "get_todays_date",
-    "GetWeatherTool",
+    "CitySearchInput",
+    "CitySearchResult",
+    "CitySearchTool",
     "FlightSearchInput",
-    "FlightSearchTool",
     "FlightSearchResultState",
+    "FlightSearchTool",
+    "GetExchangeRateTool",
+    "GetWeatherTool",
     "HotelSearchInput",
     "HotelSearchTool",
-    "ActivitySearchInput",
-    "ActivitySearchTool",
-    "CitySearchInput",
-    "CitySearchTool",
-    "CitySearchResult",
+    "get_todays_date",
     "get_user_location",
 ]
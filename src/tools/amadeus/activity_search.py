@@ -1,10 +1,11 @@
-from pydantic import BaseModel, Field
 import requests
-from typing import Dict, List, Type
-from .auth import AmadeusAuth
 from langchain.tools import BaseTool
+from pydantic import BaseModel, Field
 
 from src.states import ActivityResultState
+from src.tools.http import timed_request
+
+from .auth import AmadeusAuth
 
 
 class ActivitySearchInput(BaseModel):
@@ -25,7 +26,7 @@ class ActivitySearchTool(BaseTool):
     Returns details including name, price, booking link, and short description.
     Input should be the city name (e.g. 'Paris').
     """
-    args_schema: Type[BaseModel] = ActivitySearchInput
+    args_schema: type[BaseModel] = ActivitySearchInput
     amadeus_auth: AmadeusAuth | None = None
 
     def __init__(self, amadeus_auth: AmadeusAuth | None = None):
@@ -38,15 +39,21 @@ class ActivitySearchTool(BaseTool):
             return None
 
         url: str = f"{self.amadeus_auth.base_url}/v1/reference-data/locations"
-        headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
-        params: Dict[str, str | int] = {
+        headers: dict[str, str] = {"Authorization": f"Bearer {token}"}
+        params: dict[str, str | int] = {
             "keyword": keyword,
             "subType": "CITY,AIRPORT",
             "page[limit]": 1,
         }
 
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = timed_request(
+                "GET",
+                url,
+                "amadeus_locations",
+                headers=headers,
+                params=params,
+            )
             response.raise_for_status()
             data = response.json()
             if data.get("data"):
@@ -58,12 +65,12 @@ class ActivitySearchTool(BaseTool):
             print(f"No location found for keyword: {keyword}")
             return None
         except Exception as e:
-            print(f"Error getting coordinates: {str(e)}")
+            print(f"Error getting coordinates: {e!s}")
             return None
 
     def _run(
         self, location: str, radius: int = 5, max_places: int = 5
-    ) -> List[ActivityResultState]:
+    ) -> list[ActivityResultState]:
         """Search for activities"""
         if not self.amadeus_auth:
             raise ValueError("AmadeusAuth instance is required for activity search.")
@@ -83,21 +90,33 @@ class ActivitySearchTool(BaseTool):
             headers = {"Authorization": f"Bearer {token}"}
             params = {"latitude": lat, "longitude": lon, "radius": radius}
 
-            response = requests.get(url, headers=headers, params=params)
+            response = timed_request(
+                "GET",
+                url,
+                "amadeus_activities",
+                headers=headers,
+                params=params,
+            )
             response.raise_for_status()
             data = response.json()
 
             if not data.get("data"):
                 raise ValueError(f"No activities found for location: {location}")
 
-            results: List[ActivityResultState] = []
+            results: list[ActivityResultState] = []
             for item in data["data"][:max_places]:
 
                 # Price formatting
                 price_data = item.get("price", {})
-                amount = float(price_data.get("amount")) if price_data.get("amount") else None
-                currency = price_data.get("currencyCode", "USD") # Default to USD if not provided
-                
+                amount = (
+                    float(price_data.get("amount"))
+                    if price_data.get("amount")
+                    else None
+                )
+                currency = price_data.get(
+                    "currencyCode", "USD"
+                )  # Default to USD if not provided
+
                 results.append(
                     ActivityResultState(
                         name=item.get("name", "Unnamed Activity"),
@@ -113,10 +132,10 @@ class ActivitySearchTool(BaseTool):
             return results
 
         except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error: {str(e)}")
+            print(f"HTTP Error: {e!s}")
             return []
         except Exception as e:
-            print(f"Error: {str(e)}")
+            print(f"Error: {e!s}")
             return []
 
     async def _arun(self, *args, **kwargs):
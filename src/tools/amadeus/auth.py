@@ -1,6 +1,7 @@
-import requests
 from datetime import datetime
 
+from src.tools.http import timed_request
+
 
 class AmadeusAuth:
     """Handle Amadeus API authentication"""
@@ -26,7 +27,13 @@ class AmadeusAuth:
             "client_secret": self.api_secret,
         }
 
-        response = requests.post(url, headers=headers, data=data)
+        response = timed_request(
+            "POST",
+            url,
+            "amadeus_oauth_token",
+            headers=headers,
+            data=data,
+        )
         response.raise_for_status()
 
         token_data = response.json()
@@ -1,9 +1,11 @@
+import time
+
+from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
-import requests
-from typing import Dict, Type, Optional
+
+from src.tools.http import timed_request
+
 from .auth import AmadeusAuth
-from langchain.tools import BaseTool
-import time
 
 
 class CitySearchInput(BaseModel):
@@ -20,23 +22,23 @@ class CitySearchResult(BaseModel):
 
     name: str = Field(description="Name of the city or airport")
     iata_code: str = Field(description="IATA code of the city or airport")
-    latitude: Optional[float] = Field(description="Latitude of the city or airport")
-    longitude: Optional[float] = Field(description="Longitude of the city or airport")
+    latitude: float | None = Field(description="Latitude of the city or airport")
+    longitude: float | None = Field(description="Longitude of the city or airport")
 
 
 class CitySearchTool(BaseTool):
-    last_called: Optional[str] = None
+    last_called: str | None = None
     """Tool for searching for IATA/City codes using Amadeus Location API"""
     name: str = "get_city_code"
     description: str = "Searches for Amadeus City Code. Returns None if not found."
-    args_schema: Type[BaseModel] = CitySearchInput
+    args_schema: type[BaseModel] = CitySearchInput
     amadeus_auth: AmadeusAuth | None = None
 
     def __init__(self, amadeus_auth: AmadeusAuth | None = None):
         super().__init__()
         self.amadeus_auth = amadeus_auth
 
-    def _run(self, keyword: str, subType: str = "CITY") -> Optional[CitySearchResult]:
+    def _run(self, keyword: str, subType: str = "CITY") -> CitySearchResult | None:
         """Search for city/location code"""
         if not self.amadeus_auth:
             raise ValueError("AmadeusAuth instance is required for city search.")
@@ -46,21 +48,30 @@ class CitySearchTool(BaseTool):
                 - time.mktime(time.strptime(self.last_called, "%Y-%m-%d %H:%M:%S"))
             )
             if sleep_time > 0:
-                time.sleep(sleep_time)
+                from src.utils.tracing import span
+
+                with span("amadeus_rate_limit", "wait", seconds=round(sleep_time, 3)):
+                    time.sleep(sleep_time)
         self.last_called = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
         try:
             token = self.amadeus_auth.get_access_token()
             url = f"{self.amadeus_auth.base_url}/v1/reference-data/locations"
 
-            headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
-            params: Dict[str, str | int] = {
+            headers: dict[str, str] = {"Authorization": f"Bearer {token}"}
+            params: dict[str, str | int] = {
                 "keyword": keyword.strip(),
                 "subType": subType.upper(),
                 "view": "FULL",
                 "page[limit]": 1,
             }
 
-            response = requests.get(url, headers=headers, params=params)
+            response = timed_request(
+                "GET",
+                url,
+                "amadeus_locations",
+                headers=headers,
+                params=params,
+            )
             response.raise_for_status()
             data = response.json()
 
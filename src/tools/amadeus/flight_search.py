@@ -1,10 +1,13 @@
+from typing import Any
+
 import requests
-from typing import Any, Dict, Optional, List, Type
-from pydantic import BaseModel, Field
 from langchain.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from src.states import FlightItinerary, FlightSearchResultState, FlightSegment
+from src.tools.http import timed_request
 
 from .auth import AmadeusAuth
-from src.states import FlightSearchResultState, FlightItinerary, FlightSegment
 
 
 class FlightSearchInput(BaseModel):
@@ -15,11 +18,11 @@ class FlightSearchInput(BaseModel):
         description="Destination airport IATA code (e.g., 'LHR', 'CDG')"
     )
     departure_date: str = Field(description="Departure date in YYYY-MM-DD format")
-    return_date: Optional[str] = Field(
+    return_date: str | None = Field(
         None, description="Return date for round-trip in YYYY-MM-DD format"
     )
     adults: int = Field(1, description="Number of adult passengers (default: 1)")
-    travel_class: Optional[str] = Field(
+    travel_class: str | None = Field(
         "ECONOMY",
         description="Travel class: ECONOMY, PREMIUM_ECONOMY, BUSINESS, or FIRST",
     )
@@ -38,7 +41,7 @@ class FlightSearchTool(BaseTool):
     Returns flight details including prices, airlines, duration, and layover information.
     Input requires origin, destination, departure date, and optionally return date.
     """
-    args_schema: Type[BaseModel] = FlightSearchInput
+    args_schema: type[BaseModel] = FlightSearchInput
     amadeus_auth: AmadeusAuth | None = None
 
     def __init__(self, amadeus_auth: AmadeusAuth | None = None):
@@ -50,11 +53,11 @@ class FlightSearchTool(BaseTool):
         origin: str,
         destination: str,
         departure_date: str,
-        return_date: Optional[str] = None,
+        return_date: str | None = None,
         adults: int = 1,
         travel_class: str = "ECONOMY",
         max_results: int = 5,
-    ) -> List[FlightSearchResultState]:
+    ) -> list[FlightSearchResultState]:
         """Search for flights"""
         try:
             if not self.amadeus_auth:
@@ -63,8 +66,8 @@ class FlightSearchTool(BaseTool):
             token = self.amadeus_auth.get_access_token()
             url = f"{self.amadeus_auth.base_url}/v2/shopping/flight-offers"
 
-            headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
-            params: Dict[str, Any] = {
+            headers: dict[str, str] = {"Authorization": f"Bearer {token}"}
+            params: dict[str, Any] = {
                 "originLocationCode": origin.upper(),
                 "destinationLocationCode": destination.upper(),
                 "departureDate": departure_date,
@@ -76,7 +79,13 @@ class FlightSearchTool(BaseTool):
             if return_date:
                 params["returnDate"] = return_date
 
-            response = requests.get(url, headers=headers, params=params)
+            response = timed_request(
+                "GET",
+                url,
+                "amadeus_flight_offers",
+                headers=headers,
+                params=params,
+            )
             response.raise_for_status()
 
             data = response.json()
@@ -85,14 +94,14 @@ class FlightSearchTool(BaseTool):
                 return []
 
             # Parse results
-            results: List[FlightSearchResultState] = []
+            results: list[FlightSearchResultState] = []
             for offer in data["data"][:max_results]:
                 price = offer["price"]["total"]
                 currency = offer["price"]["currency"]
 
-                itineraries: List[FlightItinerary] = []
+                itineraries: list[FlightItinerary] = []
                 for itin in offer["itineraries"]:
-                    segments: List[FlightSegment] = []
+                    segments: list[FlightSegment] = []
                     for segment in itin["segments"]:
                         segments.append(
                             FlightSegment(
@@ -120,4 +129,4 @@ class FlightSearchTool(BaseTool):
         except requests.exceptions.HTTPError as e:
             raise ValueError(f"API Error: {e.response.status_code} - {e.response.text}")
         except Exception as e:
-            raise ValueError(f"Error searching flights: {str(e)}")
+            raise ValueError(f"Error searching flights: {e!s}")
@@ -1,20 +1,21 @@
-from typing import Any, List, Optional
-from pydantic import BaseModel, Field
+from typing import Any
+
 import requests
-from typing import Type, Dict
 from langchain.tools import BaseTool
-
-from .auth import AmadeusAuth
+from pydantic import BaseModel, Field
 
 from src.states import (
-    HotelSearchState,
-    HotelDetails,
     HotelContact,
+    HotelDetails,
     HotelLocation,
+    HotelSearchState,
     OfferDetails,
     PriceDetails,
     RoomDetails,
 )
+from src.tools.http import timed_request
+
+from .auth import AmadeusAuth
 
 
 class HotelSearchInput(BaseModel):
@@ -27,7 +28,7 @@ class HotelSearchInput(BaseModel):
     check_out_date: str = Field(description="Check-out date in YYYY-MM-DD format")
     adults: int = Field(1, description="Number of adult guests (default: 1)")
     room_quantity: int = Field(1, description="Number of rooms (default: 1)")
-    radius: Optional[int] = Field(
+    radius: int | None = Field(
         5, description="Search radius in kilometers (default: 5)"
     )
     max_results: int = Field(
@@ -45,7 +46,7 @@ class HotelSearchTool(BaseTool):
     Returns hotel details including prices, names, addresses, and room descriptions.
     Input requires city code, check-in date, and check-out date at minimum.
     """
-    args_schema: Type[BaseModel] = HotelSearchInput
+    args_schema: type[BaseModel] = HotelSearchInput
     amadeus_auth: AmadeusAuth | None = None
 
     def __init__(self, amadeus_auth: AmadeusAuth | None = None):
@@ -54,21 +55,27 @@ class HotelSearchTool(BaseTool):
 
     def _get_hotel_ids_by_city(
         self, token: str, city_code: str, radius: int = 5, max_hotels: int = 20
-    ) -> List[str]:
+    ) -> list[str]:
         """Helper to get hotel IDs in a city within a radius"""
         if not self.amadeus_auth:
             raise ValueError("AmadeusAuth instance is required for hotel search.")
         url = f"{self.amadeus_auth.base_url}/v1/reference-data/locations/hotels/by-city"
 
-        headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
-        params: Dict[str, str | int] = {
+        headers: dict[str, str] = {"Authorization": f"Bearer {token}"}
+        params: dict[str, str | int] = {
             "cityCode": city_code.upper(),
             "radius": radius,
             "radiusUnit": "KM",
             "hotelSource": "ALL",
         }
 
-        response = requests.get(url, headers=headers, params=params)
+        response = timed_request(
+            "GET",
+            url,
+            "amadeus_hotels_by_city",
+            headers=headers,
+            params=params,
+        )
         response.raise_for_status()
 
         data = response.json()
@@ -98,7 +105,7 @@ class HotelSearchTool(BaseTool):
             if token is None:
                 raise ValueError("Amadeus auth token is missing")
 
-            hotel_ids: List[str] = self._get_hotel_ids_by_city(
+            hotel_ids: list[str] = self._get_hotel_ids_by_city(
                 token,
                 city_code,
                 radius,
@@ -110,8 +117,8 @@ class HotelSearchTool(BaseTool):
 
             url = f"{self.amadeus_auth.base_url}/v3/shopping/hotel-offers"
 
-            headers: Dict[str, str] = {"Authorization": f"Bearer {token}"}
-            params: Dict[str, Any] = {
+            headers: dict[str, str] = {"Authorization": f"Bearer {token}"}
+            params: dict[str, Any] = {
                 "hotelIds": ",".join(hotel_ids),
                 "checkInDate": check_in_date,
                 "checkOutDate": check_out_date,
@@ -121,7 +128,13 @@ class HotelSearchTool(BaseTool):
                 "bestRateOnly": "true",
             }
 
-            response = requests.get(url, headers=headers, params=params)
+            response = timed_request(
+                "GET",
+                url,
+                "amadeus_hotel_offers",
+                headers=headers,
+                params=params,
+            )
             response.raise_for_status()
 
             data = response.json()
@@ -207,7 +220,7 @@ class HotelSearchTool(BaseTool):
         except requests.exceptions.HTTPError as e:
             raise Exception(f"API Error: {e.response.status_code} - {e.response.text}")
         except Exception as e:
-            raise Exception(f"Error searching hotels: {str(e)}")
+            raise Exception(f"Error searching hotels: {e!s}")
 
     async def _arun(self, *args, **kwargs):
         """Async version - not implemented"""
@@ -1,12 +1,18 @@
-import requests
-from typing import TypedDict, List, Tuple, Dict, Set, Type
+from typing import TypedDict
+
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
+from src.tools.http import timed_request
+
 
 class ExchangeRateInput(BaseModel):
-    from_currency: str = Field(..., description="The currency to convert from (e.g., 'USD', 'JPY')")
-    to_currency: str = Field(..., description="The currency to convert to (e.g., 'EUR', 'USD')")
+    from_currency: str = Field(
+        ..., description="The currency to convert from (e.g., 'USD', 'JPY')"
+    )
+    to_currency: str = Field(
+        ..., description="The currency to convert to (e.g., 'EUR', 'USD')"
+    )
 
 
 class ExchangeRateResult(TypedDict):
@@ -23,7 +29,7 @@ class GetExchangeRateTool(BaseTool):
         "Get the current exchange rate between two currencies. "
         "This tool helps travel agents provide accurate pricing in the user's preferred currency."
     )
-    args_schema: Type[BaseModel] = ExchangeRateInput
+    args_schema: type[BaseModel] = ExchangeRateInput
 
     def _run(self, from_currency: str, to_currency: str) -> ExchangeRateResult:
         try:
@@ -32,7 +38,7 @@ class GetExchangeRateTool(BaseTool):
 
             url = f"https://api.frankfurter.dev/v1/latest?from={from_currency}&to={to_currency}"
 
-            response = requests.get(url, timeout=10)
+            response = timed_request("GET", url, "frankfurter_latest", timeout=10)
             response.raise_for_status()
 
             data = response.json()
@@ -51,15 +57,15 @@ class GetExchangeRateTool(BaseTool):
             )
 
         except Exception as e:
-            raise ValueError(f"Error fetching exchange rate: {str(e)}")
+            raise ValueError(f"Error fetching exchange rate: {e!s}")
 
     async def _arun(self, from_currency: str, to_currency: str) -> ExchangeRateResult:
         raise NotImplementedError("get_exchange_rate does not support async")
 
 
 def get_exchange_rates(
-    conversion_requests: Set[Tuple[str, str]]
-) -> Dict[Tuple[str, str], float]:
+    conversion_requests: set[tuple[str, str]],
+) -> dict[tuple[str, str], float]:
     """
     Fetches exchange rates for a set of currency conversion requests, batching API calls by the 'from' currency.
 
@@ -69,10 +75,10 @@ def get_exchange_rates(
     Returns:
         A dictionary mapping each (from_currency, to_currency) tuple to its exchange rate.
     """
-    rates: Dict[Tuple[str, str], float] = {}
-    
+    rates: dict[tuple[str, str], float] = {}
+
     # Group requests by from_currency
-    grouped_requests: Dict[str, List[str]] = {}
+    grouped_requests: dict[str, list[str]] = {}
     for from_curr, to_curr in conversion_requests:
         if from_curr not in grouped_requests:
             grouped_requests[from_curr] = []
@@ -82,12 +88,12 @@ def get_exchange_rates(
     for from_curr, to_currencies in grouped_requests.items():
         to_symbols = ",".join(set(to_currencies))
         url = f"https://api.frankfurter.dev/v1/latest?from={from_curr}&to={to_symbols}"
-        
+
         try:
-            response = requests.get(url, timeout=10)
+            response = timed_request("GET", url, "frankfurter_latest", timeout=10)
             response.raise_for_status()
             data = response.json()
-            
+
             if "rates" in data:
                 for to_curr, rate in data["rates"].items():
                     rates[(from_curr, to_curr)] = rate
@@ -0,0 +1,25 @@
+import time
+from typing import Any
+
+import requests
+
+
+def timed_request(
+    method: str, url: str, endpoint: str, **kwargs: Any
+) -> requests.Response:
+    """`requests.request` recording its latency and trace span under an endpoint label"""
+    # Imported here: src.utils itself depends on src.tools
+    from src.utils.metrics import TOOL_DURATION, status_class
+    from src.utils.tracing import span
+
+    start = time.perf_counter()
+    status: int | None = None
+    try:
+        with span(endpoint, "http", method=method):
+            response = requests.request(method, url, **kwargs)
+        status = response.status_code
+        return response
+    finally:
+        TOOL_DURATION.observe(
+            time.perf_counter() - start, endpoint=endpoint, status=status_class(status)
+        )
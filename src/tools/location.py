@@ -1,12 +1,12 @@
 from langchain.tools import tool
 from langsmith import traceable
-import requests
-from typing import Optional
+
+from src.tools.http import timed_request
 
 
 @tool
 @traceable(run_type="tool", name="get_user_location")
-def get_user_location(ip_address: Optional[str] = None) -> str:
+def get_user_location(ip_address: str | None = None) -> str:
     """
     Identifies the city and country of a user based on their IP address.
     If no IP is provided, it detects the current machine's public IP.
@@ -20,7 +20,7 @@ def get_user_location(ip_address: Optional[str] = None) -> str:
             else "http://ip-api.com/json/"
         )
 
-        response = requests.get(url, timeout=5)
+        response = timed_request("GET", url, "ip_api", timeout=5)
         data = response.json()
 
         if data["status"] == "fail":
@@ -33,7 +33,7 @@ def get_user_location(ip_address: Optional[str] = None) -> str:
         return f"{city}, {region}, {country}"
 
     except Exception as e:
-        return f"Failed to retrieve location. Error: {str(e)}"
+        return f"Failed to retrieve location. Error: {e!s}"
 
 
 # Example Usage:
@@ -1,8 +1,11 @@
-from typing import TypedDict
 import os
+from typing import TypedDict
+
 import requests
-from langsmith import traceable
 from langchain.tools import BaseTool
+from langsmith import traceable
+
+from src.tools.http import timed_request
 
 
 class WeatherToolResult(TypedDict):
@@ -54,7 +57,9 @@ class GetWeatherTool(BaseTool):
                 "aqi": "no",
             }
 
-            response = requests.get(url, params=params, timeout=10)
+            response = timed_request(
+                "GET", url, "weatherapi_current", params=params, timeout=10
+            )
             response.raise_for_status()
 
             data = response.json()
@@ -79,15 +84,15 @@ class GetWeatherTool(BaseTool):
             return result
 
         except requests.exceptions.HTTPError as e:
-            raise ValueError(f"HTTP error occurred: {str(e)}")
+            raise ValueError(f"HTTP error occurred: {e!s}")
         except requests.exceptions.RequestException as e:
-            raise ValueError(f"Error: Unable to connect to weather service. {str(e)}")
+            raise ValueError(f"Error: Unable to connect to weather service. {e!s}")
         except KeyError as e:
             raise ValueError(
-                f"Error: Unexpected response format from weather service. Missing key: {str(e)}"
+                f"Error: Unexpected response format from weather service. Missing key: {e!s}"
             )
         except Exception as e:
-            raise ValueError(f"Error getting weather: {str(e)}")
+            raise ValueError(f"Error getting weather: {e!s}")
 
     async def _arun(self, city: str) -> WeatherToolResult:
         raise NotImplementedError("Async execution is not supported for this tool.")
@@ -1,5 +1,51 @@
-from .utils import print_graph_execution
-from .token_usage import TokenUsageTracker
 from .checkpoint_manager import CheckpointManager
+from .dependencies import (
+    STAGES,
+    changed_plan_fields,
+    invalidate_stages,
+    invalidation_update,
+    is_stage_complete,
+    mark_stage_complete,
+)
+from .fast_path import FastPathStats, all_fast_path_stats, get_fast_path_stats
+from .node_cache import NodeCache, memoize_node
+from .optimizer import BundleWeights, optimize_bundle
+from .passenger_parser import parse_passengers
+from .plan_parser import fast_path_plan
+from .prompt_budget import PromptBudget, count_tokens, prompt_budget
+from .revision import RevisionStats, revision_stats
+from .semantic_cache import SemanticPlanCache
+from .sqlite_lru import SQLiteLRUCache
+from .token_usage import TokenUsageTracker
+from .utils import print_graph_execution
+from .validator import data_warnings, validate_itinerary
 
-__all__ = ["print_graph_execution", "TokenUsageTracker", "CheckpointManager"]
+__all__ = [
+    "STAGES",
+    "BundleWeights",
+    "CheckpointManager",
+    "FastPathStats",
+    "NodeCache",
+    "PromptBudget",
+    "RevisionStats",
+    "SQLiteLRUCache",
+    "SemanticPlanCache",
+    "TokenUsageTracker",
+    "all_fast_path_stats",
+    "changed_plan_fields",
+    "count_tokens",
+    "data_warnings",
+    "fast_path_plan",
+    "get_fast_path_stats",
+    "invalidate_stages",
+    "invalidation_update",
+    "is_stage_complete",
+    "mark_stage_complete",
+    "memoize_node",
+    "optimize_bundle",
+    "parse_passengers",
+    "print_graph_execution",
+    "prompt_budget",
+    "revision_stats",
+    "validate_itinerary",
+]
@@ -0,0 +1,283 @@
+from collections.abc import Iterable
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from src.states import AgentState, PlanDetailsState
+
+
+class StageDependencies(BaseModel):
+    """State fields a pipeline stage reads and the results it produces"""
+
+    node: str = Field(description="Graph node that runs this stage")
+    reads: list[str] = Field(description="State fields the stage depends on")
+    writes: list[str] = Field(description="State fields the stage produces")
+    version: int = Field(1, description="Bumped whenever the stage logic changes")
+
+
+# Stages in pipeline order. A node may run several stages (e.g. search, then
+# selection) so that a change can invalidate one without the other. Nested plan
+# fields are addressed as "plan.<field>".
+STAGES: dict[str, StageDependencies] = {
+    "city_resolver": StageDependencies(
+        node="city_resolver",
+        reads=["plan.origin", "plan.destination", "with_tools"],
+        writes=[
+            "city_code",
+            "destination_name",
+            "origin_code",
+            "origin_name",
+            "latitude",
+            "longitude",
+            "plan.origin",
+            "plan.destination",
+        ],
+    ),
+    "passenger_agent": StageDependencies(
+        node="passenger_agent",
+        reads=["last_message"],
+        writes=["adults", "children", "infants", "travel_class"],
+    ),
+    "flight_search": StageDependencies(
+        node="flight_agent",
+        reads=[
+            "plan.origin",
+            "plan.destination",
+            "plan.departure_date",
+            "plan.arrival_date",
+            "adults",
+            "travel_class",
+            "with_tools",
+        ],
+        writes=["flight_data"],
+    ),
+    "flight_selection": StageDependencies(
+        node="flight_agent",
+        reads=[
+            "flight_data",
+            "plan.budget",
+            "plan.budget_currency",
+            "adults",
+            "children",
+        ],
+        writes=["selected_flight_index"],
+        version=3,
+    ),
+    "hotel_search": StageDependencies(
+        node="hotel_agent",
+        reads=[
+            "city_code",
+            "origin_code",
+            "plan.departure_date",
+            "plan.arrival_date",
+            "plan.need_hotel",
+            "with_tools",
+        ],
+        writes=["hotel_data"],
+    ),
+    "hotel_selection": StageDependencies(
+        node="hotel_agent",
+        reads=[
+            "hotel_data",
+            "plan.budget",
+            "plan.budget_currency",
+            "plan.departure_date",
+            "plan.arrival_date",
+            "latitude",
+            "longitude",
+            "adults",
+            "children",
+            "infants",
+        ],
+        writes=["selected_hotel_index"],
+        version=3,
+    ),
+    "activity_search": StageDependencies(
+        node="activity_agent",
+        reads=["city_code", "plan.destination", "plan.need_activities"],
+        writes=["activity_data"],
+    ),
+    "budget_optimizer": StageDependencies(
+        node="budget_optimizer",
+        reads=[
+            "flight_data",
+            "selected_flight_index",
+            "hotel_data",
+            "selected_hotel_index",
+            "activity_data",
+            "latitude",
+            "longitude",
+            "plan.budget",
+            "plan.budget_currency",
+            "plan.departure_date",
+            "plan.arrival_date",
+            "plan.interests",
+            "plan.need_hotel",
+            "plan.need_activities",
+        ],
+        writes=[
+            "selected_flight_index",
+            "flight_cost",
+            "selected_hotel_index",
+            "hotel_data",
+            "hotel_cost",
+            "selected_activity_indices",
+            "activity_cost",
+            "plan.remaining_budget",
+        ],
+    ),
+    "compiler": StageDependencies(
+        node="compiler",
+        reads=[
+            "plan.destination",
+            "plan.departure_date",
+            "plan.arrival_date",
+            "plan.budget",
+            "plan.budget_currency",
+            "adults",
+            "children",
+            "infants",
+            "travel_class",
+            "flight_data",
+            "selected_flight_index",
+            "hotel_data",
+            "selected_hotel_index",
+            "activity_data",
+            "selected_activity_indices",
+            "feedback",
+        ],
+        writes=["final_itinerary", "plan.remaining_budget"],
+    ),
+}
+
+# Defaults a result field is reset to when its stage is invalidated
+RESET_VALUES: dict[str, Any] = {
+    "city_code": None,
+    "destination_name": None,
+    "origin_code": None,
+    "origin_name": None,
+    "latitude": None,
+    "longitude": None,
+    "adults": None,
+    "children": None,
+    "infants": None,
+    "travel_class": None,
+    "flight_data": None,
+    "selected_flight_index": None,
+    "flight_cost": None,
+    "hotel_data": None,
+    "selected_hotel_index": None,
+    "hotel_cost": None,
+    "activity_data": None,
+    "selected_activity_indices": None,
+    "activity_cost": None,
+    "final_itinerary": None,
+}
+
+# Stage whose results carry the amounts spent in the budget currency
+STAGE_COSTS: dict[str, list[str]] = {
+    "budget_optimizer": ["flight_cost", "hotel_cost", "activity_cost"],
+}
+
+
+def stages_for_node(node: str) -> list[str]:
+    return [name for name, stage in STAGES.items() if stage.node == node]
+
+
+def first_writer(field: str) -> str | None:
+    """The earliest stage in pipeline order producing a field"""
+    return next((name for name, stage in STAGES.items() if field in stage.writes), None)
+
+
+def is_stage_complete(state: AgentState, stage: str) -> bool:
+    return stage in state.completed_stages
+
+
+def mark_stage_complete(state: AgentState, stage: str) -> None:
+    if stage not in state.completed_stages:
+        state.completed_stages = [*state.completed_stages, stage]
+
+
+def read_field(state: AgentState, field: str) -> Any:
+    """Resolves a declared field name (including "plan.<field>") against the state"""
+    if field == "last_message":
+        return state.messages[-1].content if state.messages else None
+    if field.startswith("plan."):
+        return getattr(state.plan, field[5:], None) if state.plan else None
+    return getattr(state, field, None)
+
+
+def changed_plan_fields(
+    old: PlanDetailsState | None, new: PlanDetailsState | None
+) -> set[str]:
+    """Returns the "plan.<field>" names whose value differs between two plans"""
+    if old is None or new is None:
+        return {f"plan.{name}" for name in PlanDetailsState.model_fields}
+    return {
+        f"plan.{name}"
+        for name in PlanDetailsState.model_fields
+        if getattr(old, name) != getattr(new, name)
+    }
+
+
+def stale_stages(changed_fields: Iterable[str]) -> list[str]:
+    """Stages that must re-run, following results downstream in pipeline order"""
+    dirty: set[str] = set(changed_fields)
+    stale: list[str] = []
+    for name, stage in STAGES.items():
+        if dirty.intersection(stage.reads):
+            stale.append(name)
+            dirty.update(stage.writes)
+    return stale
+
+
+def invalidation_update(
+    values: dict[str, Any], changed_fields: Iterable[str]
+) -> dict[str, Any]:
+    """
+    Computes the state update that discards results depending on changed fields.
+
+    Args:
+        values: Current state values (e.g. from `graph.get_state(config).values`).
+        changed_fields: Field names that changed, as declared in `STAGES`.
+
+    Returns:
+        A partial state update. Empty if nothing depends on the changed fields.
+    """
+    stale = stale_stages(changed_fields)
+    if not stale:
+        return {}
+
+    completed = [s for s in values.get("completed_stages") or [] if s not in stale]
+    update: dict[str, Any] = {"completed_stages": completed}
+    for name in stale:
+        for field in STAGES[name].writes:
+            # Later stages only refine a field (e.g. reorder hotel offers), so
+            # it is discarded only when the stage producing it is stale
+            if field in RESET_VALUES and first_writer(field) == name:
+                update[field] = RESET_VALUES[field]
+
+    # The review always depends on the compiled itinerary
+    update["feedback"] = None
+    update["revision_count"] = 0
+
+    plan: PlanDetailsState | None = values.get("plan")
+    if plan is not None and plan.budget is not None:
+        # Give back the money of every discarded selection
+        spent = sum(
+            values.get(cost_field) or 0.0
+            for stage, cost_fields in STAGE_COSTS.items()
+            if stage in completed
+            for cost_field in cost_fields
+        )
+        plan.remaining_budget = plan.budget - spent
+        update["plan"] = plan
+
+    print(f"   ♻️  Invalidated stages: {', '.join(stale)}")
+    return update
+
+
+def invalidate_stages(state: AgentState, changed_fields: Iterable[str]) -> None:
+    """Applies `invalidation_update` in place on a node's state"""
+    for field, value in invalidation_update(dict(state), changed_fields).items():
+        setattr(state, field, value)
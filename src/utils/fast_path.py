@@ -0,0 +1,84 @@
+import threading
+
+
+class FastPathStats:
+    """
+    Hit rate and latency saved by a deterministic extractor placed in front of
+    an LLM call. The saving is estimated from the average latency of the LLM
+    calls the extractor could not avoid.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.attempts = 0
+        self.hits = 0
+        self.fast_path_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_hit(self, elapsed: float) -> None:
+        with self._lock:
+            self.attempts += 1
+            self.hits += 1
+            self.fast_path_seconds += elapsed
+
+    def record_miss(self, elapsed: float) -> None:
+        with self._lock:
+            self.attempts += 1
+            self.fast_path_seconds += elapsed
+
+    def record_llm_call(self, elapsed: float) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += elapsed
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    @property
+    def avg_llm_seconds(self) -> float:
+        return self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+
+    @property
+    def saved_seconds(self) -> float:
+        """LLM time avoided by hits, minus the time spent running the extractor"""
+        return max(self.hits * self.avg_llm_seconds - self.fast_path_seconds, 0.0)
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hit_rate, 4),
+            "llm_calls": self.llm_calls,
+            "avg_llm_ms": round(self.avg_llm_seconds * 1000, 2),
+            "avg_fast_path_ms": round(
+                self.fast_path_seconds * 1000 / self.attempts if self.attempts else 0.0,
+                3,
+            ),
+            "estimated_saved_s": round(self.saved_seconds, 3),
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        return (
+            f"{self.name} fast path: {s['hits']}/{s['attempts']} hits "
+            f"({s['hit_rate']:.0%}), ~{s['estimated_saved_s']:.1f}s of LLM time saved"
+        )
+
+
+_registry: dict[str, FastPathStats] = {}
+_registry_lock = threading.Lock()
+
+
+def get_fast_path_stats(name: str) -> FastPathStats:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = FastPathStats(name)
+        return _registry[name]
+
+
+def all_fast_path_stats() -> dict[str, dict[str, float]]:
+    with _registry_lock:
+        return {name: stats.summary() for name, stats in _registry.items()}
@@ -0,0 +1,243 @@
+import bisect
+import inspect
+import threading
+import time
+from collections.abc import Callable, Sequence
+
+from langchain_core.runnables import RunnableConfig
+
+from .tracing import span
+
+LabelValues = tuple[str, ...]
+
+# Node and tool latencies range from sub-millisecond to LLM-bound minutes
+DEFAULT_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """A metric family with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[tuple[dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.label_names, key)), value) for key, value in items]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (last one is +Inf), sum
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t[0])) for k, (c, t) in self._values.items())
+        lines = self.header()
+        names = self.label_names + ("le",)
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, key + (le,))} {cumulative}"
+                )
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+NODE_DURATION: Histogram = registry.register(
+    Histogram(
+        "travel_agent_node_duration_seconds", "Wall time of graph nodes", ["node"]
+    )
+)
+NODE_RUNS: Counter = registry.register(
+    Counter(
+        "travel_agent_node_runs_total",
+        "Graph node runs by outcome (ok, user_input, redirect, error)",
+        ["node", "outcome"],
+    )
+)
+TOOL_DURATION: Histogram = registry.register(
+    Histogram(
+        "travel_agent_tool_duration_seconds",
+        "Latency of external API calls per endpoint",
+        ["endpoint", "status"],
+    )
+)
+FALLBACKS: Counter = registry.register(
+    Counter(
+        "travel_agent_fallbacks_total",
+        "Degraded paths taken: city_llm, cheapest_flight, reviewer_reject",
+        ["kind"],
+    )
+)
+SSE_SESSIONS: Counter = registry.register(
+    Counter(
+        "travel_agent_sse_sessions_total",
+        "Streaming chat sessions by outcome (started, completed, error)",
+        ["outcome"],
+    )
+)
+SSE_ACTIVE: Gauge = registry.register(
+    Gauge("travel_agent_sse_sessions_active", "Streaming chat sessions in progress")
+)
+FIRST_TOKEN: Histogram = registry.register(
+    Histogram(
+        "travel_agent_llm_first_token_seconds",
+        "Time from the start of a streamed generation to its first token",
+        ["node"],
+    )
+)
+LLM_CALL_DURATION: Histogram = registry.register(
+    Histogram(
+        "travel_agent_llm_call_duration_seconds",
+        "Latency of LLM calls per node and routed model",
+        ["node", "model"],
+    )
+)
+LLM_TOKENS: Counter = registry.register(
+    Counter(
+        "travel_agent_llm_tokens_total",
+        "LLM tokens per node, routed model and kind (prompt, completion)",
+        ["node", "model", "kind"],
+    )
+)
+
+
+def timed_node(node: str, func: Callable) -> Callable:
+    """Wraps a graph node to record its wall time, outcome and trace span"""
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def timed(state, config: RunnableConfig | None = None):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with span(node, "node"):
+                result = func(state, config=config) if takes_config else func(state)
+            # A Command carries the state in its update
+            if getattr(getattr(result, "update", result), "needs_user_input", False):
+                outcome = "user_input"
+            elif hasattr(result, "goto"):
+                outcome = "redirect"
+            else:
+                outcome = "ok"
+            return result
+        finally:
+            NODE_DURATION.observe(time.perf_counter() - start, node=node)
+            NODE_RUNS.inc(node=node, outcome=outcome)
+
+    return timed
+
+
+def status_class(status_code: int | None) -> str:
+    """Groups HTTP statuses to keep label cardinality low"""
+    return f"{status_code // 100}xx" if status_code else "error"
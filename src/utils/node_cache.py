@@ -0,0 +1,133 @@
+import hashlib
+import inspect
+import json
+from collections.abc import Callable
+from enum import Enum
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel
+
+from src.states import AgentState
+
+from .dependencies import STAGES, mark_stage_complete, read_field, stages_for_node
+from .sqlite_lru import SQLiteLRUCache
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items()}
+    return value
+
+
+# Search-backed nodes replay live prices and availability, so their
+# results expire; the other nodes are pure functions of their inputs
+DEFAULT_NODE_TTLS: dict[str, float] = {
+    "flight_agent": 30 * 60,
+    "hotel_agent": 60 * 60,
+    "activity_agent": 6 * 60 * 60,
+}
+
+
+class NodeCache(SQLiteLRUCache):
+    """
+    Persistent, size-bounded LRU cache of node outputs.
+
+    Entries are content-addressed: the key hashes the state fields a node reads
+    (as declared in `STAGES`) together with the versions of its stages, so any
+    input change or logic bump misses the cache instead of returning stale data.
+    Entries of nodes in `node_ttls` expire after that many seconds, the others
+    after `ttl_seconds` (never if unset).
+    """
+
+    def __init__(
+        self,
+        db_path: str = "checkpoints/node_cache.db",
+        max_entries: int = 2000,
+        ttl_seconds: float | None = None,
+        node_ttls: dict[str, float] | None = None,
+    ):
+        super().__init__(db_path, "node_cache", max_entries, ttl_seconds)
+        self.node_ttls = {**DEFAULT_NODE_TTLS, **(node_ttls or {})}
+
+    def make_key(self, node: str, state: AgentState) -> str:
+        stages = stages_for_node(node)
+        reads = sorted({field for stage in stages for field in STAGES[stage].reads})
+        payload = {
+            "node": node,
+            "versions": {stage: STAGES[stage].version for stage in stages},
+            "inputs": {field: _jsonable(read_field(state, field)) for field in reads},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, node: str, key: str) -> dict[str, Any] | None:
+        return self._lookup(key, node, self.node_ttls.get(node, self.ttl_seconds))
+
+    def put(self, node: str, key: str, delta: dict[str, Any]) -> None:
+        self._store(key, node, _jsonable(delta))
+
+
+def memoize_node(
+    node: str,
+    func: Callable,
+    cache: NodeCache,
+    bypass: Callable[[AgentState], bool] | None = None,
+) -> Callable:
+    """
+    Wraps a graph node so that a repeat of the same inputs returns the cached
+    state delta instead of re-running LLM or API calls.
+
+    Only clean completions are cached: results asking the user for input or
+    redirecting through a `Command` always run the node, as do states for
+    which `bypass` returns True.
+    """
+    stages = stages_for_node(node)
+    writes: list[str] = sorted({f for s in stages for f in STAGES[s].writes})
+    takes_config = "config" in inspect.signature(func).parameters
+
+    def call(state: AgentState, config: RunnableConfig | None):
+        return func(state, config=config) if takes_config else func(state)
+
+    def memoized(state: AgentState, config: RunnableConfig | None = None):
+        if state.needs_user_input or (bypass and bypass(state)):
+            return call(state, config)
+
+        key = cache.make_key(node, state)
+        delta = cache.get(node, key)
+        if delta is not None:
+            print(f"   ⚡ {node}: inputs unchanged, reusing cached result.")
+            return apply_delta(state, delta, stages)
+
+        result = call(state, config)
+        if isinstance(result, AgentState) and not result.needs_user_input:
+            cache.put(node, key, {field: read_field(result, field) for field in writes})
+        return result
+
+    return memoized
+
+
+def apply_delta(
+    state: AgentState, delta: dict[str, Any], stages: list[str]
+) -> AgentState:
+    top_level = {k: v for k, v in delta.items() if not k.startswith("plan.")}
+    # Validate through the state schema to rebuild nested models and enums
+    restored = AgentState.model_validate(top_level)
+    for field in top_level:
+        setattr(state, field, getattr(restored, field))
+    for field, value in delta.items():
+        if field.startswith("plan.") and state.plan is not None:
+            setattr(state.plan, field[5:], value)
+
+    for stage in stages:
+        mark_stage_complete(state, stage)
+    state.needs_user_input = False
+    state.validation_question = None
+    state.last_node = None
+    return state
@@ -0,0 +1,198 @@
+import math
+from collections.abc import Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+
+class BundleWeights(BaseModel):
+    """How much each part of the trip contributes to the value of a bundle"""
+
+    flight: float = Field(
+        1.0, description="Value of the best flight relative to the worst"
+    )
+    hotel: float = Field(
+        1.0, description="Value of the best hotel offer relative to the worst"
+    )
+    activity: float = Field(0.3, description="Value of each included activity")
+    interest_bonus: float = Field(
+        0.2, description="Extra value of an activity matching the user's interests"
+    )
+
+
+class Bundle(BaseModel):
+    """The combination of offers picked by `optimize_bundle`"""
+
+    flight_index: int | None = Field(None, description="Index of the chosen flight")
+    hotel_option: int | None = Field(
+        None, description="Index of the chosen hotel option"
+    )
+    activity_indices: list[int] = Field(default_factory=list)
+    flight_cost: float = 0.0
+    hotel_cost: float = 0.0
+    activity_cost: float = 0.0
+    value: float = 0.0
+
+    @property
+    def total_cost(self) -> float:
+        return self.flight_cost + self.hotel_cost + self.activity_cost
+
+
+def utilities(scores: np.ndarray) -> np.ndarray:
+    """Maps ranking scores (lower is better) to a utility in [0, 1]"""
+    if scores.size == 0:
+        return scores
+    span = scores.max() - scores.min()
+    if span <= 0:
+        return np.ones_like(scores)
+    return (scores.max() - scores) / span
+
+
+class ActivityKnapsack:
+    """
+    0/1 knapsack over activities, solved once for the largest capacity and
+    queried for the money left by each flight and hotel combination.
+
+    Costs are rounded up to a unit chosen to keep the table small, so every
+    returned subset is guaranteed to fit the exact amount asked for.
+    """
+
+    def __init__(
+        self,
+        costs: Sequence[float],
+        values: Sequence[float],
+        capacity: float,
+        max_buckets: int = 5000,
+    ):
+        self.costs = np.asarray(costs, dtype=float)
+        # A tiny cost penalty makes the cheapest of equally valuable subsets win
+        self.values = np.asarray(values, dtype=float) - 1e-9 * self.costs
+        # Without a budget every valuable activity fits: no table to build
+        self.unbounded = math.isinf(capacity)
+        if self.unbounded:
+            self.chosen = [i for i, v in enumerate(self.values) if v > 0]
+            self.best = np.array([float(self.values[self.chosen].sum())])
+            return
+        self.unit = max(capacity / max_buckets, 0.01) if capacity > 0 else 1.0
+        self.buckets = max(math.floor(capacity / self.unit), 0)
+        weights = np.ceil(self.costs / self.unit).astype(int)
+
+        n = len(self.costs)
+        self.best = np.zeros(self.buckets + 1)
+        self.take = np.zeros((n, self.buckets + 1), dtype=bool)
+        for i in range(n):
+            w = weights[i]
+            if w > self.buckets or self.values[i] <= 0:
+                continue
+            candidate = np.full(self.buckets + 1, -np.inf)
+            candidate[w:] = self.best[: self.buckets + 1 - w] + self.values[i]
+            improved = candidate > self.best
+            self.take[i] = improved
+            self.best = np.where(improved, candidate, self.best)
+        self.weights = weights
+
+    @property
+    def max_value(self) -> float:
+        return float(self.best[-1]) if self.best.size else 0.0
+
+    def solve(self, budget: float) -> tuple[float, list[int]]:
+        """Best value and chosen activity indices within `budget`"""
+        if budget < 0:
+            return -np.inf, []
+        if self.unbounded:
+            return self.max_value, list(self.chosen)
+        c = min(math.floor(budget / self.unit + 1e-9), self.buckets)
+        value = float(self.best[c])
+        chosen: list[int] = []
+        for i in range(len(self.costs) - 1, -1, -1):
+            if self.take[i, c]:
+                chosen.append(i)
+                c -= self.weights[i]
+        return value, sorted(chosen)
+
+
+def optimize_bundle(
+    budget: float,
+    flight_costs: Sequence[float],
+    flight_scores: Sequence[float],
+    hotel_costs: Sequence[float],
+    hotel_scores: Sequence[float],
+    activity_costs: Sequence[float],
+    activity_values: Sequence[float],
+    weights: BundleWeights | None = None,
+) -> Bundle | None:
+    """
+    Picks one flight and one hotel offer (when any are given) and any subset
+    of activities maximising total value within the budget (a small
+    multiple-choice knapsack). An infinite budget takes every activity.
+
+    Flights and hotel offers come with ranking scores (lower is better),
+    converted here to utilities. Every flight and hotel combination is checked
+    against the activity knapsack table, skipping combinations whose upper
+    bound cannot beat the best bundle found so far.
+
+    Args:
+        budget: Total budget in the budget currency.
+        flight_costs: Cost of each flight candidate; empty if no flight is needed.
+        flight_scores: Ranking score of each flight candidate.
+        hotel_costs: Cost of each hotel option; empty if no hotel is needed.
+        hotel_scores: Ranking score of each hotel option.
+        activity_costs: Cost of each activity.
+        activity_values: Value of each activity, in units of `weights.activity`.
+        weights: Relative value of flights, hotels and activities.
+
+    Returns:
+        The best bundle, or None when no flight and hotel combination fits.
+    """
+    weights = weights or BundleWeights()
+    flight_costs = np.asarray(flight_costs, dtype=float)
+    hotel_costs = np.asarray(hotel_costs, dtype=float)
+    flight_value = weights.flight * utilities(np.asarray(flight_scores, dtype=float))
+    hotel_value = weights.hotel * utilities(np.asarray(hotel_scores, dtype=float))
+
+    # "No flight" / "no hotel" are single zero-cost options when not requested
+    flight_options = range(len(flight_costs)) if len(flight_costs) else [None]
+    hotel_options = range(len(hotel_costs)) if len(hotel_costs) else [None]
+
+    def cost_and_value(costs, values, option) -> tuple[float, float]:
+        return (
+            (0.0, 0.0)
+            if option is None
+            else (float(costs[option]), float(values[option]))
+        )
+
+    combos = []
+    for f in flight_options:
+        fc, fv = cost_and_value(flight_costs, flight_value, f)
+        for h in hotel_options:
+            hc, hv = cost_and_value(hotel_costs, hotel_value, h)
+            if fc + hc <= budget:
+                combos.append((fv + hv, fc + hc, f, h))
+    if not combos:
+        return None
+
+    min_base_cost = min(c[1] for c in combos)
+    knapsack = ActivityKnapsack(
+        activity_costs,
+        weights.activity * np.asarray(activity_values, dtype=float),
+        budget - min_base_cost,
+    )
+
+    best: Bundle | None = None
+    # Most valuable combinations first, so the bound prunes the rest early
+    for base_value, base_cost, f, h in sorted(combos, key=lambda c: (-c[0], c[1])):
+        if best is not None and base_value + knapsack.max_value <= best.value:
+            break
+        activity_value, chosen = knapsack.solve(budget - base_cost)
+        value = base_value + activity_value
+        if best is None or value > best.value + 1e-12:
+            best = Bundle(
+                flight_index=f,
+                hotel_option=h,
+                activity_indices=chosen,
+                flight_cost=cost_and_value(flight_costs, flight_value, f)[0],
+                hotel_cost=cost_and_value(hotel_costs, hotel_value, h)[0],
+                activity_cost=float(sum(activity_costs[i] for i in chosen)),
+                value=value,
+            )
+    return best
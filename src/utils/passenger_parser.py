@@ -0,0 +1,173 @@
+import re
+from typing import Any
+
+from src.states import TravelClass
+
+from .plan_parser import NUMBER_WORDS
+
+_N = r"(?P<n>\d{1,2}|" + "|".join(NUMBER_WORDS) + r")"
+# "a"/"an" read as counts only right before a traveller noun
+_COUNT = (
+    r"(?P<n>\d{1,2}|" + "|".join(w for w in NUMBER_WORDS if w not in ("a", "an")) + r")"
+)
+_TRAVELLER_NOUN = (
+    r"adults?|grown[- ]?ups?|young|children|child|kids?|infants?|bab(?:y|ies)|newborns?"
+    r"|people|persons|travell?ers|passengers|guests|students|of us|friends|colleagues|buddies"
+)
+# "for 3 days", "for 50 euros" and "for 2 adults" are not a bare head count
+_NOT_A_HEAD_COUNT = (
+    r"(?![\s-]*(?:\d|days?|nights?|weeks?|months?|years?|hours?|k\b|%|dollars?|euros?|pounds?"
+    r"|bucks|usd|eur|gbp|am\b|pm\b|" + _TRAVELLER_NOUN + r"))"
+)
+_AGE = r"(?:\d{1,2}[- ]?(?:year|yr)s?[- ]?old\s+)?"
+
+ADULTS_RE = re.compile(rf"\b{_N}\s+(?:adults?|grown[- ]?ups?)\b")
+CHILDREN_RE = re.compile(rf"\b{_N}\s+(?:young\s+)?{_AGE}(?:children|child|kids?)\b")
+INFANTS_RE = re.compile(rf"\b{_N}\s+(?:infants?|babies|baby|newborns?)\b")
+GROUP_PATTERNS = [
+    re.compile(rf"\b(?:family|group|party) of\s+{_N}\b"),
+    re.compile(
+        rf"\b{_N}\s+(?:people|persons|travell?ers|passengers|guests|students|of us)\b"
+    ),
+    re.compile(rf"\bfor\s+{_COUNT}\b{_NOT_A_HEAD_COUNT}"),
+]
+# Numbers next to seats or tickets count travellers the parser cannot place
+TICKET_COUNT_RE = re.compile(
+    rf"\b{_COUNT}\s+(?:[a-z]+[- ])?(?:tickets?|seats?|places?|fares?|bookings?)\b"
+)
+FRIENDS_RE = re.compile(
+    rf"\b(?P<with>(?:with|me and)\s+(?:my\s+)?)?{_N}\s+(?:friends|colleagues|buddies)\b"
+)
+
+SOLO_RE = re.compile(
+    r"\b(?:just me|only me|solo|alone|by myself|on my own|single traveler|one traveler|one person)\b"
+)
+_PARTNER = r"wife|husband|partner|girlfriend|boyfriend|fianc[eé]e?"
+COUPLE_RE = re.compile(rf"\b(?:couple|honeymoon|the two of us|my (?:{_PARTNER}))\b")
+# "with my mom", "and my brother": someone comes along, counted or not
+COMPANION_RE = re.compile(
+    r"\b(?:with|and|plus|bringing|taking)\s+(?:my|our)\s+(?P<who>[a-z\d]+)"
+)
+AGE_RE = re.compile(
+    r"\b\d{1,2}[- ]?(?:years?|yrs?|months?)[- ]?olds?\b|\baged?\s+\d{1,2}\b"
+)
+# Several travellers are implied but not counted
+VAGUE_GROUP_RE = re.compile(
+    r"\b(?:we|us|our|family|friends|group|colleagues|kids|children|parents)\b"
+)
+
+CLASS_PATTERNS = {
+    TravelClass.FIRST: re.compile(r"\bfirst[- ]class\b"),
+    TravelClass.BUSINESS: re.compile(
+        r"\bbusiness[- ]class\b|\bin business\b|\bfly(?:ing)? business\b"
+    ),
+    TravelClass.ECONOMY: re.compile(r"\b(?:premium )?economy\b|\bcoach\b"),
+}
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _single_count(patterns: list[re.Pattern], text: str) -> list[int] | None:
+    """The count stated for one kind of traveller, if any; None if they disagree"""
+    counts = {_number(m.group("n")) for p in patterns for m in p.finditer(text)}
+    if len(counts) > 1:
+        return None
+    return list(counts)
+
+
+def parse_travel_class(text: str) -> TravelClass | None:
+    """The requested cabin, ECONOMY when none is mentioned, None if conflicting"""
+    found = [cls for cls, pattern in CLASS_PATTERNS.items() if pattern.search(text)]
+    if len(found) > 1:
+        return None
+    return found[0] if found else TravelClass.ECONOMY
+
+
+def parse_passengers(text: str) -> dict[str, Any] | None:
+    """
+    Reads passenger counts and travel class from common phrasings such as
+    "2 adults and a child", "just me" or "business class for 3".
+
+    Returns:
+        The same dict shape the passenger node expects from its LLM, with
+        "confidence": "high", or None when the message mentions several
+        travellers without numbers the parser can trust, counts tickets or
+        seats it cannot assign, or names a companion or an age it did not
+        count.
+    """
+    lowered = text.lower()
+
+    travel_class = parse_travel_class(lowered)
+    adults = _single_count([ADULTS_RE], lowered)
+    children = _single_count([CHILDREN_RE], lowered)
+    infants = _single_count([INFANTS_RE], lowered)
+    groups = _single_count(GROUP_PATTERNS, lowered)
+    if None in (travel_class, adults, children, infants, groups):
+        return None
+
+    counted = [
+        m.span("n")
+        for p in [ADULTS_RE, CHILDREN_RE, INFANTS_RE, FRIENDS_RE, *GROUP_PATTERNS]
+        for m in p.finditer(lowered)
+    ]
+    if any(m.span("n") not in counted for m in TICKET_COUNT_RE.finditer(lowered)):
+        return None
+    # A companion other than a partner is only placed by a count next to them
+    for m in COMPANION_RE.finditer(lowered):
+        if not re.fullmatch(_PARTNER, m.group("who")) and m.span("who") not in counted:
+            return None
+    # "and a 5 year old" is a child the counts did not see
+    kids = [m.span() for p in [CHILDREN_RE, INFANTS_RE] for m in p.finditer(lowered)]
+    for m in AGE_RE.finditer(lowered):
+        if not any(start <= m.start() and m.end() <= end for start, end in kids):
+            return None
+
+    total: int | None = groups[0] if groups else None
+    for m in FRIENDS_RE.finditer(lowered):
+        # "with 3 friends" includes the speaker, "four friends are ..." does not
+        friends = _number(m.group("n")) + (1 if m.group("with") else 0)
+        if total is not None and total != friends:
+            return None
+        total = friends
+
+    n_adults = adults[0] if adults else None
+    n_children = children[0] if children else 0
+    n_infants = infants[0] if infants else 0
+    kids_mentioned = bool(
+        re.search(
+            r"\b(?:kids?|child|children|infants?|bab(?:y|ies)|sons?|daughters?)\b",
+            lowered,
+        )
+    )
+
+    if n_adults is None:
+        if total is not None:
+            if kids_mentioned and not (children or infants):
+                return None
+            n_adults = total - n_children - n_infants
+        elif COUPLE_RE.search(lowered):
+            n_adults = 2
+        elif SOLO_RE.search(lowered):
+            n_adults = 1
+        elif children or infants or VAGUE_GROUP_RE.search(lowered):
+            return None
+        else:
+            # Same default as the LLM prompt: nothing said means one adult
+            n_adults = 1
+    elif total is not None and total != n_adults + n_children + n_infants:
+        return None
+
+    if kids_mentioned and not (children or infants) and total is None:
+        return None
+    if n_adults < 1 or n_adults > 9:
+        return None
+
+    return {
+        "adults": n_adults,
+        "children": n_children,
+        "infants": n_infants,
+        "travel_class": travel_class.value,
+        "confidence": "high",
+    }
@@ -0,0 +1,585 @@
+import re
+from datetime import date, timedelta
+from typing import Any
+
+from src.states import PlanDetailsState
+
+# Local gazetteer used to recognise cities without an LLM or API call. Keys are
+# lowercase names or common aliases, values the "City, Country" form the
+# planner prompt asks the LLM for.
+GAZETTEER: dict[str, str] = {
+    "amsterdam": "Amsterdam, Netherlands",
+    "athens": "Athens, Greece",
+    "atlanta": "Atlanta, USA",
+    "auckland": "Auckland, New Zealand",
+    "austin": "Austin, USA",
+    "bangkok": "Bangkok, Thailand",
+    "barcelona": "Barcelona, Spain",
+    "beijing": "Beijing, China",
+    "berlin": "Berlin, Germany",
+    "bogota": "Bogota, Colombia",
+    "boston": "Boston, USA",
+    "brussels": "Brussels, Belgium",
+    "bucharest": "Bucharest, Romania",
+    "budapest": "Budapest, Hungary",
+    "buenos aires": "Buenos Aires, Argentina",
+    "cairo": "Cairo, Egypt",
+    "cancun": "Cancun, Mexico",
+    "cape town": "Cape Town, South Africa",
+    "chicago": "Chicago, USA",
+    "copenhagen": "Copenhagen, Denmark",
+    "dallas": "Dallas, USA",
+    "delhi": "Delhi, India",
+    "new delhi": "New Delhi, India",
+    "denver": "Denver, USA",
+    "doha": "Doha, Qatar",
+    "dubai": "Dubai, United Arab Emirates",
+    "dublin": "Dublin, Ireland",
+    "edinburgh": "Edinburgh, United Kingdom",
+    "florence": "Florence, Italy",
+    "frankfurt": "Frankfurt, Germany",
+    "geneva": "Geneva, Switzerland",
+    "hanoi": "Hanoi, Vietnam",
+    "helsinki": "Helsinki, Finland",
+    "ho chi minh city": "Ho Chi Minh City, Vietnam",
+    "hong kong": "Hong Kong, China",
+    "honolulu": "Honolulu, USA",
+    "istanbul": "Istanbul, Turkey",
+    "jakarta": "Jakarta, Indonesia",
+    "johannesburg": "Johannesburg, South Africa",
+    "kuala lumpur": "Kuala Lumpur, Malaysia",
+    "kyoto": "Kyoto, Japan",
+    "las vegas": "Las Vegas, USA",
+    "lima": "Lima, Peru",
+    "lisbon": "Lisbon, Portugal",
+    "london": "London, United Kingdom",
+    "los angeles": "Los Angeles, USA",
+    "lyon": "Lyon, France",
+    "madrid": "Madrid, Spain",
+    "manchester": "Manchester, United Kingdom",
+    "manila": "Manila, Philippines",
+    "marrakech": "Marrakech, Morocco",
+    "marseille": "Marseille, France",
+    "melbourne": "Melbourne, Australia",
+    "mexico city": "Mexico City, Mexico",
+    "miami": "Miami, USA",
+    "milan": "Milan, Italy",
+    "montreal": "Montreal, Canada",
+    "moscow": "Moscow, Russia",
+    "mumbai": "Mumbai, India",
+    "munich": "Munich, Germany",
+    "naples": "Naples, Italy",
+    "new orleans": "New Orleans, USA",
+    "new york": "New York, USA",
+    "new york city": "New York, USA",
+    "nyc": "New York, USA",
+    "orlando": "Orlando, USA",
+    "osaka": "Osaka, Japan",
+    "oslo": "Oslo, Norway",
+    "paris": "Paris, France",
+    "philadelphia": "Philadelphia, USA",
+    "prague": "Prague, Czech Republic",
+    "reykjavik": "Reykjavik, Iceland",
+    "rio de janeiro": "Rio de Janeiro, Brazil",
+    "rome": "Rome, Italy",
+    "san diego": "San Diego, USA",
+    "san francisco": "San Francisco, USA",
+    "santiago": "Santiago, Chile",
+    "sao paulo": "Sao Paulo, Brazil",
+    "seattle": "Seattle, USA",
+    "seoul": "Seoul, South Korea",
+    "seville": "Seville, Spain",
+    "shanghai": "Shanghai, China",
+    "singapore": "Singapore, Singapore",
+    "stockholm": "Stockholm, Sweden",
+    "sydney": "Sydney, Australia",
+    "taipei": "Taipei, Taiwan",
+    "tel aviv": "Tel Aviv, Israel",
+    "tokyo": "Tokyo, Japan",
+    "toronto": "Toronto, Canada",
+    "vancouver": "Vancouver, Canada",
+    "venice": "Venice, Italy",
+    "vienna": "Vienna, Austria",
+    "warsaw": "Warsaw, Poland",
+    "washington": "Washington, USA",
+    "washington dc": "Washington, USA",
+    "zermatt": "Zermatt, Switzerland",
+    "zurich": "Zurich, Switzerland",
+}
+
+NUMBER_WORDS: dict[str, int] = {
+    "a": 1,
+    "an": 1,
+    "one": 1,
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "eleven": 11,
+    "twelve": 12,
+    "fourteen": 14,
+    "fifteen": 15,
+    "twenty": 20,
+    "thirty": 30,
+}
+
+MONTHS: dict[str, int] = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+
+WEEKDAYS = [
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+]
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "₹": "INR"}
+CURRENCY_WORDS = {
+    "usd": "USD",
+    "eur": "EUR",
+    "gbp": "GBP",
+    "jpy": "JPY",
+    "chf": "CHF",
+    "cad": "CAD",
+    "aud": "AUD",
+    "inr": "INR",
+    "dollar": "USD",
+    "dollars": "USD",
+    "euro": "EUR",
+    "euros": "EUR",
+    "pound": "GBP",
+    "pounds": "GBP",
+    "yen": "JPY",
+    "franc": "CHF",
+    "francs": "CHF",
+}
+
+_MONTH = r"(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_DAY = r"(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+_NUM_WORD = "|".join(NUMBER_WORDS)
+_AMOUNT = r"(?P<amount>\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?\s*(?P<k>k\b)?"
+_CURRENCY_WORD = "|".join(CURRENCY_WORDS)
+# "June 7 2000 dollars" ends a date, it does not give its year
+_NOT_MONEY = rf"(?!\s*(?:k\b|[$€£¥₹]|(?:{_CURRENCY_WORD})\b))"
+_YEAR = rf"(?:,?\s*(?P<year>\d{{4}})\b{_NOT_MONEY})?"
+
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+# A year only counts next to a month: "june 2026", "june 7, 2026", "7 june 2026"
+DATED_YEAR_RE = re.compile(
+    rf"\b{_MONTH}(?:\s+{_DAY})?,?\s+(?P<year>20\d{{2}})\b{_NOT_MONEY}"
+)
+MONTH_RANGE_RE = re.compile(
+    rf"\b{_MONTH}\s+(?P<d1>\d{{1,2}})(?:st|nd|rd|th)?\s*(?:-|–|to|until|through)\s*(?P<d2>\d{{1,2}})(?:st|nd|rd|th)?\b{_YEAR}"
+)
+MONTH_DAY_RE = re.compile(rf"\b{_MONTH}\s+{_DAY}\b{_YEAR}")
+DAY_MONTH_RE = re.compile(rf"\b{_DAY}\s+(?:of\s+)?{_MONTH}(?![a-z]){_YEAR}")
+IN_N_RE = re.compile(rf"\bin\s+(?P<n>\d+|{_NUM_WORD})\s+(?P<unit>day|week)s?\b")
+NEXT_WEEKDAY_RE = re.compile(
+    rf"\b(?:next|this|on)\s+(?P<weekday>{'|'.join(WEEKDAYS)})\b"
+)
+DURATION_RE = re.compile(
+    rf"\b(?:for\s+)?(?P<n>\d+|{_NUM_WORD})[\s-]+(?P<unit>day|night|week)s?(?:[\s-]+long)?\b"
+)
+FORTNIGHT_RE = re.compile(r"\b(?:a|one)\s+fortnight\b")
+AMBIGUOUS_DATES_RE = re.compile(
+    r"\b(?:between|sometime|some time|flexible|around|approximately|or so|either)\b"
+)
+
+SYMBOL_AMOUNT_RE = re.compile(rf"(?P<symbol>[$€£¥₹])\s?{_AMOUNT}")
+AMOUNT_WORD_RE = re.compile(rf"\b{_AMOUNT}\s*(?P<word>{_CURRENCY_WORD})\b")
+WORD_AMOUNT_RE = re.compile(rf"\b(?P<word>usd|eur|gbp|jpy|chf|cad|aud|inr)\s?{_AMOUNT}")
+BARE_BUDGET_RE = re.compile(
+    rf"\bbudget\s*(?:of|is|:|=)?\s*(?:about|around|roughly|approximately)?\s*{_AMOUNT}"
+)
+
+ORIGIN_CUE_RE = re.compile(
+    r"\b(?:from|leaving|departing|out of|based in|live in|living in)\s+$"
+)
+DESTINATION_CUE_RE = re.compile(
+    r"\b(?:to|in|visit|visiting|into|towards|destination:?|trip to)\s+$"
+)
+ROUTE_JOIN_RE = re.compile(r"^\s*(?:\([a-z]{3}\))?\s*(?:to|-|–|→|->)\s*$")
+
+NO_HOTEL_RE = re.compile(
+    r"\b(?:no|without|don'?t need(?: a)?|do not need(?: a)?|no need for(?: a)?|already (?:have|booked)(?: a| an| our| my)?"
+    r"|(?:drop|remove|skip|cancel)(?: the| a| our| my)?)\s+(?:hotels?|accommodation|lodging)\b"
+)
+HOTEL_RE = re.compile(
+    r"\b(?:hotels?|accommodations?|lodging|place to stay|stay (?:in|at|near)|resort|hostel|bungalow|airbnb|room)\b"
+)
+NO_ACTIVITIES_RE = re.compile(
+    r"\b(?:no|without|don'?t need|do not need|drop|remove|skip|cancel)\s+(?:the\s+|any\s+)?(?:activities|tours|sightseeing)\b"
+)
+ACTIVITIES_RE = re.compile(
+    r"\b(?:activit(?:y|ies)|things to do|tours?|sightseeing|attractions?|excursions?|what to do|interested in|attend)\b"
+)
+INTERESTS_RE = re.compile(r"\binterested in\s+(?P<interests>[^.;!?\n]+)")
+INTEREST_KEYWORDS = [
+    "art",
+    "beaches",
+    "culture",
+    "food",
+    "hiking",
+    "history",
+    "museums",
+    "nature",
+    "nightlife",
+    "shopping",
+    "skiing",
+    "theme parks",
+    "wine",
+]
+
+# Verbs of a follow-up that edits the plan; their clause must be understood
+EDIT_VERB_RE = re.compile(
+    r"\b(?:add|drop|remove|change|switch|swap|replace|skip|cancel|make|move|extend|shorten"
+    r"|increase|reduce|lower|raise|double|halve|include|exclude|upgrade|downgrade)\b"
+)
+ADD_RE = re.compile(r"\b(?:add|include)\b")
+CLAUSE_SPLIT_RE = re.compile(r"[,;.!?]|\b(?:and|but|also|then|plus)\b")
+
+_CITY_RE = re.compile(
+    r"\b(?:"
+    + "|".join(re.escape(name) for name in sorted(GAZETTEER, key=len, reverse=True))
+    + r")\b"
+)
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _amount(match: re.Match) -> float:
+    value = float(match.group("amount").replace(",", ""))
+    return value * 1000 if match.group("k") else value
+
+
+def _resolve_year(
+    month: int, day: int, year: str | None, default_year: int | None, today: date
+) -> date | None:
+    try:
+        if year:
+            return date(int(year), month, day)
+        if default_year:
+            return date(default_year, month, day)
+        candidate = date(today.year, month, day)
+        # Dates without a year refer to their next occurrence
+        return candidate if candidate >= today else date(today.year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def extract_dates(text: str, today: date) -> tuple[list[date], int | None]:
+    """
+    Returns the distinct absolute or relative dates mentioned, in order of
+    appearance, and the trip length in days if one is stated.
+    """
+    found: list[tuple[int, date]] = []
+    consumed: list[tuple[int, int]] = []
+
+    def free(match: re.Match) -> bool:
+        return not any(s < match.end() and match.start() < e for s, e in consumed)
+
+    # Amounts such as "budget $2000" are not years
+    explicit_years = [int(m.group("year")) for m in DATED_YEAR_RE.finditer(text)]
+    default_year = explicit_years[0] if len(set(explicit_years)) == 1 else None
+
+    for m in ISO_DATE_RE.finditer(text):
+        try:
+            found.append(
+                (m.start(), date(int(m.group(1)), int(m.group(2)), int(m.group(3))))
+            )
+            consumed.append(m.span())
+        except ValueError:
+            pass
+
+    for m in MONTH_RANGE_RE.finditer(text):
+        if not free(m):
+            continue
+        month = MONTHS[m.group("month")[:3]]
+        for group in ("d1", "d2"):
+            d = _resolve_year(
+                month, int(m.group(group)), m.group("year"), default_year, today
+            )
+            if d:
+                found.append((m.start(group), d))
+        consumed.append(m.span())
+
+    for pattern in (MONTH_DAY_RE, DAY_MONTH_RE):
+        for m in pattern.finditer(text):
+            if not free(m):
+                continue
+            d = _resolve_year(
+                MONTHS[m.group("month")[:3]],
+                int(m.group("day")),
+                m.group("year"),
+                default_year,
+                today,
+            )
+            if d:
+                found.append((m.start(), d))
+                consumed.append(m.span())
+
+    relative = [
+        (r"\bday after tomorrow\b", today + timedelta(days=2)),
+        (r"\btomorrow\b", today + timedelta(days=1)),
+        (r"\btoday\b", today),
+        (r"\bnext week\b", today + timedelta(days=7)),
+    ]
+    for pattern, value in relative:
+        for m in re.finditer(pattern, text):
+            if free(m):
+                found.append((m.start(), value))
+                consumed.append(m.span())
+
+    for m in IN_N_RE.finditer(text):
+        if free(m):
+            days = _number(m.group("n")) * (7 if m.group("unit") == "week" else 1)
+            found.append((m.start(), today + timedelta(days=days)))
+            consumed.append(m.span())
+
+    for m in NEXT_WEEKDAY_RE.finditer(text):
+        if free(m):
+            ahead = (WEEKDAYS.index(m.group("weekday")) - today.weekday()) % 7 or 7
+            found.append((m.start(), today + timedelta(days=ahead)))
+            consumed.append(m.span())
+
+    dates: list[date] = []
+    for _, d in sorted(found, key=lambda item: item[0]):
+        if d not in dates:
+            dates.append(d)
+
+    durations = set()
+    for m in DURATION_RE.finditer(text):
+        if free(m):
+            n = _number(m.group("n"))
+            durations.add(n * 7 if m.group("unit") == "week" else n)
+    if FORTNIGHT_RE.search(text):
+        durations.add(14)
+    duration = durations.pop() if len(durations) == 1 else None
+
+    return dates, duration
+
+
+def extract_trip_dates(text: str, today: date) -> tuple[str, str] | None:
+    """Departure and return dates, or None unless they are unambiguous"""
+    if AMBIGUOUS_DATES_RE.search(text):
+        return None
+
+    dates, duration = extract_dates(text, today)
+    if len(dates) == 1 and duration:
+        departure, arrival = dates[0], dates[0] + timedelta(days=duration)
+    elif len(dates) == 2:
+        departure, arrival = dates
+        # A stated length that contradicts the dates means one of them is misread
+        if duration and abs((arrival - departure).days - duration) > 1:
+            return None
+    else:
+        return None
+
+    if departure < today or arrival <= departure or (arrival - departure).days > 90:
+        return None
+    return departure.isoformat(), arrival.isoformat()
+
+
+def extract_budget(text: str) -> tuple[float, str] | None:
+    """The budget amount and ISO currency, or None if absent or ambiguous"""
+    candidates: list[tuple[int, float, str]] = []
+    for m in SYMBOL_AMOUNT_RE.finditer(text):
+        candidates.append((m.start(), _amount(m), CURRENCY_SYMBOLS[m.group("symbol")]))
+    for pattern in (AMOUNT_WORD_RE, WORD_AMOUNT_RE):
+        for m in pattern.finditer(text):
+            if not any(start == m.start() for start, _, _ in candidates):
+                candidates.append(
+                    (m.start(), _amount(m), CURRENCY_WORDS[m.group("word")])
+                )
+
+    if not candidates:
+        bare = BARE_BUDGET_RE.search(text)
+        # Same default as the planner prompt: no symbol means USD
+        return (_amount(bare), "USD") if bare else None
+
+    distinct = {(amount, currency) for _, amount, currency in candidates}
+    if len(distinct) > 1:
+        # Several amounts: only trust the one introduced as the budget
+        near_budget = {
+            (amount, currency)
+            for start, amount, currency in candidates
+            if "budget" in text[max(0, start - 30) : start]
+        }
+        if len(near_budget) != 1:
+            return None
+        distinct = near_budget
+    return distinct.pop()
+
+
+def extract_cities(text: str, known: PlanDetailsState | None = None) -> dict[str, str]:
+    """
+    Assigns gazetteer cities to the origin or destination role from the words
+    around them. Returns only the roles that could be resolved unambiguously.
+    """
+    origins: list[str] = []
+    destinations: list[str] = []
+    untagged: list[tuple[str, int, int]] = []
+
+    for m in _CITY_RE.finditer(text):
+        city = GAZETTEER[m.group(0)]
+        before = text[max(0, m.start() - 30) : m.start()]
+        if ORIGIN_CUE_RE.search(before):
+            origins.append(city)
+        elif DESTINATION_CUE_RE.search(before):
+            destinations.append(city)
+        else:
+            untagged.append((city, m.start(), m.end()))
+
+    origins = list(dict.fromkeys(origins))
+    destinations = list(dict.fromkeys(destinations))
+    untagged = [u for u in untagged if u[0] not in origins and u[0] not in destinations]
+    untagged_cities = list(dict.fromkeys(city for city, _, _ in untagged))
+
+    if len(untagged_cities) == 1 and not destinations and known is None:
+        # "Paris from London ..." or "Paris next week": a bare city is the destination
+        destinations = untagged_cities
+        untagged_cities = []
+    elif len(untagged_cities) == 1 and destinations and not origins:
+        # "London to Paris": the city right before the destination is the origin
+        city, _, end = next(u for u in untagged if u[0] == untagged_cities[0])
+        following = _CITY_RE.search(text, end)
+        if following and ROUTE_JOIN_RE.match(text[end : following.start()]):
+            origins = untagged_cities
+            untagged_cities = []
+
+    if untagged_cities or len(origins) > 1 or len(destinations) > 1:
+        return {}
+    result: dict[str, str] = {}
+    if origins:
+        result["origin"] = origins[0]
+    if destinations:
+        result["destination"] = destinations[0]
+    if result.get("origin") and result.get("origin") == result.get("destination"):
+        return {}
+    return result
+
+
+def extract_interests(text: str) -> str:
+    match = INTERESTS_RE.search(text)
+    if match:
+        return match.group("interests").strip()
+    return ", ".join(k for k in INTEREST_KEYWORDS if re.search(rf"\b{k}\b", text))
+
+
+def _clause_understood(clause: str, today: date) -> bool:
+    """Whether the parser reads anything the clause could be changing"""
+    dates, duration = extract_dates(clause, today)
+    return bool(
+        _CITY_RE.search(clause)
+        or dates
+        or duration
+        or extract_budget(clause)
+        or NO_HOTEL_RE.search(clause)
+        or NO_ACTIVITIES_RE.search(clause)
+        or (
+            ADD_RE.search(clause)
+            and (HOTEL_RE.search(clause) or ACTIVITIES_RE.search(clause))
+        )
+    )
+
+
+def unread_edit(text: str, today: date) -> bool:
+    """
+    True if a clause edits the plan ("drop the hotel", "make it cheaper")
+    in a way none of the extractors read
+    """
+    return any(
+        EDIT_VERB_RE.search(clause) and not _clause_understood(clause, today)
+        for clause in CLAUSE_SPLIT_RE.split(text)
+    )
+
+
+def fast_path_plan(
+    text: str, today: date, known: PlanDetailsState | None = None
+) -> dict[str, Any] | None:
+    """
+    Extracts plan details from a well-formed request without calling the LLM.
+
+    Args:
+        text: The latest user message.
+        today: Reference date for relative expressions and year inference.
+        known: Plan from earlier turns; its values fill fields the message omits.
+
+    Returns:
+        The same dict shape the planner expects from its LLM, with
+        "confidence": "high", or None if any required field is missing or
+        ambiguous, the message itself supplies none of them, or a
+        follow-up edits the plan in a way the parser cannot read, so the
+        caller should fall back to the LLM.
+    """
+    lowered = text.lower()
+    plan_data: dict[str, Any] = {}
+    if known is not None:
+        plan_data.update(
+            {k: v for k, v in known.model_dump().items() if v not in (None, "")}
+        )
+
+    cities = extract_cities(lowered, known)
+    plan_data.update(cities)
+
+    trip_dates = extract_trip_dates(lowered, today)
+    if trip_dates:
+        plan_data["departure_date"], plan_data["arrival_date"] = trip_dates
+
+    budget = extract_budget(lowered)
+    if budget:
+        plan_data["budget"], plan_data["budget_currency"] = budget
+
+    # A follow-up that supplies none of these ("yes, double the budget")
+    # changes the plan in a way only the LLM can read
+    if not (cities or trip_dates or budget):
+        return None
+    # ... and so does one that also edits something the parser cannot read
+    if known is not None and unread_edit(lowered, today):
+        return None
+
+    required = ["destination", "origin", "departure_date", "arrival_date", "budget"]
+    if any(not plan_data.get(field) for field in required):
+        return None
+
+    interests = extract_interests(lowered)
+    if interests:
+        plan_data["interests"] = interests
+    plan_data.setdefault("interests", "")
+
+    if NO_HOTEL_RE.search(lowered):
+        plan_data["need_hotel"] = False
+    elif HOTEL_RE.search(lowered):
+        plan_data["need_hotel"] = True
+    plan_data.setdefault("need_hotel", False)
+
+    if NO_ACTIVITIES_RE.search(lowered):
+        plan_data["need_activities"] = False
+    elif ACTIVITIES_RE.search(lowered) or interests:
+        plan_data["need_activities"] = True
+    plan_data.setdefault("need_activities", False)
+
+    plan_data["confidence"] = "high"
+    return plan_data
@@ -0,0 +1,119 @@
+import re
+import threading
+from collections.abc import Callable, Sequence
+from functools import lru_cache
+from typing import TypeVar
+
+from .metrics import Counter, registry
+
+T = TypeVar("T")
+
+PROMPT_TOKENS_SAVED: Counter = registry.register(
+    Counter(
+        "travel_agent_prompt_tokens_saved_total",
+        "Prompt tokens removed by fitting search results to the node budget",
+        ["node"],
+    )
+)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    """The tiktoken encoding, loaded once; None if tiktoken or its data is unavailable"""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """
+    Token count of `text`. Without tiktoken, words and punctuation are
+    counted, long words as one token per 6 characters, which tracks BPE
+    tokenizers within about 15% on search result listings.
+    """
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return sum(1 + (len(piece) - 1) // 6 for piece in _PIECE_RE.findall(text))
+
+
+def truncate(text: str | None, max_chars: int) -> str:
+    if not text or len(text) <= max_chars:
+        return text or ""
+    return text[: max_chars - 1].rstrip() + "…"
+
+
+class PromptBudget:
+    """
+    Per-node token budgets for search results embedded in prompts.
+
+    `fit` renders ranked items at the most detailed level that fits the
+    budget, keeping at most `top_k`, and drops the lowest ranked items when
+    even the terse level does not fit.
+    """
+
+    def __init__(self, budgets: dict[str, int] | None = None, top_k: int = 5):
+        self.budgets: dict[str, int] = {"flight_agent": 400, "hotel_agent": 400}
+        self.budgets.update(budgets or {})
+        self.top_k = top_k
+        self._lock = threading.Lock()
+
+    def configure(self, top_k: int | None = None, **budgets: int) -> None:
+        with self._lock:
+            if top_k is not None:
+                self.top_k = top_k
+            self.budgets.update(budgets)
+
+    def fit(
+        self,
+        node: str,
+        items: Sequence[T],
+        render: Callable[[int, T, int], str],
+        levels: int,
+        max_tokens: int | None = None,
+    ) -> str:
+        """
+        Formats pre-ranked `items` for the prompt of `node`.
+
+        Args:
+            render: Formats the item at a 1-based position and detail level,
+                0 being the most detailed.
+            levels: Number of detail levels `render` supports.
+            max_tokens: Overrides the configured budget of the node.
+        """
+        budget = max_tokens or self.budgets.get(node)
+        items = list(items)
+
+        def join(kept: Sequence[T], level: int) -> str:
+            return "\n\n".join(
+                render(i, item, level) for i, item in enumerate(kept, start=1)
+            )
+
+        full_tokens = count_tokens(join(items, 0))
+        kept = items[: self.top_k]
+        for level in range(levels):
+            text = join(kept, level)
+            if budget is None or count_tokens(text) <= budget:
+                break
+        else:
+            # Terse still too long: drop the lowest ranked, always keep the best
+            while len(kept) > 1 and count_tokens(text) > budget:
+                kept = kept[:-1]
+                text = join(kept, levels - 1)
+
+        saved = full_tokens - count_tokens(text)
+        if saved > 0:
+            PROMPT_TOKENS_SAVED.inc(saved, node=node)
+            print(
+                f"   ✂️  Prompt for {node} trimmed to {len(kept)} result(s): {saved} tokens saved"
+            )
+        return text
+
+
+prompt_budget = PromptBudget()
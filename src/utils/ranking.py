@@ -0,0 +1,378 @@
+import re
+from collections.abc import Iterable
+from datetime import datetime
+from itertools import pairwise
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from src.states import FlightSearchResultState, HotelDetails, OfferDetails
+from src.tools.exchange_rate import get_exchange_rates
+
+ISO_DURATION_RE = re.compile(
+    r"^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?$"
+)
+
+
+class FlightScoringWeights(BaseModel):
+    """Relative importance of each criterion when ranking flight offers"""
+
+    price: float = Field(1.0, description="Weight of the price in the budget currency")
+    duration: float = Field(0.5, description="Weight of the total travel time")
+    stops: float = Field(0.3, description="Weight of the number of stops")
+    layover: float = Field(0.3, description="Weight of the total layover time")
+    red_eye: float = Field(0.2, description="Penalty per segment departing overnight")
+    long_layover: float = Field(
+        0.5, description="Penalty per layover longer than max_layover_hours"
+    )
+    max_layover_hours: float = Field(
+        8.0, description="Layovers above this are penalised"
+    )
+    red_eye_start_hour: int = Field(0, description="Overnight window start (inclusive)")
+    red_eye_end_hour: int = Field(5, description="Overnight window end (exclusive)")
+
+
+class HotelScoringWeights(BaseModel):
+    """Relative importance of each criterion when ranking hotel offers"""
+
+    total_price: float = Field(1.0, description="Weight of the stay's total price")
+    nightly_price: float = Field(0.5, description="Weight of the price per night")
+    distance: float = Field(
+        0.6, description="Weight of the distance to the city centre"
+    )
+    board: float = Field(0.3, description="Bonus for included meals, see BOARD_VALUES")
+    refundable: float = Field(0.2, description="Bonus for refundable offers")
+
+
+# How much of the daily meals each Amadeus board type covers
+BOARD_VALUES: dict[str, float] = {
+    "ROOM_ONLY": 0.0,
+    "BREAKFAST": 0.5,
+    "HALF_BOARD": 0.75,
+    "FULL_BOARD": 0.9,
+    "ALL_INCLUSIVE": 1.0,
+}
+
+
+def parse_iso_duration(value: str) -> float:
+    """Parses an ISO-8601 duration such as "PT7H25M" into hours, NaN if invalid"""
+    match = ISO_DURATION_RE.match((value or "").strip().upper())
+    if not match or not any(match.groupdict().values()):
+        return float("nan")
+    parts = {k: int(v) if v else 0 for k, v in match.groupdict().items()}
+    return (
+        parts["days"] * 24
+        + parts["hours"]
+        + parts["minutes"] / 60
+        + parts["seconds"] / 3600
+    )
+
+
+def conversion_rates(currencies: Iterable[str], target: str) -> dict[str, float]:
+    """Rate from each currency to `target`, fetched in a single batch"""
+    currencies = {c.upper() for c in currencies if c}
+    pending = {(c, target) for c in currencies if c != target}
+    fetched = get_exchange_rates(pending) if pending else {}
+    return {
+        c: 1.0 if c == target else fetched.get((c, target), 1.0) for c in currencies
+    }
+
+
+def _hours_between(start: str, end: str) -> float:
+    try:
+        delta = datetime.fromisoformat(end) - datetime.fromisoformat(start)
+        return max(delta.total_seconds() / 3600, 0.0)
+    except ValueError:
+        return 0.0
+
+
+def flight_features(
+    offers: list[FlightSearchResultState],
+    rates: dict[str, float],
+    weights: FlightScoringWeights,
+) -> dict[str, np.ndarray]:
+    """
+    Extracts one row of raw criteria per offer. Parsing the strings is per
+    offer; everything downstream operates on the whole array at once.
+    """
+    n = len(offers)
+    price = np.empty(n)
+    duration = np.zeros(n)
+    stops = np.zeros(n)
+    layover = np.zeros(n)
+    long_layovers = np.zeros(n)
+    red_eyes = np.zeros(n)
+
+    for i, offer in enumerate(offers):
+        price[i] = float(offer.price) * rates.get(offer.currency.upper(), 1.0)
+        for itinerary in offer.itineraries:
+            segments = itinerary.segments
+            stops[i] += len(segments) - 1 + sum(seg.stops for seg in segments)
+            for seg in segments:
+                hours = parse_iso_duration(seg.duration)
+                if np.isnan(hours):
+                    hours = _hours_between(seg.departure_time, seg.arrival_time)
+                duration[i] += hours
+                try:
+                    hour = datetime.fromisoformat(seg.departure_time).hour
+                    if weights.red_eye_start_hour <= hour < weights.red_eye_end_hour:
+                        red_eyes[i] += 1
+                except ValueError:
+                    pass
+            for prev, nxt in pairwise(segments):
+                wait = _hours_between(prev.arrival_time, nxt.departure_time)
+                layover[i] += wait
+                long_layovers[i] += wait > weights.max_layover_hours
+
+    return {
+        "price": price,
+        "duration": duration + layover,
+        "stops": stops,
+        "layover": layover,
+        "long_layovers": long_layovers,
+        "red_eyes": red_eyes,
+    }
+
+
+def _normalise(values: np.ndarray) -> np.ndarray:
+    span = values.max() - values.min()
+    return (values - values.min()) / span if span > 0 else np.zeros_like(values)
+
+
+def score_flights(
+    features: dict[str, np.ndarray], weights: FlightScoringWeights
+) -> np.ndarray:
+    """Weighted cost per offer, lower is better. Criteria are min-max scaled"""
+    return (
+        weights.price * _normalise(features["price"])
+        + weights.duration * _normalise(features["duration"])
+        + weights.stops * _normalise(features["stops"])
+        + weights.layover * _normalise(features["layover"])
+        + weights.long_layover * features["long_layovers"]
+        + weights.red_eye * features["red_eyes"]
+    )
+
+
+def score_flight_offers(
+    offers: list[FlightSearchResultState],
+    budget_currency: str,
+    weights: FlightScoringWeights | None = None,
+    rates: dict[str, float] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Score (lower is better) and price in the budget currency of every offer"""
+    if not offers:
+        return np.empty(0), np.empty(0)
+    weights = weights or FlightScoringWeights()
+    if rates is None:
+        rates = conversion_rates((o.currency for o in offers), budget_currency)
+
+    features = flight_features(offers, rates, weights)
+    return score_flights(features, weights), features["price"]
+
+
+def rank_flights(
+    offers: list[FlightSearchResultState],
+    budget: float | None,
+    budget_currency: str,
+    weights: FlightScoringWeights | None = None,
+    rates: dict[str, float] | None = None,
+) -> tuple[list[int], np.ndarray]:
+    """
+    Ranks flight offers on price, duration, stops, layovers and overnight
+    departures.
+
+    Args:
+        offers: Flight offers, possibly in several currencies.
+        budget: Amount available in the budget currency; offers above it are dropped.
+        budget_currency: Currency the prices are converted into.
+        weights: Scoring weights, defaults to `FlightScoringWeights()`.
+        rates: Conversion rates to the budget currency, fetched if omitted.
+
+    Returns:
+        Indices of the affordable offers, best first, and the converted price
+        of every offer.
+    """
+    scores, prices = score_flight_offers(offers, budget_currency, weights, rates)
+    if budget is not None:
+        scores = np.where(prices <= budget, scores, np.inf)
+
+    order = np.argsort(scores, kind="stable")
+    return [int(i) for i in order if np.isfinite(scores[i])], prices
+
+
+def describe_flight(
+    offer: FlightSearchResultState, converted_price: float, budget_currency: str
+) -> str:
+    """Short deterministic recommendation for a selected flight"""
+    hours = sum(
+        parse_iso_duration(seg.duration)
+        for itinerary in offer.itineraries
+        for seg in itinerary.segments
+    )
+    stops = sum(
+        len(itinerary.segments) - 1 + sum(seg.stops for seg in itinerary.segments)
+        for itinerary in offer.itineraries
+    )
+    airlines = sorted({seg.airline for it in offer.itineraries for seg in it.segments})
+    duration = f", {hours:.1f}h in the air" if not np.isnan(hours) else ""
+    return (
+        f"Best balance of price and convenience: {converted_price:.2f} {budget_currency}"
+        f"{duration}, {stops} stop(s) with {', '.join(airlines)}."
+    )
+
+
+def haversine_km(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """Great-circle distance in km from one point to arrays of points"""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+def is_refundable(offer: OfferDetails) -> bool:
+    policy = (offer.cancellation_policy or "").upper()
+    return bool(policy) and "NON" not in policy
+
+
+def score_hotel_offers(
+    hotels: list[HotelDetails],
+    nights: int,
+    budget_currency: str,
+    latitude: float | None = None,
+    longitude: float | None = None,
+    weights: HotelScoringWeights | None = None,
+    rates: dict[str, float] | None = None,
+) -> tuple[list[tuple[int, int]], np.ndarray, np.ndarray]:
+    """
+    Scores every offer of every hotel on total and nightly price, distance to
+    the destination coordinates, board type and refundability.
+
+    Returns:
+        The (hotel index, offer index) pairs, their scores (lower is better)
+        and their total price in the budget currency.
+    """
+    pairs = [(h, o) for h, hotel in enumerate(hotels) for o in range(len(hotel.offers))]
+    if not pairs:
+        return [], np.empty(0), np.empty(0)
+    weights = weights or HotelScoringWeights()
+    offers = [hotels[h].offers[o] for h, o in pairs]
+    if rates is None:
+        rates = conversion_rates((o.price.currency for o in offers), budget_currency)
+
+    rate = np.array([rates.get(o.price.currency.upper(), 1.0) for o in offers])
+    total = np.array([float(o.price.total) for o in offers]) * rate
+    nightly = (
+        np.array(
+            [
+                float(o.price.avg_nightly) if o.price.avg_nightly else np.nan
+                for o in offers
+            ]
+        )
+        * rate
+    )
+    nightly = np.where(np.isnan(nightly), total / max(nights, 1), nightly)
+    board = np.array([BOARD_VALUES.get(o.board_type.upper(), 0.0) for o in offers])
+    refundable = np.array([is_refundable(o) for o in offers], dtype=float)
+
+    distance = np.zeros(len(pairs))
+    if latitude is not None and longitude is not None:
+        lats = np.array(
+            [hotels[h].location.latitude or np.nan for h, _ in pairs], dtype=float
+        )
+        lons = np.array(
+            [hotels[h].location.longitude or np.nan for h, _ in pairs], dtype=float
+        )
+        distance = haversine_km(latitude, longitude, lats, lons)
+        # Hotels without coordinates rank as the farthest known one
+        known = ~np.isnan(distance)
+        distance = np.where(
+            known, distance, distance[known].max() if known.any() else 0.0
+        )
+
+    scores = (
+        weights.total_price * _normalise(total)
+        + weights.nightly_price * _normalise(nightly)
+        + weights.distance * _normalise(distance)
+        - weights.board * board
+        - weights.refundable * refundable
+    )
+    return pairs, scores, total
+
+
+def rank_hotel_offers(
+    hotels: list[HotelDetails],
+    nights: int,
+    budget: float | None,
+    budget_currency: str,
+    latitude: float | None = None,
+    longitude: float | None = None,
+    weights: HotelScoringWeights | None = None,
+    rates: dict[str, float] | None = None,
+) -> list[tuple[int, int, float]]:
+    """
+    Ranks every hotel offer with `score_hotel_offers`.
+
+    Args:
+        hotels: Hotels from the search, each with one or more offers.
+        nights: Length of the stay, used when an offer has no nightly price.
+        budget: Amount available in the budget currency; offers above it are dropped.
+        budget_currency: Currency the prices are converted into.
+        latitude: Destination latitude; distance is ignored when unknown.
+        longitude: Destination longitude.
+        weights: Scoring weights, defaults to `HotelScoringWeights()`.
+        rates: Conversion rates to the budget currency, fetched if omitted.
+
+    Returns:
+        (hotel index, offer index, total price in the budget currency) for the
+        affordable offers, best first.
+    """
+    pairs, scores, total = score_hotel_offers(
+        hotels, nights, budget_currency, latitude, longitude, weights, rates
+    )
+    if budget is not None:
+        scores = np.where(total <= budget, scores, np.inf)
+
+    order = np.argsort(scores, kind="stable")
+    return [
+        (pairs[i][0], pairs[i][1], float(total[i]))
+        for i in order
+        if np.isfinite(scores[i])
+    ]
+
+
+def describe_hotel(
+    hotel: HotelDetails,
+    offer: OfferDetails,
+    converted_total: float,
+    budget_currency: str,
+    nights: int,
+    latitude: float | None = None,
+    longitude: float | None = None,
+) -> str:
+    """Short deterministic recommendation for a selected hotel offer"""
+    parts = [
+        f"{hotel.name}: {converted_total:.2f} {budget_currency} for {nights} night(s)"
+    ]
+    if None not in (
+        latitude,
+        longitude,
+        hotel.location.latitude,
+        hotel.location.longitude,
+    ):
+        km = haversine_km(
+            latitude,
+            longitude,
+            np.array([hotel.location.latitude]),
+            np.array([hotel.location.longitude]),
+        )[0]
+        parts.append(f"{km:.1f} km from the centre")
+    if offer.board_type and offer.board_type.upper() != "ROOM_ONLY":
+        parts.append(offer.board_type.replace("_", " ").lower())
+    if is_refundable(offer):
+        parts.append("refundable")
+    return ", ".join(parts) + "."
@@ -0,0 +1,158 @@
+import re
+import threading
+from itertools import pairwise
+
+from pydantic import BaseModel, Field
+
+# Markdown headings, or a bold line on its own such as "**Day 2: Louvre**"
+HEADING_RE = re.compile(r"^(?:#{1,6}\s+.+|\*\*[^*\n]+\*\*:?)[ \t]*$", re.MULTILINE)
+DAY_RE = re.compile(r"\bday\s+(\d{1,2})\b", re.IGNORECASE)
+
+# What a critique talks about, and the section titles covering it
+TOPICS = [
+    (
+        re.compile(r"budget|cost|price|total|remaining|spent", re.IGNORECASE),
+        re.compile(r"budget|cost|price|total", re.IGNORECASE),
+    ),
+    (
+        re.compile(r"flight|departs|outbound|return", re.IGNORECASE),
+        re.compile(r"flight|overview|transport", re.IGNORECASE),
+    ),
+    (
+        re.compile(r"hotel|check[- ]?in|check[- ]?out|accommodation", re.IGNORECASE),
+        re.compile(r"hotel|accommodation|stay|overview", re.IGNORECASE),
+    ),
+    (
+        re.compile(r"destination|never mentions", re.IGNORECASE),
+        re.compile(r"overview|destination|itinerary", re.IGNORECASE),
+    ),
+]
+
+
+class ItinerarySection(BaseModel):
+    """A heading and the text up to the next heading"""
+
+    title: str = Field(
+        description="Heading without markdown markers, empty for the preamble"
+    )
+    text: str = Field(description="Full text of the section, heading included")
+
+
+def split_sections(itinerary: str) -> list[ItinerarySection]:
+    """Splits a markdown itinerary on its headings; joining the texts gives it back"""
+    starts = [m.start() for m in HEADING_RE.finditer(itinerary)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(itinerary)]
+    sections = []
+    for start, end in pairwise(bounds):
+        text = itinerary[start:end]
+        heading = HEADING_RE.match(text)
+        title = heading.group(0).strip("#* :\t") if heading else ""
+        sections.append(ItinerarySection(title=title, text=text))
+    return sections
+
+
+def join_sections(sections: list[ItinerarySection]) -> str:
+    return "".join(section.text for section in sections)
+
+
+def sections_for_critique(
+    sections: list[ItinerarySection], critique: str
+) -> list[int] | None:
+    """
+    Indices of the sections a critique is about, matched on the topics and
+    day numbers it mentions.
+
+    Returns:
+        The indices to regenerate, or None when the critique cannot be tied
+        to a strict subset of the sections and the whole draft must be rewritten.
+    """
+    if len(sections) < 2:
+        return None
+
+    targets = set()
+    for mentions, titles in TOPICS:
+        if mentions.search(critique):
+            targets |= {i for i, s in enumerate(sections) if titles.search(s.title)}
+    for day in DAY_RE.findall(critique):
+        day_re = re.compile(rf"\bday\s+{int(day)}\b", re.IGNORECASE)
+        targets |= {i for i, s in enumerate(sections) if day_re.search(s.title)}
+
+    if not targets or len(targets) == len(sections):
+        return None
+    return sorted(targets)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for when the provider reports no usage"""
+    return max(len(text) // 4, 1) if text else 0
+
+
+class RevisionStats:
+    """
+    Output tokens and latency saved by patching rejected itineraries instead
+    of regenerating them. Savings are measured against the size of the draft
+    being revised and the average speed of full generations.
+    """
+
+    def __init__(self):
+        self.full_generations = 0
+        self.full_seconds = 0.0
+        self.full_tokens = 0
+        self.patches = 0
+        self.patch_seconds = 0.0
+        self.patch_tokens = 0
+        self.tokens_saved = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+
+    def record_full(self, elapsed: float, tokens: int) -> None:
+        with self._lock:
+            self.full_generations += 1
+            self.full_seconds += elapsed
+            self.full_tokens += tokens
+
+    @property
+    def seconds_per_token(self) -> float:
+        return self.full_seconds / self.full_tokens if self.full_tokens else 0.0
+
+    def record_patch(self, elapsed: float, tokens: int, draft_tokens: int) -> None:
+        with self._lock:
+            self.patches += 1
+            self.patch_seconds += elapsed
+            self.patch_tokens += tokens
+            self.tokens_saved += max(draft_tokens - tokens, 0)
+            if self.seconds_per_token:
+                full_estimate = draft_tokens * self.seconds_per_token
+                self.seconds_saved += max(full_estimate - elapsed, 0.0)
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "full_generations": self.full_generations,
+            "avg_full_ms": round(
+                (
+                    self.full_seconds * 1000 / self.full_generations
+                    if self.full_generations
+                    else 0.0
+                ),
+                2,
+            ),
+            "patches": self.patches,
+            "avg_patch_ms": round(
+                self.patch_seconds * 1000 / self.patches if self.patches else 0.0, 2
+            ),
+            "patch_output_tokens": self.patch_tokens,
+            "output_tokens_saved": self.tokens_saved,
+            "estimated_saved_s": round(self.seconds_saved, 3),
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        return (
+            f"revisions: {s['patches']} patched, ~{s['output_tokens_saved']} output tokens "
+            f"and ~{s['estimated_saved_s']:.1f}s saved"
+        )
+
+
+revision_stats = RevisionStats()
@@ -0,0 +1,258 @@
+import copy
+import re
+import threading
+import zlib
+from collections.abc import Callable
+from datetime import date, timedelta
+from typing import Any
+
+import numpy as np
+
+from .plan_parser import (
+    _CITY_RE,
+    ACTIVITIES_RE,
+    CURRENCY_SYMBOLS,
+    HOTEL_RE,
+    IN_N_RE,
+    NEXT_WEEKDAY_RE,
+    NO_ACTIVITIES_RE,
+    NO_HOTEL_RE,
+    NUMBER_WORDS,
+    extract_trip_dates,
+)
+
+RELATIVE_DATES_RE = re.compile(
+    r"\b(?:today|tonight|tomorrow|(?:next|this|coming)\s+(?:week|weekend|month))\b"
+)
+MONTH_RE = re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b")
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+# "a"/"an" also appear in "a budget of"; "a week" still differs from "two weeks"
+NUMBER_WORD_RE = re.compile(
+    r"\b(?:" + "|".join(w for w in NUMBER_WORDS if w not in ("a", "an")) + r")\b"
+)
+CAPITALIZED_RE = re.compile(r"\b[A-Z][a-zA-Z]+\b")
+# The word after "to", "from", "in"... names a place even when lowercase and unknown
+PLACE_RE = re.compile(
+    r"\b(?:to|from|in|at|via|near|around|across|visiting)\s+(?:the\s+)?([a-z][a-z'-]*)"
+)
+# Verbs, pronouns and fillers that follow those words without naming a place
+NOT_PLACES = {
+    "go",
+    "visit",
+    "travel",
+    "fly",
+    "be",
+    "see",
+    "explore",
+    "spend",
+    "stay",
+    "book",
+    "find",
+    "get",
+    "have",
+    "make",
+    "plan",
+    "help",
+    "suggest",
+    "take",
+    "do",
+    "know",
+    "visiting",
+    "seeing",
+    "exploring",
+    "trying",
+    "my",
+    "our",
+    "me",
+    "us",
+    "you",
+    "your",
+    "a",
+    "an",
+    "and",
+    "or",
+    "total",
+    "mind",
+    "advance",
+    "addition",
+    "case",
+}
+# Capitalised mid-sentence without being names
+NOT_PROPER_NOUNS = {"i", "thanks", "thank", "please", "hi", "hello", "cheers"}
+
+
+class HashedNgramEmbedder:
+    """
+    Embeds text as L2-normalised counts of hashed character n-grams and
+    words. No model to load; similar phrasings share most of their n-grams.
+    """
+
+    def __init__(self, dim: int = 4096, ngram_range: tuple[int, int] = (3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def __call__(self, text: str) -> np.ndarray:
+        normalized = " ".join(re.findall(r"[a-z0-9$€£¥₹]+", text.lower()))
+        padded = f" {normalized} "
+        features: list[str] = normalized.split()
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.extend(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+        indices = [zlib.crc32(f.encode("utf-8")) % self.dim for f in features]
+        vector = np.bincount(indices, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def request_facts(text: str) -> tuple:
+    """
+    The details a reused extraction must agree on exactly: numbers, known
+    cities, proper nouns, the words after "to"/"from"/"in", months,
+    currencies and hotel/activity wording.
+    Embeddings alone would match "Paris in May" with "Rome in May".
+    """
+    text = " ".join(text.split())
+    lowered = text.lower()
+    proper_nouns = set()
+    for sentence in re.split(r"[.!?\n]+", text):
+        # The first word of a sentence is capitalised anyway
+        proper_nouns |= {w.lower() for w in CAPITALIZED_RE.findall(sentence)[1:]}
+    proper_nouns -= NOT_PROPER_NOUNS
+    places = set(PLACE_RE.findall(lowered)) - NOT_PLACES
+    return (
+        tuple(sorted({n.replace(",", "") for n in NUMBER_RE.findall(lowered)})),
+        tuple(sorted(set(NUMBER_WORD_RE.findall(lowered)))),
+        tuple(sorted(set(_CITY_RE.findall(lowered)) | proper_nouns | places)),
+        tuple(sorted(set(MONTH_RE.findall(lowered)))),
+        tuple(sorted(s for s in CURRENCY_SYMBOLS if s in text)),
+        bool(NO_HOTEL_RE.search(lowered)),
+        bool(HOTEL_RE.search(lowered)),
+        bool(NO_ACTIVITIES_RE.search(lowered)),
+        bool(ACTIVITIES_RE.search(lowered)),
+    )
+
+
+def has_relative_dates(text: str) -> bool:
+    lowered = text.lower()
+    return bool(
+        RELATIVE_DATES_RE.search(lowered)
+        or IN_N_RE.search(lowered)
+        or NEXT_WEEKDAY_RE.search(lowered)
+    )
+
+
+def shift_dates(plan_data: dict[str, Any], days: int) -> None:
+    for field in ("departure_date", "arrival_date"):
+        try:
+            value = date.fromisoformat(plan_data[field])
+        except (KeyError, TypeError, ValueError):
+            continue
+        plan_data[field] = (value + timedelta(days=days)).isoformat()
+
+
+class SemanticPlanCache:
+    """
+    Reuses planner extractions for requests phrased differently from one
+    seen recently.
+
+    Request embeddings live in a preallocated NumPy matrix, so a lookup is
+    one matrix-vector product. A candidate above `threshold` is only reused
+    if its `request_facts` are identical, and its dates are re-derived or
+    shifted when the request used relative expressions. The least recently
+    used entry is evicted once `capacity` is reached, and entries older than
+    `max_age_days` are ignored.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 512,
+        threshold: float = 0.75,
+        max_age_days: int = 30,
+        embedder: Callable[[str], np.ndarray] | None = None,
+    ):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.max_age_days = max_age_days
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.dim = len(self.embedder("probe"))
+
+        self._vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._facts: list[tuple | None] = [None] * capacity
+        self._plans: list[dict[str, Any] | None] = [None] * capacity
+        self._texts: list[str | None] = [None] * capacity
+        self._days = np.zeros(capacity, dtype=np.int64)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._size = 0
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def search(self, text: str, today: date) -> tuple[int | None, float]:
+        """Index and similarity of the best usable entry, None if none qualifies"""
+        if not self._size:
+            return None, 0.0
+        similarities = self._vectors[: self._size] @ self.embedder(text)
+        fresh = today.toordinal() - self._days[: self._size] <= self.max_age_days
+        similarities = np.where(fresh, similarities, -1.0)
+        facts = request_facts(text)
+        # Best first; the facts check rejects near-duplicates of other trips
+        for index in np.argsort(similarities)[::-1]:
+            if similarities[index] < self.threshold:
+                break
+            if self._facts[index] == facts:
+                return int(index), float(similarities[index])
+        return None, float(similarities.max())
+
+    def lookup(self, text: str, today: date) -> dict[str, Any] | None:
+        """A copy of the cached extraction for an equivalent request, adjusted to `today`"""
+        with self._lock:
+            index, _ = self.search(text, today)
+            if index is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._last_used[index] = self._tick()
+            plan_data = copy.deepcopy(self._plans[index])
+            cached_day = int(self._days[index])
+
+        if has_relative_dates(text):
+            trip_dates = extract_trip_dates(text.lower(), today)
+            if trip_dates:
+                plan_data["departure_date"], plan_data["arrival_date"] = trip_dates
+            else:
+                shift_dates(plan_data, today.toordinal() - cached_day)
+        return plan_data
+
+    def store(self, text: str, plan_data: dict[str, Any], today: date) -> None:
+        vector = self.embedder(text)
+        with self._lock:
+            if self._size < self.capacity:
+                index = self._size
+                self._size += 1
+            else:
+                index = int(np.argmin(self._last_used))
+            self._vectors[index] = vector
+            self._facts[index] = request_facts(text)
+            self._plans[index] = copy.deepcopy(plan_data)
+            self._texts[index] = text
+            self._days[index] = today.toordinal()
+            self._last_used[index] = self._tick()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
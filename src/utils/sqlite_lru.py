@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+COLUMNS = ["key", "label", "value", "created_at", "last_access"]
+
+
+class SQLiteLRUCache:
+    """
+    Persistent, size-bounded LRU table of JSON values, with an optional time
+    to live and per-node hit/miss counts.
+
+    Base of the node output cache and the LLM response cache: subclasses
+    decide how keys are made and what the value holds. `label` records what
+    produced an entry (a node, a model). In WAL mode, other processes can
+    read while one writes.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        table: str,
+        max_entries: int,
+        ttl_seconds: float | None = None,
+        wal: bool = False,
+    ):
+        self.db_path = db_path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if wal:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        if columns and columns != COLUMNS:
+            # A table from an older layout: it only holds cached data
+            self._conn.execute(f"DROP TABLE {table}")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                label TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_access ON {table} (last_access)"
+        )
+        self._conn.commit()
+
+    def _record(self, node: str, hit: bool) -> None:
+        counts = self.hits if hit else self.misses
+        counts[node] = counts.get(node, 0) + 1
+
+    def _lookup(
+        self, key: str, node: str, ttl_seconds: float | None = None
+    ) -> Any | None:
+        """The stored value, or None if missing or older than `ttl_seconds`"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row and ttl_seconds and now - row[1] > ttl_seconds:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self._record(node, hit=False)
+                return None
+
+            self._conn.execute(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self._record(node, hit=True)
+            return json.loads(row[0])
+
+    def _store(self, key: str, label: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?, ?)",
+                (key, label, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            # Evict the least recently used entries beyond the size bound
+            self._conn.execute(
+                f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table} ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Per-node hit/miss counts and hit rate since startup"""
+        report: dict[str, dict[str, float]] = {}
+        for node in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits.get(node, 0)
+            misses = self.misses.get(node, 0)
+            report[node] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+        return report
+
+    def size(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[
+                0
+            ]
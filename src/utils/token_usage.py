@@ -1,12 +1,16 @@
 import csv
+import os
 import time
 import uuid
-import os
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any
+from uuid import UUID
+
 from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.outputs import LLMResult
 
+from .metrics import LLM_CALL_DURATION, LLM_TOKENS
+
 
 class TokenUsageTracker(BaseCallbackHandler):
     def __init__(
@@ -15,13 +19,24 @@ class TokenUsageTracker(BaseCallbackHandler):
         model_name: str,
         model_provider: str,
         log_file: str = "costs.csv",
+        prices: dict[str, tuple[float, float]] | None = None,
     ):
+        """
+        Args:
+            model_name / model_provider: Logged for calls that do not report
+                the model they ran on.
+            prices: USD per million (prompt, completion) tokens by model name,
+                used for the per-node cost in `summary`.
+        """
         self.scenario_id = scenario_id
         self.model_name = model_name
         self.model_provider = model_provider
         self.log_file = log_file
-        self.current_call_id: str = ""
-        self.start_time: float = 0.0
+        self.prices = prices or {}
+        # Calls can overlap (batched prompts), so each run keeps its own
+        # call id, start time, node and routed model
+        self._runs: dict[UUID, tuple[str, float, str, str, str]] = {}
+        self._nodes: dict[tuple[str, str], dict[str, float]] = {}
 
         self._init_csv()
 
@@ -48,24 +63,90 @@ class TokenUsageTracker(BaseCallbackHandler):
 
     def on_chat_model_start(
         self,
-        serialized: Dict[str, Any],
-        messages: List[List[Any]],
-        tags: List[str] = None,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        tags: list[str] | None = None,
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
         **kwargs: Any,
     ) -> Any:
-        self.start_time = time.time()
-        self.current_call_id = str(uuid.uuid4())
-        self.node_name = "Unknown_Node"
-        if tags:
-            node_tag = next((tag for tag in tags if ":" not in tag), None)
-            if node_tag:
-                self.node_name = node_tag
-            else:
-                self.node_name = ",".join(tags) if tags else "Unknown_Node"
-
-    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> Any:
+        metadata = metadata or {}
+        node_name = metadata.get("llm_node")
+        if not node_name:
+            node_tag = next((tag for tag in tags or [] if ":" not in tag), None)
+            node_name = node_tag or ",".join(tags or []) or "Unknown_Node"
+        self._runs[run_id] = (
+            str(uuid.uuid4()),
+            time.time(),
+            node_name,
+            metadata.get("ls_model_name") or self.model_name,
+            metadata.get("ls_provider") or self.model_provider,
+        )
+
+    def _record(
+        self,
+        node: str,
+        model: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency_ms: float,
+        ok: bool,
+    ) -> None:
+        entry = self._nodes.setdefault(
+            (node, model),
+            {
+                "calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "latency_ms": 0.0,
+            },
+        )
+        entry["calls"] += 1
+        entry["errors"] += 0 if ok else 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["completion_tokens"] += completion_tokens
+        entry["latency_ms"] += latency_ms
+        LLM_CALL_DURATION.observe(latency_ms / 1000, node=node, model=model)
+        LLM_TOKENS.inc(prompt_tokens, node=node, model=model, kind="prompt")
+        LLM_TOKENS.inc(completion_tokens, node=node, model=model, kind="completion")
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Calls, tokens, mean latency and cost per node and the model it was routed to"""
+        report: dict[str, dict[str, Any]] = {}
+        for (node, model), entry in sorted(self._nodes.items()):
+            input_price, output_price = self.prices.get(model, (0.0, 0.0))
+            report[f"{node}/{model}"] = {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "prompt_tokens": entry["prompt_tokens"],
+                "completion_tokens": entry["completion_tokens"],
+                "avg_latency_ms": round(entry["latency_ms"] / entry["calls"], 2),
+                "cost_usd": round(
+                    (
+                        entry["prompt_tokens"] * input_price
+                        + entry["completion_tokens"] * output_price
+                    )
+                    / 1_000_000,
+                    6,
+                ),
+            }
+        return report
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> Any:
+        call_id, start_time, node_name, model, provider = self._runs.pop(
+            run_id,
+            (
+                str(uuid.uuid4()),
+                time.time(),
+                "Unknown_Node",
+                self.model_name,
+                self.model_provider,
+            ),
+        )
         end_time = time.time()
-        latency_ms: float = (end_time - self.start_time) * 1000
+        latency_ms: float = (end_time - start_time) * 1000
         timestamp: str = datetime.now().isoformat()
 
         # Extract token usage
@@ -94,28 +175,42 @@ class TokenUsageTracker(BaseCallbackHandler):
         except Exception as e:
             print(f"Warning: Could not extract token usage: {e}")
 
+        self._record(
+            node_name, model, prompt_tokens, completion_tokens, latency_ms, ok=True
+        )
         with open(self.log_file, mode="a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(
                 [
                     timestamp,
                     self.scenario_id,
-                    self.current_call_id,
-                    self.model_name,
-                    self.model_provider,
+                    call_id,
+                    model,
+                    provider,
                     prompt_tokens,
                     completion_tokens,
                     total_tokens,
                     f"{latency_ms:.2f}",
                     "SUCCESS",
-                    self.node_name,
+                    node_name,
                 ]
             )
 
-    def on_llm_error(self, error: BaseException, **kwargs: Any) -> Any:
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> Any:
         """Log failures."""
+        call_id, start_time, node_name, model, provider = self._runs.pop(
+            run_id,
+            (
+                str(uuid.uuid4()),
+                time.time(),
+                "Unknown_Node",
+                self.model_name,
+                self.model_provider,
+            ),
+        )
         end_time = time.time()
-        latency_ms = (end_time - self.start_time) * 1000
+        latency_ms = (end_time - start_time) * 1000
+        self._record(node_name, model, 0, 0, latency_ms, ok=False)
         timestamp = datetime.now().isoformat()
 
         with open(self.log_file, mode="a", newline="", encoding="utf-8") as f:
@@ -124,9 +219,9 @@ class TokenUsageTracker(BaseCallbackHandler):
                 [
                     timestamp,
                     self.scenario_id,
-                    self.current_call_id,
-                    self.model_name,
-                    self.model_provider,
+                    call_id,
+                    model,
+                    provider,
                     0,
                     0,
                     0,
@@ -0,0 +1,167 @@
+import contextvars
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+
+class TraceRun:
+    """Spans recorded during one graph run, as Chrome trace "complete" events"""
+
+    def __init__(self, thread_id: str):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.thread_id = thread_id
+        self.started_at = time.time()
+        self.origin = time.perf_counter()
+        self.events: list[dict[str, Any]] = []
+        self.finished = False
+        self._threads: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        # Small stable ids per OS thread, so parallel branches get their own row
+        ident = threading.get_ident()
+        with self._lock:
+            return self._threads.setdefault(ident, len(self._threads) + 1)
+
+    def add(
+        self, name: str, category: str, start: float, end: float, args: dict[str, Any]
+    ) -> None:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": 1,
+            "tid": self._tid(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """JSON object format accepted by chrome://tracing and Perfetto"""
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self._threads)
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": 1,
+                "args": {"name": f"thread {self.thread_id}"},
+            }
+        ] + [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": tid,
+                "args": {"name": f"worker {tid}"},
+            }
+            for tid in threads.values()
+        ]
+        return {
+            "traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "run_id": self.run_id,
+                "thread_id": self.thread_id,
+                "started_at": self.started_at,
+                "finished": self.finished,
+            },
+        }
+
+
+_current_run: contextvars.ContextVar[TraceRun | None] = contextvars.ContextVar(
+    "trace_run", default=None
+)
+
+
+class Tracer:
+    """
+    Keeps the most recent sampled runs in a bounded ring buffer. Runs that are
+    not sampled record nothing: `span` only checks a context variable.
+    """
+
+    def __init__(self, max_runs: int = 50, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self._runs: deque[TraceRun] = deque(maxlen=max_runs)
+        self._lock = threading.Lock()
+
+    def configure(self, max_runs: int | None = None, sample_rate: float | None = None):
+        with self._lock:
+            if max_runs is not None:
+                self._runs = deque(self._runs, maxlen=max_runs)
+            if sample_rate is not None:
+                self.sample_rate = sample_rate
+
+    @contextmanager
+    def run(self, thread_id: str) -> Iterator[TraceRun | None]:
+        """Records the spans opened in this context under a new run for `thread_id`"""
+        if random.random() >= self.sample_rate:
+            yield None
+            return
+        trace_run = TraceRun(thread_id)
+        with self._lock:
+            self._runs.append(trace_run)
+        token = _current_run.set(trace_run)
+        start = time.perf_counter()
+        try:
+            yield trace_run
+        finally:
+            trace_run.add("graph_run", "run", start, time.perf_counter(), {})
+            trace_run.finished = True
+            try:
+                _current_run.reset(token)
+            except ValueError:
+                # A streaming response closed from another task
+                pass
+
+    def latest(self, thread_id: str) -> TraceRun | None:
+        with self._lock:
+            for trace_run in reversed(self._runs):
+                if trace_run.thread_id == thread_id:
+                    return trace_run
+        return None
+
+    def runs(self, thread_id: str | None = None) -> list[TraceRun]:
+        with self._lock:
+            return [
+                r for r in self._runs if thread_id is None or r.thread_id == thread_id
+            ]
+
+
+tracer = Tracer()
+
+
+def open_span(name: str, category: str, **args: Any) -> Callable[[], None]:
+    """
+    Starts a span of the current run and returns the function that ends it,
+    for work that completes in a callback on another thread
+    """
+    trace_run = _current_run.get()
+    if trace_run is None:
+        return lambda: None
+    start = time.perf_counter()
+    return lambda: trace_run.add(name, category, start, time.perf_counter(), args)
+
+
+@contextmanager
+def span(name: str, category: str, **args: Any) -> Iterator[None]:
+    """Times the enclosed block as a span of the current run, if any"""
+    trace_run = _current_run.get()
+    if trace_run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace_run.add(name, category, start, time.perf_counter(), args)
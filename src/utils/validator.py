@@ -0,0 +1,230 @@
+import re
+
+from src.states import AgentState
+
+from .ranking import conversion_rates
+
+_NUMBER = r"-?\d[\d,]*(?:\.\d+)?"
+# The rest of the line after the label holds the stated amount
+TOTAL_RE = re.compile(r"total(?: estimated)? cost(?P<rest>[^\n]{0,80})", re.IGNORECASE)
+REMAINING_RE = re.compile(r"remaining budget(?P<rest>[^\n]{0,80})", re.IGNORECASE)
+# "$1,234.56", "-€120", "1234 USD", "980€"
+CURRENCY_AMOUNT_RE = re.compile(
+    rf"(?P<sign>-)?\s?[$€£¥₹]\s?(?P<before>{_NUMBER})|(?P<after>{_NUMBER})\s?(?:[A-Z]{{3}}\b|[$€£¥₹])"
+)
+# Without a currency, the number right after the colon: "(for 2 adults): 1234"
+COLON_AMOUNT_RE = re.compile(rf"[:=][^0-9\n-]*?({_NUMBER})")
+
+
+def _amount(token: str) -> float | None:
+    try:
+        return float(token.replace(",", ""))
+    except ValueError:
+        return None
+
+
+def _stated_amount(label: re.Pattern, itinerary: str) -> float | None:
+    """The amount written after a label, preferring one with a currency"""
+    match = label.search(itinerary)
+    if not match:
+        return None
+    rest = match.group("rest")
+    tagged = CURRENCY_AMOUNT_RE.search(rest)
+    if tagged:
+        if tagged.group("before") is not None:
+            value = _amount(tagged.group("before"))
+            return -value if value is not None and tagged.group("sign") else value
+        return _amount(tagged.group("after"))
+    untagged = COLON_AMOUNT_RE.search(rest)
+    return _amount(untagged.group(1)) if untagged else None
+
+
+def _tolerance(amount: float) -> float:
+    """Rounding slack when comparing amounts written by the compiler"""
+    return max(1.0, abs(amount) * 0.01)
+
+
+def trip_costs(state: AgentState) -> tuple[float, float, float]:
+    """Cost of the selected flight, hotel offer and activities in the budget currency"""
+    target = (state.plan.budget_currency or "USD").upper()
+
+    flight = None
+    if (
+        state.flight_data
+        and state.selected_flight_index is not None
+        and state.selected_flight_index < len(state.flight_data)
+    ):
+        flight = state.flight_data[state.selected_flight_index]
+
+    offer = None
+    if (
+        state.plan.need_hotel
+        and state.hotel_data
+        and state.selected_hotel_index is not None
+    ):
+        hotels = state.hotel_data.hotels
+        if (
+            state.selected_hotel_index < len(hotels)
+            and hotels[state.selected_hotel_index].offers
+        ):
+            offer = hotels[state.selected_hotel_index].offers[0]
+
+    activities = state.activity_data or []
+    if state.selected_activity_indices is not None:
+        activities = [
+            activities[i]
+            for i in state.selected_activity_indices
+            if i < len(activities)
+        ]
+
+    currencies = {a.currency for a in activities}
+    if flight:
+        currencies.add(flight.currency)
+    if offer:
+        currencies.add(offer.price.currency)
+    rates = conversion_rates(currencies, target)
+
+    flight_cost = (
+        float(flight.price) * rates[flight.currency.upper()] if flight else 0.0
+    )
+    hotel_cost = (
+        float(offer.price.total) * rates[offer.price.currency.upper()] if offer else 0.0
+    )
+    activity_cost = sum(a.amount * rates[a.currency.upper()] for a in activities)
+    return flight_cost, hotel_cost, activity_cost
+
+
+def check_over_budget(state: AgentState) -> list[str]:
+    plan = state.plan
+    currency = plan.budget_currency or "USD"
+    total = sum(trip_costs(state))
+    if plan.budget is None or total <= plan.budget + 0.01:
+        return []
+    return [
+        (
+            f"The trip costs {total:.2f} {currency}, which exceeds the budget of "
+            f"{plan.budget:.2f} {currency} by {total - plan.budget:.2f} {currency}."
+        )
+    ]
+
+
+def check_budget(state: AgentState, itinerary: str) -> list[str]:
+    """The totals the itinerary states against the selected items"""
+    plan = state.plan
+    currency = plan.budget_currency or "USD"
+    total = sum(trip_costs(state))
+    issues = []
+
+    stated_total = _stated_amount(TOTAL_RE, itinerary)
+    if stated_total is not None and abs(stated_total - total) > _tolerance(total):
+        issues.append(
+            f"The itinerary states a total cost of {stated_total:.2f} {currency} "
+            f"but the selected items add up to {total:.2f} {currency}."
+        )
+
+    if plan.budget is not None:
+        remaining = plan.budget - total
+        stated_remaining = _stated_amount(REMAINING_RE, itinerary)
+        if stated_remaining is not None and abs(
+            stated_remaining - remaining
+        ) > _tolerance(plan.budget):
+            issues.append(
+                f"The itinerary states a remaining budget of {stated_remaining:.2f} {currency} "
+                f"but it should be {remaining:.2f} {currency}."
+            )
+    return issues
+
+
+def check_flight_dates(state: AgentState) -> list[str]:
+    plan = state.plan
+    if not state.flight_data or state.selected_flight_index is None:
+        return []
+    if state.selected_flight_index >= len(state.flight_data):
+        return ["The selected flight does not exist in the search results."]
+
+    itineraries = state.flight_data[state.selected_flight_index].itineraries
+    issues = []
+    expected = [("outbound", plan.departure_date), ("return", plan.arrival_date)]
+    for (leg, date), itinerary in zip(expected, itineraries):
+        if not itinerary.segments or not date:
+            continue
+        departs = itinerary.segments[0].departure_time[:10]
+        if departs != date:
+            issues.append(f"The {leg} flight departs on {departs} instead of {date}.")
+    return issues
+
+
+def check_hotel_dates(state: AgentState) -> list[str]:
+    plan = state.plan
+    if (
+        not plan.need_hotel
+        or not state.hotel_data
+        or state.selected_hotel_index is None
+    ):
+        return []
+    hotels = state.hotel_data.hotels
+    if state.selected_hotel_index >= len(hotels):
+        return ["The selected hotel does not exist in the search results."]
+    hotel = hotels[state.selected_hotel_index]
+    if not hotel.offers:
+        return []
+
+    offer = hotel.offers[0]
+    # An overnight flight lands the day after it leaves
+    check_in_dates = {plan.departure_date}
+    if (
+        state.flight_data
+        and state.selected_flight_index is not None
+        and state.selected_flight_index < len(state.flight_data)
+    ):
+        outbound = state.flight_data[state.selected_flight_index].itineraries
+        if outbound and outbound[0].segments:
+            check_in_dates.add(outbound[0].segments[-1].arrival_time[:10])
+
+    issues = []
+    if offer.check_in not in check_in_dates:
+        issues.append(
+            f"{hotel.name} checks in on {offer.check_in} instead of {plan.departure_date}."
+        )
+    if plan.arrival_date and offer.check_out != plan.arrival_date:
+        issues.append(
+            f"{hotel.name} checks out on {offer.check_out} instead of {plan.arrival_date}."
+        )
+    return issues
+
+
+def check_destination(state: AgentState, itinerary: str) -> list[str]:
+    names = {
+        name.split(",")[0].strip().lower()
+        for name in (state.plan.destination, state.destination_name)
+        if name
+    }
+    if not names or any(name in itinerary.lower() for name in names):
+        return []
+    shown = state.destination_name or state.plan.destination
+    return [f"The itinerary never mentions the destination ({shown})."]
+
+
+def validate_itinerary(state: AgentState) -> list[str]:
+    """
+    Checks what the compiler wrote against the state: the stated total and
+    remaining budget in the budget currency, and that the destination is
+    mentioned.
+
+    Returns:
+        A precise description of each problem the compiler can fix, empty
+        if none.
+    """
+    itinerary = state.final_itinerary or ""
+    return check_budget(state, itinerary) + check_destination(state, itinerary)
+
+
+def data_warnings(state: AgentState) -> list[str]:
+    """
+    Problems of the selected flight, hotel and activities themselves: dates
+    that differ from the plan and a total over the budget. They come from
+    the search results, so rewriting the itinerary cannot fix them.
+    """
+    return (
+        check_over_budget(state) + check_flight_dates(state) + check_hotel_dates(state)
+    )
@@ -0,0 +1,196 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import argparse
+import csv
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Any
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.llm import LLMWrapper
+from src.nodes.passenger import passenger_messages
+from src.nodes.planner import plan_messages
+from src.states import AgentState
+
+
+def legacy_plan_messages(request: str) -> list[Any]:
+    """The planner prompt before the static prefix split: date and request inside the instructions"""
+    today_str = datetime.now().strftime("%Y-%m-%d")
+    PROMPT = f"""
+Your task: **Extract structured travel details from the user request and return ONLY valid JSON.**
+Do not add explanations, comments, or text outside the JSON.
+Today is {today_str}.
+
+----------------------------
+LOGIC RULES
+----------------------------
+- If the user says "tomorrow", interpret it relative to today ({today_str}).
+- If the user says "for a week", set arrival_date to departure_date + 7 days.
+- If the origin is not specified, leave it empty. It will be detected automatically.
+- **CURRENCY HANDLING**:
+    - If the user provides a budget with a currency symbol (e.g., '$', '€', '£'), assume the most common currency for that symbol ('USD', 'EUR', 'GBP').
+    - The `budget` field should be the numeric value.
+    - The `budget_currency` field MUST be the ISO code (e.g., "USD", "EUR").
+    - If no symbol is given, assume USD. For "1000 dollars", assume USD.
+- Confidence is "low" if any critical field is unclear or missing: destination, departure_date
+- Optional fields may be left empty or false: hotel, activities.
+- ALWAYS output valid JSON. No extra text.
+
+----------------------------
+CURRENT KNOWN INFORMATION
+----------------------------
+None
+
+----------------------------
+USER REQUEST
+----------------------------
+{request}
+
+----------------------------
+YOUR RESPONSE (STRICT JSON)
+----------------------------
+{{
+  "destination": "City, Country",
+  "origin": "City, Country",
+  "departure_date": "YYYY-MM-DD",
+  "arrival_date": "YYYY-MM-DD",
+  "budget": 10000,
+  "budget_currency": "USD",
+  "interests": "string",
+  "need_hotel": true/false,
+  "need_activities": true/false,
+  "confidence": "high/medium/low"
+}}
+
+Return ONLY the JSON object.
+"""
+    return [
+        SystemMessage(content="You are a travel planning extraction engine."),
+        {"role": "user", "content": PROMPT},
+    ]
+
+
+def legacy_passenger_messages(request: str) -> list[Any]:
+    """The passenger prompt before the split: the request above the response schema"""
+    PROMPT = f"""Your task: **Extract passenger information**.
+
+----------------------------
+LOGIC RULES
+----------------------------
+- If the user says "I am alone" or "just me", it means 1 adult.
+- If the user does not specify the number of passengers, and there is no information about it, you can assume 1 adult.
+- Confidence is "low" only if the user mentions multiple people but doesn't specify the numbers (e.g., "I'm traveling with my family").
+
+----------------------------
+USER MESSAGE
+----------------------------
+{request}
+
+----------------------------
+YOUR RESPONSE (STRICT JSON)
+----------------------------
+Return JSON:
+{{
+    "adults": null or number,
+    "children": null or number,
+    "infants": null or number,
+    "travel_class": null or "ECONOMY"/"BUSINESS"/"FIRST",
+    "confidence": "high/medium/low"
+}}"""
+    return [
+        SystemMessage(content="You are a passenger extractor expert"),
+        {"role": "user", "content": PROMPT},
+    ]
+
+
+def prefix_layout(request: str) -> list[list[Any]]:
+    state = AgentState(messages=[HumanMessage(content=request)])
+    return [plan_messages(state), passenger_messages(state)]
+
+
+def interleaved_layout(request: str) -> list[list[Any]]:
+    return [legacy_plan_messages(request), legacy_passenger_messages(request)]
+
+
+LAYOUTS = {
+    "interleaved (before)": interleaved_layout,
+    "static prefix (after)": prefix_layout,
+}
+
+
+def timed_call(llm: LLMWrapper, messages: list[Any]) -> dict[str, float]:
+    """Time to first token, and Ollama's own prompt evaluation figures"""
+    start = time.perf_counter()
+    first_token = None
+    metadata: dict[str, Any] = {}
+    for chunk in llm.stream(messages, use_cache=False):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+        metadata = chunk.response_metadata or metadata
+    return {
+        "ttft_ms": (first_token or time.perf_counter() - start) * 1000,
+        "prompt_tokens": metadata.get("prompt_eval_count") or 0,
+        "prompt_eval_ms": (metadata.get("prompt_eval_duration") or 0) / 1e6,
+    }
+
+
+def run_layout(llm: LLMWrapper, layout, requests: list[str]) -> list[dict[str, float]]:
+    # Loads the model and primes the cache with this layout's prefix
+    for messages in layout(requests[-1]):
+        timed_call(llm, messages)
+    results = []
+    for request in requests:
+        # Planner then passenger, as the graph sends them
+        for messages in layout(request):
+            results.append(timed_call(llm, messages))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time to first token of the extraction prompts, before and after the static prefix layout"
+    )
+    parser.add_argument("--model", default=os.environ.get("MODEL_NAME", "llama3.1:8b"))
+    parser.add_argument("--prompts", default=str(Path(__file__).parent / "prompts.csv"))
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--keep-alive", default="10m")
+    parser.add_argument("--num-ctx", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.prompts, newline="", encoding="utf-8") as f:
+        requests = [row[0] for row in csv.reader(f) if row][: args.requests]
+
+    llm = LLMWrapper(
+        provider="ollama",
+        model=args.model,
+        temperature=0,
+        keep_alive=args.keep_alive,
+        num_ctx=args.num_ctx,
+    ).with_config(tags=["planner_agent"])
+
+    print(
+        f"📊 {len(requests)} requests x 2 prompts on {args.model} (keep_alive={args.keep_alive})"
+    )
+    for name, layout in LAYOUTS.items():
+        try:
+            results = run_layout(llm, layout, requests)
+        except Exception as e:
+            print(f"❌ Could not reach the Ollama server: {e}")
+            sys.exit(1)
+        ttft = sorted(r["ttft_ms"] for r in results)
+        prompt_tokens = sum(r["prompt_tokens"] for r in results)
+        prompt_eval_ms = sum(r["prompt_eval_ms"] for r in results)
+        print(
+            f"   {name}: TTFT median {statistics.median(ttft):.0f} ms, "
+            f"p95 {ttft[max(int(len(ttft) * 0.95) - 1, 0)]:.0f} ms, "
+            f"{prompt_tokens} prompt tokens evaluated in {prompt_eval_ms:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import argparse
+import csv
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from src.states import (
+    FlightItinerary,
+    FlightSearchResultState,
+    FlightSegment,
+    HotelDetails,
+    HotelLocation,
+    OfferDetails,
+    PriceDetails,
+    RoomDetails,
+)
+from src.utils.ranking import rank_flights, rank_hotel_offers
+
+
+def make_offers(n: int, seed: int = 0) -> list[FlightSearchResultState]:
+    """Synthetic round-trip offers with 1-3 segments per direction"""
+    rng = random.Random(seed)
+    offers = []
+    for _ in range(n):
+        itineraries = []
+        for day in ("2026-03-01", "2026-03-08"):
+            t = datetime.fromisoformat(f"{day}T00:00:00") + timedelta(
+                hours=rng.randint(0, 23)
+            )
+            segments = []
+            for _ in range(rng.randint(1, 3)):
+                hours = rng.randint(1, 9)
+                segments.append(
+                    FlightSegment(
+                        departure_airport="AAA",
+                        arrival_airport="BBB",
+                        departure_time=t.isoformat(),
+                        arrival_time=(t + timedelta(hours=hours)).isoformat(),
+                        duration=f"PT{hours}H{rng.choice([0, 15, 30, 45])}M",
+                        airline=rng.choice(["AF", "BA", "LH", "KL"]),
+                        stops=0,
+                    )
+                )
+                t += timedelta(hours=hours + rng.randint(1, 12))
+            itineraries.append(FlightItinerary(segments=segments))
+        offers.append(
+            FlightSearchResultState(
+                price=f"{rng.uniform(200, 2500):.2f}",
+                currency=rng.choice(["EUR", "USD", "GBP"]),
+                itineraries=itineraries,
+            )
+        )
+    return offers
+
+
+def make_hotels(n: int, seed: int = 0) -> list[HotelDetails]:
+    """Synthetic hotels around Paris with 1-3 offers each"""
+    rng = random.Random(seed)
+    hotels = []
+    for h in range(n):
+        offers = [
+            OfferDetails(
+                offer_id=f"O{h}-{o}",
+                check_in="2026-03-01",
+                check_out="2026-03-08",
+                board_type=rng.choice(["ROOM_ONLY", "BREAKFAST", "HALF_BOARD"]),
+                guests=2,
+                price=PriceDetails(
+                    total=f"{rng.uniform(300, 3000):.2f}",
+                    currency=rng.choice(["EUR", "USD"]),
+                ),
+                room=RoomDetails(room_type="STANDARD", description="Room"),
+                cancellation_policy=rng.choice(
+                    [None, "NON_REFUNDABLE", "REFUNDABLE_UP_TO_DEADLINE"]
+                ),
+            )
+            for o in range(rng.randint(1, 3))
+        ]
+        hotels.append(
+            HotelDetails(
+                hotel_id=f"H{h}",
+                name=f"Hotel {h}",
+                location=HotelLocation(
+                    city_code="PAR",
+                    latitude=48.85 + rng.uniform(-0.1, 0.1),
+                    longitude=2.35 + rng.uniform(-0.1, 0.1),
+                ),
+                offers=offers,
+            )
+        )
+    return hotels
+
+
+def timed(func, repeats: int) -> list[float]:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return sorted(timings)
+
+
+def llm_selection_latency_ms(costs_file: str, node: str) -> list[float]:
+    """Latency of the former LLM selection calls of a node recorded in costs.csv"""
+    if not Path(costs_file).exists():
+        return []
+    with open(costs_file, newline="", encoding="utf-8") as f:
+        return [
+            float(row["latency_ms"])
+            for row in csv.DictReader(f)
+            if row.get("notes") == node and row.get("latency_ms")
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark flight and hotel selection latency"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[3, 10, 50, 250])
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--costs-file", default="costs.csv")
+    args = parser.parse_args()
+
+    rates = {"EUR": 1.08, "USD": 1.0, "GBP": 1.27}
+    print("📊 Vectorized flight scorer")
+    for size in args.sizes:
+        offers = make_offers(size)
+        timings = timed(
+            lambda offers=offers: rank_flights(
+                offers, budget=2000, budget_currency="USD", rates=rates
+            ),
+            args.repeats,
+        )
+        print(
+            f"   {size:>4} offers: median {statistics.median(timings):9.1f} µs, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:9.1f} µs"
+        )
+
+    print("📊 Vectorized hotel ranker")
+    for size in args.sizes:
+        hotels = make_hotels(size)
+        timings = timed(
+            lambda hotels=hotels: rank_hotel_offers(
+                hotels, 7, 2500, "USD", 48.8566, 2.3522, rates=rates
+            ),
+            args.repeats,
+        )
+        print(
+            f"   {size:>4} hotels: median {statistics.median(timings):9.1f} µs, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:9.1f} µs"
+        )
+
+    for node in ("flight_agent", "hotel_agent"):
+        latencies = llm_selection_latency_ms(args.costs_file, node)
+        if latencies:
+            print(
+                f"🤖 LLM {node} calls ({len(latencies)} in {args.costs_file}): "
+                f"median {statistics.median(latencies):.0f} ms"
+            )
+        else:
+            print(
+                f"🤖 No recorded {node} LLM calls in {args.costs_file} to compare with"
+            )
+
+
+if __name__ == "__main__":
+    main()
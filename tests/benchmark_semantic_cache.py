@@ -0,0 +1,216 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import argparse
+import csv
+import re
+import statistics
+import time
+from collections.abc import Callable
+from datetime import date
+
+from src.utils.plan_parser import _CITY_RE, GAZETTEER
+from src.utils.semantic_cache import SemanticPlanCache
+
+# Rewordings that keep every fact of a request
+PARAPHRASES = [
+    (r"\bWe are\b", "We're"),
+    (r"\bI will be\b", "I'll be"),
+    (r"\bplanning\b", "organizing"),
+    (r"\bis planning\b", "plans"),
+    (r"\bOur total budget is\b", "The overall budget is"),
+    (r"\bbudget is\b", "budget will be"),
+    (r"\bPlease suggest\b", "Could you suggest"),
+    (r"\bneed help finding\b", "would like help finding"),
+    (r"\bwould like\b", "want"),
+    (r"\bflying from\b", "departing from"),
+    (r"\s+", "  "),
+    (r"\.$", ""),
+]
+
+
+def paraphrase(text: str, variant: int) -> str:
+    """Applies every other rewording, offset by `variant`, sometimes with a sign-off"""
+    for rule, (pattern, replacement) in enumerate(PARAPHRASES):
+        if (rule + variant) % 2 == 0:
+            text = re.sub(pattern, replacement, text)
+    return text if variant % 3 else text.rstrip() + " Thanks!"
+
+
+def change_budget(text: str) -> str:
+    return re.sub(
+        r"\$(\d[\d,]*)",
+        lambda m: f"${int(m.group(1).replace(',', '')) + 500}",
+        text,
+        count=1,
+    )
+
+
+def change_day(text: str) -> str:
+    return re.sub(
+        r"\b([A-Z][a-z]+ )(\d{1,2})\b",
+        lambda m: f"{m.group(1)}{int(m.group(2)) % 27 + 1}",
+        text,
+        count=1,
+    )
+
+
+def change_city(text: str) -> str:
+    for city, other in (
+        ("Tokyo", "Osaka"),
+        ("Paris", "Lyon"),
+        ("Orlando", "Miami"),
+        ("London", "Dublin"),
+    ):
+        if city in text:
+            return text.replace(city, other)
+    return re.sub(r"\bto ([A-Z][a-z]+)", r"to Reykjavik", text, count=1)
+
+
+# Changes that alter the extraction, so a hit on the original is a false hit
+NEAR_MISSES: list[tuple[str, Callable[[str], str]]] = [
+    ("budget", change_budget),
+    ("date", change_day),
+    ("city", change_city),
+]
+
+
+# Cities missing from the planner's gazetteer
+UNKNOWN_CITIES = [
+    c for c in ("bordeaux", "toulouse", "carcassonne", "nantes") if c not in GAZETTEER
+]
+
+
+def unknown_city(text: str, city: str) -> str:
+    """Lowercases the request and swaps its first known city for `city`"""
+    return _CITY_RE.sub(city, text.lower(), count=1)
+
+
+def load_prompts(path: str) -> list[str]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [row[0] for row in csv.reader(f) if row]
+
+
+def evaluate(prompts: list[str], threshold: float, variants: int) -> dict:
+    today = date.today()
+    cache = SemanticPlanCache(capacity=len(prompts), threshold=threshold)
+    for index, prompt in enumerate(prompts):
+        cache.store(prompt, {"id": index}, today)
+
+    def owner(text: str):
+        plan = cache.lookup(text, today)
+        return None if plan is None else plan["id"]
+
+    true_hits = false_hits = paraphrases = 0
+    for index, prompt in enumerate(prompts):
+        for variant in range(variants):
+            text = paraphrase(prompt, variant)
+            if text == prompt:
+                continue
+            paraphrases += 1
+            found = owner(text)
+            true_hits += found == index
+            false_hits += found is not None and found != index
+
+    near_misses = blocked = 0
+    for index, prompt in enumerate(prompts):
+        for _, perturb in NEAR_MISSES:
+            text = perturb(prompt)
+            if text == prompt:
+                continue
+            near_misses += 1
+            false_hits += owner(text) is not None
+            # Similar enough to hit on the embedding alone
+            blocked += cache.search(text, today)[1] >= threshold
+
+    # Lowercase requests naming cities the gazetteer does not know: neither
+    # the city list nor capitalisation tells them apart
+    lowercase = SemanticPlanCache(capacity=len(prompts) + 1, threshold=threshold)
+    pairs = [
+        (
+            "i want to go to bordeaux from lyon in may with a budget of 2000",
+            "bordeaux",
+            "toulouse",
+        )
+    ]
+    pairs += [
+        (unknown_city(p, UNKNOWN_CITIES[0]), UNKNOWN_CITIES[0], UNKNOWN_CITIES[1])
+        for p in prompts
+    ]
+    pairs = [(text, stored, other) for text, stored, other in pairs if stored in text]
+    for index, (text, _, _) in enumerate(pairs):
+        lowercase.store(text, {"id": index}, today)
+    unknown_city_misses = len(pairs)
+    unknown_city_false_hits = sum(
+        lowercase.lookup(text.replace(stored, other), today) is not None
+        for text, stored, other in pairs
+    )
+    near_misses += unknown_city_misses
+    false_hits += unknown_city_false_hits
+
+    # Leave-one-out: distinct requests must never be answered from each other
+    for index, prompt in enumerate(prompts):
+        others = SemanticPlanCache(capacity=len(prompts), threshold=threshold)
+        for other_index, other in enumerate(prompts):
+            if other_index != index:
+                others.store(other, {"id": other_index}, today)
+        near_misses += 1
+        false_hits += others.lookup(prompt, today) is not None
+
+    return {
+        "paraphrases": paraphrases,
+        "true_hits": true_hits,
+        "near_misses": near_misses,
+        "false_hits": false_hits,
+        "blocked": blocked,
+        "unknown_city_misses": unknown_city_misses,
+        "unknown_city_false_hits": unknown_city_false_hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the planner's semantic cache"
+    )
+    parser.add_argument("--prompts", default=str(Path(__file__).parent / "prompts.csv"))
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.85, 0.9, 0.95]
+    )
+    parser.add_argument("--variants", type=int, default=4)
+    parser.add_argument(
+        "--entries", type=int, default=512, help="Cache size for the latency run"
+    )
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts)
+    print(f"📊 Hit rates on {len(prompts)} prompts from {args.prompts}")
+    for threshold in args.thresholds:
+        r = evaluate(prompts, threshold, args.variants)
+        print(
+            f"   threshold {threshold:.2f}: paraphrase hits {r['true_hits']}/{r['paraphrases']} "
+            f"({r['true_hits'] / max(r['paraphrases'], 1):.0%}), "
+            f"false hits {r['false_hits']}/{r['paraphrases'] + r['near_misses']} "
+            f"({r['blocked']} near misses stopped by the facts check, "
+            f"{r['unknown_city_false_hits']}/{r['unknown_city_misses']} on lowercase unknown cities)"
+        )
+
+    cache = SemanticPlanCache(capacity=args.entries)
+    today = date.today()
+    for index in range(args.entries):
+        cache.store(f"{prompts[index % len(prompts)]} #{index}", {"id": index}, today)
+    timings = []
+    for index in range(args.repeats):
+        start = time.perf_counter()
+        cache.lookup(paraphrase(prompts[index % len(prompts)], index), today)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    print(
+        f"⏱️  Lookup with {args.entries} entries: median {statistics.median(timings):.1f} µs, "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:.1f} µs"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import argparse
+import json
+import os
+import statistics
+import subprocess
+
+ROOT = Path(__file__).parent.parent
+
+# Runs in a fresh interpreter, as a worker cold start or the eval subprocess would
+PROBE = """
+import json, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(api.app) as client:
+    response = client.get({path!r})
+done = time.perf_counter()
+print("STARTUP " + json.dumps({{
+    "import_s": imported - start,
+    "first_request_s": done - start,
+    "status": response.status_code,
+}}))
+"""
+
+
+def cold_start(python: str, path: str) -> dict[str, float]:
+    result = subprocess.run(
+        [python, "-c", PROBE.format(path=path)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP ") :])
+    raise RuntimeError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+
+
+def heaviest_imports(python: str, top: int) -> list[tuple[int, str]]:
+    """Modules imported by api.py, by cumulative import time from -X importtime"""
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", "import api"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    totals: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # One level of indent below api: the modules api.py imports itself
+        if name.startswith("   ") and not name.startswith("     "):
+            try:
+                totals[name.strip()] = int(cumulative)
+            except ValueError:
+                continue
+    return sorted(((us, name) for name, us in totals.items()), reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cold start of the API process: import time and time to the first request"
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/checkpoint/history/startup-probe")
+    parser.add_argument(
+        "--max-import-s",
+        type=float,
+        default=float(os.getenv("STARTUP_MAX_IMPORT_S", "2.0")),
+    )
+    parser.add_argument(
+        "--max-first-request-s",
+        type=float,
+        default=float(os.getenv("STARTUP_MAX_FIRST_REQUEST_S", "2.5")),
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Heaviest imports listed on a regression"
+    )
+    args = parser.parse_args()
+
+    python = sys.executable
+    print(f"🚀 {args.runs} cold starts of api.py, first request GET {args.path}")
+    runs = []
+    for i in range(args.runs):
+        run = cold_start(python, args.path)
+        runs.append(run)
+        print(
+            f"   run {i + 1}: import {run['import_s']:.2f}s, "
+            f"first request {run['first_request_s']:.2f}s (HTTP {run['status']})"
+        )
+
+    import_s = statistics.median(r["import_s"] for r in runs)
+    first_request_s = statistics.median(r["first_request_s"] for r in runs)
+    print(f"📊 median import {import_s:.2f}s (budget {args.max_import_s:.2f}s)")
+    print(
+        f"📊 median first request {first_request_s:.2f}s (budget {args.max_first_request_s:.2f}s)"
+    )
+
+    if import_s <= args.max_import_s and first_request_s <= args.max_first_request_s:
+        print("✅ Startup within budget")
+        return
+
+    print("❌ Startup over budget, heaviest imports of api:")
+    for us, name in heaviest_imports(python, args.top):
+        print(f"   {us / 1e6:.3f}s  {name}")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
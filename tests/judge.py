@@ -1,27 +1,35 @@
-import re
-import json
-from langchain_core.messages import HumanMessage
 import uuid
+
+from langchain_core.messages import HumanMessage
+from pydantic import BaseModel, Field
+
+from src.llm import LLMLimiter, LLMResponseCache, LLMWrapper, RemoteLimiter
 from src.utils.token_usage import TokenUsageTracker
-from langchain_ollama import ChatOllama
-from langgraph.prebuilt import create_react_agent
 
 
-def create_judge_agent():
+def create_judge_agent(
+    cache: LLMResponseCache | None = None,
+    structured_output: bool = True,
+    limiter: LLMLimiter | RemoteLimiter | None = None,
+):
     """Create a judge agent for evaluating travel itineraries"""
 
     # Initialize LLM
     # model_name = "tensortemplar/prometheus2:7b-fp16"
     model_name = "llama3.1:8b"
     model_provider = "ollama"
-    llm = ChatOllama(model=model_name, temperature=0)
-
-    # Define available tools
-    tools = []
-
-    agent = create_react_agent(llm, tools)
+    # The judge has no tools, so a plain LLM call replaces the former ReAct agent
+    llm = LLMWrapper(
+        provider=model_provider,
+        model=model_name,
+        temperature=0,
+        tags=["judge"],
+        cache=cache,
+        structured_output=structured_output,
+        limiter=limiter,
+    )
 
-    return agent, model_name, model_provider
+    return llm, model_name, model_provider
 
 
 JUDGE_PROMPT_TEMPLATE = """
@@ -66,31 +74,32 @@ JUDGE_PROMPT_TEMPLATE = """
     """
 
 
-def parse_judge_output(judge_output):
+class JudgeVerdict(BaseModel):
+    """Scores the judge must return"""
+
+    analysis: str = Field(description="Short analysis of strengths and weaknesses")
+    relevance_score: int = Field(
+        ge=0, le=10, description="Relevance score from 0 to 10"
+    )
+    helpfulness_score: int = Field(
+        ge=0, le=10, description="Helpfulness score from 0 to 10"
+    )
+    logic_score: int = Field(ge=0, le=10, description="Logic score from 0 to 10")
+
+
+def parse_judge_output(verdict: JudgeVerdict | None):
     """
-    Parses the JSON output from the judge LLM.
+    Turns the judge verdict into scores, all 0 if the judge's answer could not be read.
     """
     scores = {"relevance": 0, "helpfulness": 0, "logic": 0, "analysis": ""}
-
-    try:
-        # Assuming the LLM wraps the JSON in markdown code block
-        json_str_match = re.search(r"```json\n(.*)\n```", judge_output, re.DOTALL)
-        if json_str_match:
-            json_output = json.loads(json_str_match.group(1))
-        else:
-            # If no markdown block, try to parse directly.
-            # Some LLMs might not wrap in markdown when asked for pure JSON.
-            json_output = json.loads(judge_output)
-
-        scores["analysis"] = json_output.get("analysis", "").replace(",", ";").replace("\n", " ")
-        scores["relevance"] = int(json_output.get("relevance_score", 0))
-        scores["helpfulness"] = int(json_output.get("helpfulness_score", 0))
-        scores["logic"] = int(json_output.get("logic_score", 0))
-    except json.JSONDecodeError as e:
-        print(f"Warning: Could not decode JSON from judge output. Error: {e}. Output: {judge_output}")
-        # If JSON decoding fails, we fall back to default 0 scores and empty analysis.
-        # The previous regex-based parsing is no longer suitable with the new prompt.
-
+    if verdict is None:
+        print("Warning: Could not read the judge output, scoring 0.")
+        return scores
+
+    scores["analysis"] = verdict.analysis.replace(",", ";").replace("\n", " ")
+    scores["relevance"] = verdict.relevance_score
+    scores["helpfulness"] = verdict.helpfulness_score
+    scores["logic"] = verdict.logic_score
     return scores
 
 
@@ -119,12 +128,10 @@ def run_single_evaluation(
 
     # Generate Judge Response
     # Assuming 'judge_llm' is your Llama 3.1 8b interface
-    response = judge_llm.invoke({"messages": [HumanMessage(content=prompt)]}, config)
-    judge_raw_output = response["messages"][-1].content
-
-    # Parse
-    results = parse_judge_output(judge_raw_output)
-    return results
+    verdict = judge_llm.invoke_structured(
+        [HumanMessage(content=prompt)], JudgeVerdict, config=config
+    )
+    return parse_judge_output(verdict)
 
 
 def run_batch_evaluation(judged_llm, judged_llm_name, judge_llm):
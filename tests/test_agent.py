@@ -1,18 +1,26 @@
 import sys
 from pathlib import Path
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
+import argparse
+import csv
 import os
 import uuid
-import csv
-import argparse
+
+from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
+
+from src.graph import GraphRegistry
+from src.llm import (
+    LLMLimiter,
+    LLMResponseCache,
+    LLMWrapper,
+    ModelRouter,
+    RemoteLimiter,
+    parse_failure_rates,
+)
 from src.utils import TokenUsageTracker
-from src.states import AgentState
-from src.graph import create_travel_agent_graph
 from tests.judge import create_judge_agent, run_single_evaluation
-from src.llm import LLMWrapper
-from dotenv import load_dotenv
-
 
 
 def run_batch_evaluation_for_travel_agent(
@@ -65,6 +73,7 @@ def run_batch_evaluation_for_travel_agent(
                 config = {
                     "configurable": {"thread_id": f"session_{scenario_id}"},
                     "callbacks": [cost_tracker],
+                    "metadata": {"traffic": "batch"},
                 }
 
                 state = {
@@ -94,13 +103,13 @@ def run_batch_evaluation_for_travel_agent(
                     scenario_id,
                 )
                 res = {
-                        "id": scenario_id,
-                        "conditions": conditions,
-                        "use_reasoning": 1 if use_reasoning else 0,
-                        "use_planner": 1 if use_planner else 0,
-                        "use_tools": 1 if use_tools else 0,
-                        **eval_result,
-                    }
+                    "id": scenario_id,
+                    "conditions": conditions,
+                    "use_reasoning": 1 if use_reasoning else 0,
+                    "use_planner": 1 if use_planner else 0,
+                    "use_tools": 1 if use_tools else 0,
+                    **eval_result,
+                }
                 writer.writerow(res)
                 results.append(res)
                 print(f"    - Relevance: {eval_result['relevance']}/10")
@@ -110,8 +119,6 @@ def run_batch_evaluation_for_travel_agent(
     return results
 
 
-
-
 def main():
     parser = argparse.ArgumentParser(
         description="Run batch evaluation for the travel agent."
@@ -125,9 +132,23 @@ def main():
     parser.add_argument(
         "--use-reasoning", action="store_true", help="Enable the reasoning/review step."
     )
-    parser.add_argument("--model-provider", type=str, default=os.environ.get("MODEL_PROVIDER", "ollama"))
-    parser.add_argument("--model-name", type=str, default=os.environ.get("MODEL_NAME", "llama3.1:8b"))
+    parser.add_argument(
+        "--model-provider", type=str, default=os.environ.get("MODEL_PROVIDER", "ollama")
+    )
+    parser.add_argument(
+        "--model-name", type=str, default=os.environ.get("MODEL_NAME", "llama3.1:8b")
+    )
     parser.add_argument("--base-url", type=str, default=os.environ.get("BASE_URL"))
+    parser.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Call the LLMs even for prompts answered in a previous run.",
+    )
+    parser.add_argument(
+        "--prompted-json",
+        action="store_true",
+        help="Ask for JSON in the prompt only, without schema-constrained decoding.",
+    )
 
     args = parser.parse_args()
 
@@ -138,19 +159,48 @@ def main():
 
     # --- Create Agents ---
     # Create the agent to be judged
-    
+
     load_dotenv()
 
+    # Repeated runs replay identical temperature-0 calls from the cache
+    llm_cache = (
+        None
+        if args.no_llm_cache
+        else LLMResponseCache(db_path="checkpoints/llm_cache.db")
+    )
+
+    # Evaluation traffic yields to interactive sessions on the model server:
+    # launched by the API, it queues in the API's limiter
+    llm_limiter = (
+        RemoteLimiter(
+            os.environ["LLM_LIMITER_URL"],
+            default_traffic=os.getenv("LLM_TRAFFIC", "batch"),
+        )
+        if os.getenv("LLM_LIMITER_URL")
+        else LLMLimiter(
+            max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+            default_traffic=os.getenv("LLM_TRAFFIC", "batch"),
+        )
+    )
+
     llm = LLMWrapper(
         provider=args.model_provider,
         model=args.model_name,
         temperature=0,
         base_url=args.base_url,
         api_key=os.getenv("HF_TOKEN"),
+        cache=llm_cache,
+        structured_output=not args.prompted_json,
+        # Same per-node routing as the API, so costs.csv reflects it
+        router=(
+            ModelRouter.from_json(os.environ["LLM_ROUTES"])
+            if os.getenv("LLM_ROUTES")
+            else None
+        ),
+        limiter=llm_limiter,
     )
 
-    judged_llm = create_travel_agent_graph(
-        llm=llm,
+    judged_llm = GraphRegistry(llm=llm).get(
         use_planner=args.use_planner,
         use_tools=args.use_tools,
         force_reasoning=args.use_reasoning,
@@ -159,7 +209,9 @@ def main():
     print(f"    - Judged LLM: {judged_llm_name}")
 
     # Create the judge agent
-    judge_llm, judge_llm_name, judge_model_provider = create_judge_agent()
+    judge_llm, judge_llm_name, judge_model_provider = create_judge_agent(
+        llm_cache, structured_output=not args.prompted_json, limiter=llm_limiter
+    )
     print(f"    - Judge LLM: {judge_llm_name}")
 
     # --- Run Evaluation ---
@@ -197,6 +249,13 @@ def main():
         print(f"    - Helpfulness: {avg_helpfulness:.2f}/10")
         print(f"    - Logic: {avg_logic:.2f}/10")
 
+    print("\n🧾 Structured output parse failures:")
+    for name, entry in parse_failure_rates().items():
+        print(
+            f"    - {name}: {entry['invalid']} invalid, {entry['recovered']} recovered, "
+            f"{entry['ok']} ok ({entry['failure_rate']:.1%} failed)"
+        )
+
     print("\n✅ Batch Evaluation Complete.")
 
 
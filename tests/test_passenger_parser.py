@@ -0,0 +1,66 @@
+import pytest
+
+from src.utils.passenger_parser import parse_passengers
+
+
+@pytest.mark.parametrize(
+    "message, adults, travel_class",
+    [
+        ("Flights for 3 to Rome in June", 3, "ECONOMY"),
+        ("business class for 3 to Paris", 3, "BUSINESS"),
+        ("Tickets for two to Paris", 2, "ECONOMY"),
+        ("business class for 3", 3, "BUSINESS"),
+        ("just me", 1, "ECONOMY"),
+    ],
+)
+def test_head_counts(message, adults, travel_class):
+    parsed = parse_passengers(message)
+    assert parsed is not None
+    assert parsed["adults"] == adults
+    assert parsed["travel_class"] == travel_class
+
+
+def test_adults_and_children_are_not_a_bare_head_count():
+    parsed = parse_passengers("for 2 adults and 1 child")
+    assert (parsed["adults"], parsed["children"]) == (2, 1)
+
+
+@pytest.mark.parametrize(
+    "message", ["Trip to Paris for 5 days", "A flight for 50 euros", "Rome for a week"]
+)
+def test_durations_and_prices_are_not_travellers(message):
+    assert parse_passengers(message)["adults"] == 1
+
+
+@pytest.mark.parametrize(
+    "message", ["2 tickets to London", "one ticket to Rome", "3 economy seats please"]
+)
+def test_unassigned_ticket_counts_fall_back_to_the_llm(message):
+    assert parse_passengers(message) is None
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "I am going with my mom",
+        "I and my brother",
+        "me and my 2 cousins",
+        "flight for one adult and a 5 year old",
+        "one adult and my daughter, aged 7",
+    ],
+)
+def test_uncounted_companions_fall_back_to_the_llm(message):
+    assert parse_passengers(message) is None
+
+
+@pytest.mark.parametrize(
+    "message, adults, children",
+    [
+        ("Going with my wife", 2, 0),
+        ("with my 3 friends", 4, 0),
+        ("2 adults and a 5 year old child", 2, 1),
+    ],
+)
+def test_counted_companions_take_the_fast_path(message, adults, children):
+    parsed = parse_passengers(message)
+    assert (parsed["adults"], parsed["children"]) == (adults, children)
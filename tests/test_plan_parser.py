@@ -0,0 +1,103 @@
+from datetime import date
+
+import pytest
+
+from src.states import PlanDetailsState
+from src.utils.plan_parser import fast_path_plan
+
+TODAY = date(2026, 3, 2)
+
+KNOWN = PlanDetailsState(
+    destination="Paris, France",
+    origin="London, United Kingdom",
+    departure_date="2026-05-10",
+    arrival_date="2026-05-17",
+    budget=2000,
+    budget_currency="USD",
+    remaining_budget=None,
+    interests="",
+    need_hotel=True,
+    need_activities=False,
+)
+
+
+def test_complete_request_takes_the_fast_path():
+    plan = fast_path_plan(
+        "Trip from London to Paris from May 10 to May 17 with a budget of $1500", TODAY
+    )
+    assert plan is not None
+    assert plan["destination"] == "Paris, France"
+    assert plan["budget"] == 1500
+    assert plan["confidence"] == "high"
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Yes, please double the budget",
+        "yes",
+        "Can you make it cheaper?",
+        "Let's try different dates",
+    ],
+)
+def test_follow_up_without_fields_falls_back_to_the_llm(message):
+    assert fast_path_plan(message, TODAY, KNOWN) is None
+
+
+def test_follow_up_with_a_new_budget_updates_the_known_plan():
+    plan = fast_path_plan("Make the budget $4000", TODAY, KNOWN)
+    assert plan is not None
+    assert plan["budget"] == 4000
+    assert plan["destination"] == "Paris, France"
+
+
+def test_follow_up_with_new_dates_updates_the_known_plan():
+    plan = fast_path_plan("Let's go from June 1 to June 8 instead", TODAY, KNOWN)
+    assert plan is not None
+    assert (plan["departure_date"], plan["arrival_date"]) == (
+        "2026-06-01",
+        "2026-06-08",
+    )
+    assert plan["budget"] == 2000
+
+
+@pytest.mark.parametrize(
+    "message, budget",
+    [
+        ("Paris from London June 1 to June 7, budget $2000", 2000),
+        ("Trip from London to Paris from May 10 to May 17 with a budget of 2027", 2027),
+    ],
+)
+def test_amounts_are_not_years(message, budget):
+    plan = fast_path_plan(message, TODAY)
+    assert plan is not None
+    assert plan["departure_date"].startswith("2026-")
+    assert plan["budget"] == budget
+
+
+def test_year_next_to_a_month_sets_the_year():
+    plan = fast_path_plan(
+        "London to Paris from June 1 to June 7, 2027 with a budget of $1500", TODAY
+    )
+    assert (plan["departure_date"], plan["arrival_date"]) == (
+        "2027-06-01",
+        "2027-06-07",
+    )
+
+
+def test_follow_up_that_drops_the_hotel_updates_both_fields():
+    plan = fast_path_plan("Change the budget to $3000 and drop the hotel", TODAY, KNOWN)
+    assert plan is not None
+    assert plan["budget"] == 3000
+    assert plan["need_hotel"] is False
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "Change the budget to $3000 and make it more relaxed",
+        "Make the budget $4000 and remove the museum tour",
+    ],
+)
+def test_follow_up_with_an_unread_edit_falls_back_to_the_llm(message):
+    assert fast_path_plan(message, TODAY, KNOWN) is None